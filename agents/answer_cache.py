@@ -0,0 +1,120 @@
+import os
+import time
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+
+# === Semantic answer cache ===
+# Near-duplicate questions (cosine >= threshold on the query embedding) reuse a previous answer.
+# Entries expire after `ttl` seconds, the least recently used are evicted past `max_entries`,
+# and everything is dropped when the Chroma index or the flat index (VECTOR_STORE=flat) on disk changes.
+class SemanticAnswerCache:
+    def __init__(self, threshold=0.95, ttl=3600, max_entries=1000, index_path=None, flat_index_path=None):
+        self.threshold = threshold
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.index_path = index_path
+        self.flat_index_path = flat_index_path
+        self._entries = OrderedDict()
+        self._next_key = 0
+        self._lock = threading.Lock()
+        self._fingerprint = self._index_fingerprint()
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+
+    def _index_fingerprint(self):
+        # build_flat_index swaps in a whole new directory, so index.json + vectors.npy cover a rebuild
+        paths = []
+        if self.index_path:
+            paths.append(os.path.join(self.index_path, "chroma.sqlite3"))
+        if self.flat_index_path:
+            paths += [os.path.join(self.flat_index_path, "index.json"), os.path.join(self.flat_index_path, "vectors.npy")]
+        fingerprint = []
+        for path in paths:
+            try:
+                stat = os.stat(path)
+            except OSError:
+                fingerprint.append(None)
+                continue
+            fingerprint.append((stat.st_ino, stat.st_mtime_ns, stat.st_size))
+        return tuple(fingerprint) if paths else None
+
+    def _check_index(self):
+        fingerprint = self._index_fingerprint()
+        if fingerprint != self._fingerprint:
+            self._entries.clear()
+            self._fingerprint = fingerprint
+            self.invalidations += 1
+
+    @staticmethod
+    def _normalize(vector):
+        vector = np.asarray(vector, dtype=np.float32)
+        norm = np.linalg.norm(vector)
+        return vector / norm if norm else vector
+
+    def lookup(self, vector):
+        query = self._normalize(vector)
+        now = time.time()
+        with self._lock:
+            self._check_index()
+            expired = [key for key, entry in self._entries.items() if now - entry["created_at"] > self.ttl]
+            for key in expired:
+                del self._entries[key]
+
+            keys = list(self._entries)
+            best_key, best_score = None, 0.0
+            if keys:
+                scores = np.stack([self._entries[key]["vector"] for key in keys]) @ query
+                best = int(np.argmax(scores))
+                best_key, best_score = keys[best], float(scores[best])
+
+            if best_key is None or best_score < self.threshold:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(best_key)
+            self.hits += 1
+            entry = self._entries[best_key]
+            return {"answer": entry["answer"], "sources": entry["sources"], "score": best_score}
+
+    def store(self, question, vector, answer, sources):
+        with self._lock:
+            self._check_index()
+            self._entries[self._next_key] = {
+                "question": question,
+                "vector": self._normalize(vector),
+                "answer": answer,
+                "sources": sources,
+                "created_at": time.time()
+            }
+            self._next_key += 1
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "invalidations": self.invalidations
+        }
+
+
+def create_answer_cache(index_path=None):
+    if os.getenv("ANSWER_CACHE", "on").lower() in ("0", "off", "false", "no"):
+        return None
+    return SemanticAnswerCache(
+        threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", 0.95)),
+        ttl=float(os.getenv("ANSWER_CACHE_TTL", 3600)),
+        max_entries=int(os.getenv("ANSWER_CACHE_SIZE", 1000)),
+        index_path=index_path,
+        flat_index_path=os.getenv("FLAT_INDEX_PATH", "flat_index")
+    )
@@ -0,0 +1,156 @@
+import os
+import re
+import json
+import math
+import sqlite3
+from collections import Counter, defaultdict
+
+import numpy as np
+from langchain_core.documents import Document
+
+# Keeps program codes ("t127"), and figures like "5,000" / "1.5" as single terms
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+STOPWORDS = {
+    "a", "an", "and", "are", "as", "at", "be", "by", "can", "do", "for", "from", "how", "i", "in", "is",
+    "it", "me", "my", "of", "on", "or", "the", "to", "what", "when", "where", "which", "with", "you", "your"
+}
+
+
+def tokenize(text):
+    return [t for t in TOKEN_RE.findall(text.lower()) if t not in STOPWORDS]
+
+
+# === In-process inverted-index BM25 over the same chunks as chroma_index ===
+class BM25Index:
+    def __init__(self, texts, metadatas, k1=1.5, b=0.75, fingerprint=None):
+        self.texts = texts
+        self.metadatas = metadatas
+        self.k1 = k1
+        self.b = b
+        self.fingerprint = fingerprint
+        self._build()
+
+    def _build(self):
+        postings = defaultdict(lambda: ([], []))
+        lengths = np.zeros(len(self.texts), dtype=np.float32)
+        for doc_id, text in enumerate(self.texts):
+            terms = Counter(tokenize(text))
+            lengths[doc_id] = sum(terms.values())
+            for term, tf in terms.items():
+                postings[term][0].append(doc_id)
+                postings[term][1].append(tf)
+
+        self._sources = np.asarray([m.get("source_file", "") for m in self.metadatas], dtype=object)
+
+        n = max(len(self.texts), 1)
+        self.avg_length = float(lengths.mean()) if len(self.texts) else 0.0
+        # Length normalisation is per doc, so it is folded in once at build time
+        self._norm = self.k1 * (1 - self.b + self.b * lengths / (self.avg_length or 1.0))
+        self._postings = {}
+        for term, (doc_ids, tfs) in postings.items():
+            idf = math.log(1 + (n - len(doc_ids) + 0.5) / (len(doc_ids) + 0.5))
+            self._postings[term] = (np.asarray(doc_ids, dtype=np.int32), np.asarray(tfs, dtype=np.float32), idf)
+
+    def search(self, query, k=6, mask=None):
+        scores = np.zeros(len(self.texts), dtype=np.float32)
+        for term in set(tokenize(query)):
+            posting = self._postings.get(term)
+            if posting is None:
+                continue
+            doc_ids, tfs, idf = posting
+            scores[doc_ids] += idf * tfs * (self.k1 + 1) / (tfs + self._norm[doc_ids])
+        if mask is not None:
+            scores[~mask] = 0.0
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > k:
+            candidates = candidates[np.argpartition(-scores[candidates], k)[:k]]
+        ranked = candidates[np.argsort(-scores[candidates])]
+        return [
+            Document(page_content=self.texts[i], metadata=self.metadatas[i])
+            for i in ranked
+        ]
+
+    def mask_for(self, source_files):
+        return np.isin(self._sources, list(source_files))
+
+    # === Persistence (next to the Chroma index) ===
+    def save(self, path):
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({
+                "fingerprint": self.fingerprint,
+                "k1": self.k1,
+                "b": self.b,
+                "texts": self.texts,
+                "metadatas": self.metadatas
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return cls(data["texts"], data["metadatas"], k1=data["k1"], b=data["b"], fingerprint=data["fingerprint"])
+
+    @classmethod
+    def from_chroma(cls, collection, page_size=5000, fingerprint=None):
+        texts, metadatas = [], []
+        offset = 0
+        while True:
+            page = collection.get(include=["documents", "metadatas"], limit=page_size, offset=offset)
+            if not page["ids"]:
+                break
+            texts.extend(page["documents"])
+            metadatas.extend(m or {} for m in page["metadatas"])
+            offset += len(page["ids"])
+        return cls(texts, metadatas, fingerprint=fingerprint)
+
+
+def chroma_max_seq_id(persist_path):
+    # Chroma numbers every write (add, upsert, delete); the highest number applied changes with any edit,
+    # including ones that leave the count unchanged. None when there is no readable chroma.sqlite3.
+    try:
+        conn = sqlite3.connect(f"file:{os.path.join(persist_path, 'chroma.sqlite3')}?mode=ro", uri=True)
+        try:
+            seq_id = conn.execute("SELECT MAX(seq_id) FROM max_seq_id").fetchone()[0]
+        finally:
+            conn.close()
+    except sqlite3.Error:
+        return None
+    return int.from_bytes(seq_id, "big") if isinstance(seq_id, bytes) else seq_id  # older Chroma stores bytes
+
+
+def index_fingerprint(collection, persist_path):
+    # The flat index carries a hash of its chunks (agents/flat_index.py); for Chroma, count + last write
+    fingerprint = getattr(collection, "fingerprint", None)
+    if fingerprint is not None:
+        return fingerprint
+    return [collection.count(), chroma_max_seq_id(persist_path)]
+
+
+def load_or_build_bm25(collection, persist_path):
+    # Rebuilt whenever the index content differs from the persisted copy;
+    # 5 embed_for_langchain also deletes bm25.json whenever it changes the index.
+    path = os.path.join(persist_path, "bm25.json")
+    fingerprint = index_fingerprint(collection, persist_path)
+    if os.path.exists(path):
+        index = BM25Index.load(path)
+        if index.fingerprint == fingerprint:
+            return index
+    index = BM25Index.from_chroma(collection, fingerprint=fingerprint)
+    if os.path.isdir(persist_path):
+        index.save(path)
+    return index
+
+
+def reciprocal_rank_fusion(result_lists, k=6, k0=60):
+    # score(d) = Σ 1 / (k0 + rank); documents are identified by source_file + chunk_id
+    scores, docs = {}, {}
+    for results in result_lists:
+        for rank, doc in enumerate(results):
+            key = (doc.metadata.get("source_file"), str(doc.metadata.get("chunk_id")), doc.page_content[:64])
+            scores[key] = scores.get(key, 0.0) + 1.0 / (k0 + rank + 1)
+            docs.setdefault(key, doc)
+    ranked = sorted(scores, key=scores.get, reverse=True)
+    return [docs[key] for key in ranked[:k]]
@@ -0,0 +1,127 @@
+import os
+import re
+
+from langchain_core.documents import Document
+from langchain_core.prompts.base import format_document
+
+WORD_RE = re.compile(r"\w+")
+
+
+def estimate_tokens(text):
+    # ~4 characters per token; close enough for budgeting without calling the Gemini tokenizer API
+    return max(1, len(text) // 4)
+
+
+def _shingles(text, n=3):
+    words = WORD_RE.findall(text.lower())
+    if len(words) <= n:
+        return {tuple(words)}
+    return {tuple(words[i:i + n]) for i in range(len(words) - n + 1)}
+
+
+def _overlap(left, right, min_chars=20):
+    # Length of the longest suffix of `left` that is a prefix of `right` (chunks are exact slices of one text)
+    probe = right[:min_chars]
+    start = left.find(probe)
+    while start != -1:
+        if right.startswith(left[start:]):
+            return len(left) - start
+        start = left.find(probe, start + 1)
+    return 0
+
+
+# === Prompt context: merge overlapping chunks, drop near-duplicates, pack to a token budget ===
+class ContextBuilder:
+    def __init__(self, doc_prompt, token_budget=1500, dedup_threshold=0.9, count_tokens=estimate_tokens):
+        self.doc_prompt = doc_prompt
+        self.token_budget = token_budget
+        self.dedup_threshold = dedup_threshold
+        self.count_tokens = count_tokens
+
+    def _merge_adjacent(self, docs):
+        # Consecutive chunk_ids of the same source_file are stitched back together over their overlap.
+        # Each block keeps the best (lowest) retrieval rank of the chunks it contains.
+        by_source = {}
+        for rank, doc in enumerate(docs):
+            by_source.setdefault(doc.metadata.get("source_file"), []).append((rank, doc))
+
+        blocks, merged = [], 0
+        for source_file, items in by_source.items():
+            try:
+                items.sort(key=lambda item: int(item[1].metadata.get("chunk_id")))
+            except (TypeError, ValueError):
+                blocks.extend({"rank": rank, "doc": doc} for rank, doc in items)
+                continue
+
+            current = None
+            for rank, doc in items:
+                chunk_id = int(doc.metadata["chunk_id"])
+                if current is not None and chunk_id == current["last_id"] + 1:
+                    overlap = _overlap(current["text"], doc.page_content)
+                    current["text"] += doc.page_content[overlap:] if overlap else "\n" + doc.page_content
+                    current["last_id"] = chunk_id
+                    current["rank"] = min(current["rank"], rank)
+                    merged += 1
+                    continue
+                if current is not None:
+                    blocks.append(self._block(current))
+                current = {"rank": rank, "first_id": chunk_id, "last_id": chunk_id,
+                           "text": doc.page_content, "metadata": doc.metadata}
+            blocks.append(self._block(current))
+
+        blocks.sort(key=lambda block: block["rank"])
+        return blocks, merged
+
+    @staticmethod
+    def _block(current):
+        chunk_id = current["first_id"] if current["first_id"] == current["last_id"] else f"{current['first_id']}-{current['last_id']}"
+        doc = Document(page_content=current["text"], metadata={**current["metadata"], "chunk_id": chunk_id})
+        return {"rank": current["rank"], "doc": doc}
+
+    def build(self, docs):
+        # Returns (context string, stats); stats["tokens_saved"] is against plain concatenation of `docs`
+        naive = [format_document(doc, self.doc_prompt) for doc in docs]
+        tokens_in = sum(self.count_tokens(chunk) for chunk in naive)
+
+        blocks, merged = self._merge_adjacent(docs)
+
+        kept, kept_shingles, duplicates, over_budget = [], [], 0, 0
+        used = 0
+        for block in blocks:
+            # Near-duplicate = mostly contained in something already kept (repeated page boilerplate, re-hosted PDFs)
+            shingles = _shingles(block["doc"].page_content)
+            if any(len(shingles & other) / len(shingles) >= self.dedup_threshold for other in kept_shingles):
+                duplicates += 1
+                continue
+
+            chunk = format_document(block["doc"], self.doc_prompt)
+            tokens = self.count_tokens(chunk)
+            if used + tokens > self.token_budget:
+                over_budget += 1
+                if kept:
+                    continue
+                # The best block alone is over budget: keep its head rather than send no context
+                chunk = chunk[:self.token_budget * 4]
+                tokens = self.count_tokens(chunk)
+
+            kept.append(chunk)
+            kept_shingles.append(shingles)
+            used += tokens
+
+        stats = {
+            "tokens_in": tokens_in,
+            "tokens_out": used,
+            "tokens_saved": tokens_in - used,
+            "merged": merged,
+            "duplicates": duplicates,
+            "over_budget": over_budget
+        }
+        return "\n\n".join(kept), stats
+
+
+def create_context_builder(doc_prompt):
+    return ContextBuilder(
+        doc_prompt,
+        token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", 1500)),
+        dedup_threshold=float(os.getenv("CONTEXT_DEDUP_THRESHOLD", 0.9))
+    )
@@ -1,27 +1,91 @@
 import os
+import time
+import asyncio
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from langchain_google_genai import ChatGoogleGenerativeAI
 from langchain_chroma import Chroma
-from langchain_huggingface import HuggingFaceEmbeddings
-from langchain.memory import ConversationBufferMemory
+from langchain_core.documents import Document
+from langchain_core.messages.ai import add_usage
 from langchain_core.prompts import ChatPromptTemplate, MessagesPlaceholder, PromptTemplate
-from langchain_core.prompts.base import format_document
-from langchain_core.runnables import RunnableMap, RunnableLambda
+from langchain_core.runnables import RunnableMap
+
+from agents.answer_cache import create_answer_cache
+from agents.context_builder import create_context_builder, estimate_tokens
+from agents.bm25 import load_or_build_bm25, reciprocal_rank_fusion
+from agents.embedding_backend import create_embeddings
+from agents.embedding_cache import create_query_embeddings
+from agents.flat_index import FlatIndex, load_flat_index
+from agents.memory_store import SummarizingMemory, create_memory_store
+from agents.metrics import create_request_logger, observe, timed
+from agents.query_router import QueryRouter
+from agents.reranker import create_reranker
+from llm.resilient import create_llm
+
+
+def load_shared_components(persist_path="chroma_index"):
+    # Heavy, read-only pieces: the embedding model, BM25 arrays and the cross-encoder.
+    # A pre-fork server loads these once in the parent and every worker shares them copy-on-write.
+    embeddings = create_embeddings()
+    # VECTOR_STORE=flat serves vectors from memory-mapped arrays (agents/flat_index.py) instead of Chroma
+    flat_index = load_flat_index() if os.getenv("VECTOR_STORE", "chroma") == "flat" else None
+    bm25 = None
+    if os.getenv("HYBRID_RETRIEVAL", "on").lower() not in ("0", "off", "false", "no"):
+        if flat_index is not None:
+            bm25 = load_or_build_bm25(flat_index, flat_index.path)
+        else:
+            vectorstore = Chroma(persist_directory=persist_path, embedding_function=embeddings)
+            bm25 = load_or_build_bm25(vectorstore._collection, persist_path)
+    return {"embeddings": embeddings, "bm25": bm25, "reranker": create_reranker(), "flat_index": flat_index}
+
 
 class ConversationalAgent:
-    def __init__(self, persist_path="chroma_index", model=os.getenv("GEMINI_MODEL", "gemini-1.5-flash")):
-        # LLM setup
-        self.llm = ChatGoogleGenerativeAI(
+    def __init__(self, persist_path="chroma_index", model=os.getenv("GEMINI_MODEL", "gemini-1.5-flash"), memory_store=None, llm=None,
+                 answer_cache=None, max_concurrency=int(os.getenv("LLM_MAX_CONCURRENCY", 32)), shared=None):
+        shared = shared or load_shared_components(persist_path)
+
+        # LLM setup (any LangChain chat model can be injected, e.g. a fake streaming model in tests).
+        # LLM_PROVIDERS switches to the failover/hedging provider chain in llm/resilient.py.
+        self.llm = llm or create_llm() or ChatGoogleGenerativeAI(
             model=model,
             temperature=0.2
         )
 
-        # Embeddings + Vector Store
-        self.embeddings = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-        self.vectorstore = Chroma(persist_directory=persist_path, embedding_function=self.embeddings)
-        self.retriever = self.vectorstore.as_retriever(search_kwargs={"k": 6})
+        # Embeddings + Vector Store (query side is LRU-cached and micro-batched across concurrent requests)
+        self.embeddings = create_query_embeddings(shared["embeddings"])
+        self.vectorstore = shared.get("flat_index")
+        if self.vectorstore is None:
+            self.vectorstore = Chroma(persist_directory=persist_path, embedding_function=self.embeddings)
+        self.top_k = 6
+
+        # Hybrid retrieval: BM25 catches exact program codes / course names / figures that MiniLM misses
+        self.bm25 = shared["bm25"]
 
-        # Memory
-        self.memory = ConversationBufferMemory(memory_key="chat_history", return_messages=True)
+        # Query routing: narrow the search to the source files of the matched topic(s)
+        self.routing = os.getenv("QUERY_ROUTING", "on").lower() not in ("0", "off", "false", "no")
+        self.router = self._build_router(self.vectorstore, self.bm25)
+
+        # A rebuilt flat index (new directory swapped in) is picked up without a restart: checked at most
+        # every FLAT_INDEX_RELOAD_INTERVAL seconds, 0 = never. Chroma reads its own files, nothing to reload.
+        self.flat_reload_interval = float(os.getenv("FLAT_INDEX_RELOAD_INTERVAL", 5))
+        self._flat_checked = time.monotonic()
+        self._flat_reload_lock = threading.Lock()
+        self._retrieval_pool = ThreadPoolExecutor(max_workers=int(os.getenv("RETRIEVAL_THREADS", 8)), thread_name_prefix="retrieval")
+
+        # Optional cross-encoder rerank: wider candidate set in, fewer (better) chunks out
+        self.reranker = shared["reranker"]
+        self.rerank_candidates = int(os.getenv("RERANK_CANDIDATES", 20))
+        self.rerank_top_n = int(os.getenv("RERANK_TOP_N", 4))
+
+        # Semantic answer cache (keyed on the query embedding, reset when the index is rebuilt)
+        self.answer_cache = answer_cache if answer_cache is not None else create_answer_cache(persist_path)
+
+        # Async path: cap in-flight LLM calls, the rest wait in the semaphore queue
+        self.max_concurrency = max_concurrency
+        self._llm_semaphore = None
+
+        # Memory (per-session, bounded; older turns are summarized in the background)
+        self.memory_store = memory_store or create_memory_store(llm=self.llm)
 
         # Prompt
         self.doc_prompt = PromptTemplate.from_template("📜 {source_file} (Chunk {chunk_id})\n{page_content}")
@@ -31,41 +95,356 @@ class ConversationalAgent:
                 ("human", "{question}"),
                 ("system", "Context:\n{context}")
             ])
+        # Overlapping neighbours are merged and near-duplicates dropped before the prompt is filled
+        self.context_builder = create_context_builder(self.doc_prompt)
 
-        # Chain assembly
-        self.chain = (
+        # Chain assembly (context + history are resolved per call, so nothing is shared between sessions).
+        # The prompt is rendered in _prepare_inputs and the LLM called separately, so each stage can be timed.
+        self.prompt = (
             RunnableMap({
-                "context": RunnableLambda(self._retrieve_context),
-                "chat_history": RunnableLambda(lambda _: self._get_recent_memory(3)),
+                "context": lambda x: x["context"],
+                "chat_history": lambda x: x["chat_history"],
                 "question": lambda x: x["question"]
             })
             | self.chat_prompt
-            | self.llm
         )
+        self.chain = self.prompt | self.llm
+
+        # Per-stage timings go to /metrics; REQUEST_LOG_PATH also writes one JSONL record per request
+        self.request_logger = create_request_logger()
 
-    def _get_recent_memory(self, n=3):
-        messages = self.memory.chat_memory.messages
-        return messages[-n*2:] if len(messages) > n*2 else messages
+    def _build_router(self, vectorstore, bm25):
+        if not self.routing:
+            return None
+        if bm25 is not None:
+            source_files = {m.get("source_file") for m in bm25.metadatas}
+        else:
+            collection = getattr(vectorstore, "_collection", vectorstore)
+            source_files = {m.get("source_file") for m in collection.get(include=["metadatas"])["metadatas"]}
+        return QueryRouter(source_files - {None}, embeddings=self.embeddings)
+
+    def _check_flat_index(self):
+        if not isinstance(self.vectorstore, FlatIndex) or self.flat_reload_interval <= 0:
+            return
+        if time.monotonic() - self._flat_checked < self.flat_reload_interval:
+            return
+        # One request does the check (and any reload); the others keep using the current index meanwhile
+        if not self._flat_reload_lock.acquire(blocking=False):
+            return
+        try:
+            self._flat_checked = time.monotonic()
+            if not self.vectorstore.is_stale():
+                return
+            try:
+                flat_index = FlatIndex(self.vectorstore.path)
+            except (OSError, ValueError) as e:
+                # Caught mid-swap: keep serving the old arrays and try again on the next check
+                print(f"⚠️ Flat index reload failed, keeping the loaded one: {e}")
+                return
+            bm25 = load_or_build_bm25(flat_index, flat_index.path) if self.bm25 is not None else None
+            router = self._build_router(flat_index, bm25)
+            # Searches keep documents, not row ids, so a request that straddles the swap stays consistent
+            self.vectorstore, self.bm25, self.router = flat_index, bm25, router
+            print(f"🔄 Reloaded flat index: {len(flat_index)} chunks (pid {os.getpid()})")
+        finally:
+            self._flat_reload_lock.release()
+
+    def _get_recent_memory(self, session_id, n=3):
+        # Summarizing memory sizes its own window by tokens; plain stores keep the last n turns
+        if isinstance(self.memory_store, SummarizingMemory):
+            return self.memory_store.get_messages(session_id)
+        return self.memory_store.get_messages(session_id, limit=n*2)
 
     def _format_docs(self, docs):
-        context = []
-        for doc in docs:
-            chunk = format_document(doc, self.doc_prompt)
-            context.append(chunk)
-        return "\n\n".join(context)
+        context, _ = self.context_builder.build(docs)
+        return context
+
+    def _retrieve_docs(self, question: str, vector, timings=None) -> list:
+        self._check_flat_index()
+        if self.reranker is None:
+            return self._route_and_search(question, vector, self.top_k, timings)
+        candidates = self._route_and_search(question, vector, self.rerank_candidates, timings)
+        return self.reranker.rerank(question, candidates, self.rerank_top_n)
+
+    def _route_and_search(self, question: str, vector, k: int, timings=None) -> list:
+        route = self.router.route(question, vector) if self.router is not None else None
+        if route is None:
+            return self._search(question, vector, k, timings=timings)
+
+        docs = self._search(question, vector, k, source_files=route["source_files"], timings=timings)
+        # Too little in the routed subset: fall back to the whole collection rather than lose recall
+        if len(docs) < k // 2:
+            return self._search(question, vector, k, timings=timings)
+        return docs
+
+    @staticmethod
+    def _add_time(timings, stage, start):
+        # Sub-stage of "retrieve" that can run more than once per question (routed search + fallback)
+        if timings is not None:
+            timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+    def _vector_search(self, vector, k: int, where, timings=None) -> list:
+        start = time.perf_counter()
+        try:
+            return self.vectorstore.similarity_search_by_vector(vector, k=k, filter=where)
+        finally:
+            self._add_time(timings, "vector_search", start)
+
+    def _search(self, question: str, vector, k: int, source_files=None, timings=None) -> list:
+        where = {"source_file": {"$in": list(source_files)}} if source_files else None
+        bm25 = self.bm25  # one index for mask + search, even if a reload swaps it meanwhile
+        if bm25 is None:
+            return self._vector_search(vector, k, where, timings)
+
+        # Both retrievers run in parallel, then results are fused by reciprocal rank
+        fetch_k = k * 2
+        mask = bm25.mask_for(source_files) if source_files else None
+        vector_future = self._retrieval_pool.submit(self._vector_search, vector, fetch_k, where, timings)
+        bm25_future = self._retrieval_pool.submit(bm25.search, question, k=fetch_k, mask=mask)
+        return reciprocal_rank_fusion([vector_future.result(), bm25_future.result()], k=k)
+
+    # === Batch retrieval (main.py --batch) ===
+    def _vector_search_batch(self, vectors, k: int, source_files=None, timings=None) -> list:
+        where = {"source_file": {"$in": list(source_files)}} if source_files else None
+        start = time.perf_counter()
+        try:
+            vectorstore = self.vectorstore
+            if isinstance(vectorstore, FlatIndex):
+                mask = vectorstore.mask_where(where) if where else None
+                return vectorstore.search_batch(vectors, k=k, mask=mask)
+            # Chroma answers a list of query embeddings in a single call
+            result = vectorstore._collection.query(query_embeddings=vectors, n_results=k, where=where,
+                                                   include=["documents", "metadatas"])
+        finally:
+            self._add_time(timings, "vector_search", start)
+        return [
+            [Document(page_content=text, metadata=metadata or {}) for text, metadata in zip(texts, metadatas)]
+            for texts, metadatas in zip(result["documents"], result["metadatas"])
+        ]
+
+    def _search_batch(self, questions: list, vectors, k: int, source_files=None, timings=None) -> list:
+        bm25 = self.bm25
+        if bm25 is None:
+            return self._vector_search_batch(vectors, k, source_files, timings)
+        fetch_k = k * 2
+        mask = bm25.mask_for(source_files) if source_files else None
+        vector_results = self._vector_search_batch(vectors, fetch_k, source_files, timings)
+        return [
+            reciprocal_rank_fusion([hits, bm25.search(question, k=fetch_k, mask=mask)], k=k)
+            for question, hits in zip(questions, vector_results)
+        ]
+
+    def retrieve_batch(self, questions: list, vectors, timings=None) -> list:
+        # Same results as _retrieve_docs per question, but questions routed to the same source files
+        # share one vector search call
+        self._check_flat_index()
+        k = self.rerank_candidates if self.reranker is not None else self.top_k
+        groups = {}
+        for i, (question, vector) in enumerate(zip(questions, vectors)):
+            route = self.router.route(question, vector) if self.router is not None else None
+            groups.setdefault(frozenset(route["source_files"]) if route else None, []).append(i)
 
-    def _retrieve_context(self, inputs: dict) -> str:
+        docs = [None] * len(questions)
+        for source_files, indices in groups.items():
+            results = self._search_batch([questions[i] for i in indices], [vectors[i] for i in indices], k, source_files, timings)
+            for i, hits in zip(indices, results):
+                # Too little in the routed subset: same fallback as _route_and_search
+                docs[i] = self._search(questions[i], vectors[i], k, timings=timings) if source_files and len(hits) < k // 2 else hits
+
+        if self.reranker is not None:
+            docs = [self.reranker.rerank(question, hits, self.rerank_top_n) for question, hits in zip(questions, docs)]
+        return docs
+
+    def prepare_batch(self, questions: list) -> list:
+        # Inputs for many standalone questions (no conversation memory): one embedding call for the batch,
+        # grouped vector searches, then per-question prompts. Batched stage timings are split evenly.
+        started, n = time.perf_counter(), len(questions)
+        batch_timings = {}
+        with timed(batch_timings, "embed"):
+            vectors = self.embeddings.embed_documents(questions)
+
+        batch = [{"question": q, "vector": v, "chat_history": [], "started": started,
+                  "timings": {"embed": batch_timings["embed"] / n}} for q, v in zip(questions, vectors)]
+        pending = []
+        for inputs in batch:
+            cached = self.answer_cache.lookup(inputs["vector"]) if self.answer_cache is not None else None
+            if cached:
+                inputs["cached"] = cached
+                inputs["docs"] = cached["sources"]
+            else:
+                pending.append(inputs)
+
+        if pending:
+            with timed(batch_timings, "retrieve"):
+                docs = self.retrieve_batch([i["question"] for i in pending], [i["vector"] for i in pending], batch_timings)
+            for inputs, hits in zip(pending, docs):
+                inputs["docs"] = hits
+                inputs["timings"]["retrieve"] = batch_timings["retrieve"] / len(pending)
+                inputs["timings"]["vector_search"] = batch_timings.get("vector_search", 0.0) / len(pending)
+                with timed(inputs["timings"], "prompt"):
+                    inputs["context"], inputs["context_stats"] = self.context_builder.build(hits)
+                    inputs["prompt"] = self.prompt.invoke(inputs)
+        return batch
+
+    def answer_prepared(self, inputs: dict) -> dict:
+        # LLM call for one prepare_batch() item; safe to call from several threads at once
         question = inputs["question"]
-        docs = self.retriever.invoke(question)
-        self._latest_docs = docs  # Save for external reference
-        return self._format_docs(docs)
+        # "total" covers this question's own stages, not the time it waited in the batch for a free LLM slot
+        inputs["timings"].pop("llm_total", None)  # from a failed attempt, when retried
+        inputs["timings"].pop("llm_ttft", None)
+        inputs["started"] = time.perf_counter() - sum(inputs["timings"].get(stage, 0.0) for stage in ("embed", "retrieve", "prompt"))
+        if "cached" in inputs:
+            return self._finish(question, None, inputs["cached"]["answer"], inputs, "batch")
+        with timed(inputs["timings"], "llm_total"):
+            response = self.llm.invoke(inputs["prompt"])
+        inputs["timings"]["llm_ttft"] = inputs["timings"]["llm_total"]
+        inputs["usage"] = response.usage_metadata
+        return self._finish(question, None, response.content, inputs, "batch")
+
+    def _prepare_inputs(self, question: str, session_id: str) -> dict:
+        # The question is embedded once and shared by the answer cache and the vector search
+        started, timings = time.perf_counter(), {}
+        chat_history = self._get_recent_memory(session_id, 3)
+        with timed(timings, "embed"):
+            vector = self.embeddings.embed_query(question)
+        inputs = {"question": question, "vector": vector, "chat_history": chat_history, "started": started, "timings": timings}
 
-    def run(self, question: str) -> dict:
-        response = self.chain.invoke({"question": question})
-        self.memory.save_context({"input": question}, {"output": response.content})
+        # Follow-ups depend on the conversation, so only standalone questions use the cache
+        if self.answer_cache is not None and not chat_history:
+            cached = self.answer_cache.lookup(vector)
+            if cached:
+                inputs["cached"] = cached
+                inputs["docs"] = cached["sources"]
+                return inputs
+
+        # "vector_search" is the part of "retrieve" spent in the vector store (BM25, routing and rerank are the rest)
+        with timed(timings, "retrieve"):
+            inputs["docs"] = self._retrieve_docs(question, vector, timings)
+        with timed(timings, "prompt"):
+            inputs["context"], inputs["context_stats"] = self.context_builder.build(inputs["docs"])
+            inputs["prompt"] = self.prompt.invoke(inputs)
+        return inputs
+
+    def clear_memory(self, session_id: str):
+        self.memory_store.clear(session_id)
+
+    def _finish(self, question: str, session_id: str, answer: str, inputs: dict, mode: str) -> dict:
+        cached = "cached" in inputs
+        if self.answer_cache is not None and not cached and not inputs["chat_history"]:
+            self.answer_cache.store(question, inputs["vector"], answer, inputs["docs"])
+
+        if session_id is not None:  # batch answers are standalone and not remembered
+            self.memory_store.add_turn(session_id, question, answer)
+
+        timings = inputs["timings"]
+        timings["total"] = time.perf_counter() - inputs["started"]
+        tokens = None
+        if not cached:
+            # Provider-reported usage when available, otherwise the ~4 chars/token estimate
+            usage = inputs.get("usage") or {}
+            tokens = {
+                "in": usage.get("input_tokens") or estimate_tokens(inputs["prompt"].to_string()),
+                "out": usage.get("output_tokens") or estimate_tokens(answer)
+            }
+        observe(mode, cached, timings, tokens["in"] if tokens else None, tokens["out"] if tokens else None)
+        timings_ms = {stage: round(seconds * 1000, 1) for stage, seconds in timings.items()}
+
+        if self.request_logger is not None:
+            self.request_logger.log({
+                "ts": time.time(),
+                "session_id": session_id,
+                "mode": mode,
+                "question": question,
+                "cached": cached,
+                "sources": [doc.metadata.get("source_file") for doc in inputs["docs"]],
+                "timings_ms": timings_ms,
+                "tokens": tokens,
+                "answer_chars": len(answer)
+            })
 
         return {
-            "answer": response.content.strip(),
-            "sources": getattr(self, "_latest_docs", []),
-            "chat_history": self.memory.chat_memory.messages
+            "answer": answer.strip(),
+            "sources": inputs["docs"],
+            "chat_history": self.memory_store.get_messages(session_id) if session_id is not None else [],
+            "cached": cached,
+            "context_stats": inputs.get("context_stats"),
+            "timings": timings_ms,
+            "tokens": tokens
         }
+
+    def _on_chunk(self, inputs: dict, chunk, llm_started: float):
+        # Time to first token + usage accumulated across streamed chunks
+        if chunk.content and "llm_ttft" not in inputs["timings"]:
+            inputs["timings"]["llm_ttft"] = time.perf_counter() - llm_started
+        if getattr(chunk, "usage_metadata", None):
+            inputs["usage"] = add_usage(inputs.get("usage"), chunk.usage_metadata)
+
+    def run(self, question: str, session_id: str = "default") -> dict:
+        inputs = self._prepare_inputs(question, session_id)
+        if "cached" in inputs:
+            return self._finish(question, session_id, inputs["cached"]["answer"], inputs, "run")
+        with timed(inputs["timings"], "llm_total"):
+            response = self.llm.invoke(inputs["prompt"])
+        inputs["timings"]["llm_ttft"] = inputs["timings"]["llm_total"]  # not streamed: first token = whole answer
+        inputs["usage"] = response.usage_metadata
+        return self._finish(question, session_id, response.content, inputs, "run")
+
+    def stream(self, question: str, session_id: str = "default"):
+        # Yields {"type": "token"} events as the LLM produces them, then a single {"type": "done"} event.
+        # Memory is only committed once the stream has been fully consumed.
+        inputs = self._prepare_inputs(question, session_id)
+        if "cached" in inputs:
+            answer = inputs["cached"]["answer"]
+            yield {"type": "token", "content": answer}
+            yield {"type": "done", **self._finish(question, session_id, answer, inputs, "stream")}
+            return
+
+        parts = []
+        with timed(inputs["timings"], "llm_total"):
+            llm_started = time.perf_counter()
+            for chunk in self.llm.stream(inputs["prompt"]):
+                self._on_chunk(inputs, chunk, llm_started)
+                if chunk.content:
+                    parts.append(chunk.content)
+                    yield {"type": "token", "content": chunk.content}
+
+        yield {"type": "done", **self._finish(question, session_id, "".join(parts), inputs, "stream")}
+
+    # === Async API ===
+    def _get_semaphore(self):
+        # Created lazily so it binds to the serving event loop
+        if self._llm_semaphore is None:
+            self._llm_semaphore = asyncio.Semaphore(self.max_concurrency)
+        return self._llm_semaphore
+
+    async def arun(self, question: str, session_id: str = "default") -> dict:
+        # Retrieval is CPU/disk bound, so it runs in a worker thread; the LLM call is awaited
+        inputs = await asyncio.to_thread(self._prepare_inputs, question, session_id)
+        if "cached" in inputs:
+            return self._finish(question, session_id, inputs["cached"]["answer"], inputs, "arun")
+        async with self._get_semaphore():
+            with timed(inputs["timings"], "llm_total"):
+                response = await self.llm.ainvoke(inputs["prompt"])
+        inputs["timings"]["llm_ttft"] = inputs["timings"]["llm_total"]
+        inputs["usage"] = response.usage_metadata
+        return self._finish(question, session_id, response.content, inputs, "arun")
+
+    async def astream(self, question: str, session_id: str = "default"):
+        inputs = await asyncio.to_thread(self._prepare_inputs, question, session_id)
+        if "cached" in inputs:
+            answer = inputs["cached"]["answer"]
+            yield {"type": "token", "content": answer}
+            yield {"type": "done", **self._finish(question, session_id, answer, inputs, "astream")}
+            return
+
+        parts = []
+        async with self._get_semaphore():
+            with timed(inputs["timings"], "llm_total"):
+                llm_started = time.perf_counter()
+                async for chunk in self.llm.astream(inputs["prompt"]):
+                    self._on_chunk(inputs, chunk, llm_started)
+                    if chunk.content:
+                        parts.append(chunk.content)
+                        yield {"type": "token", "content": chunk.content}
+
+        yield {"type": "done", **self._finish(question, session_id, "".join(parts), inputs, "astream")}
@@ -0,0 +1,133 @@
+import os
+import json
+import threading
+
+import numpy as np
+from langchain_core.embeddings import Embeddings
+
+EMBED_MODEL = "all-MiniLM-L6-v2"
+
+
+# === int8 ONNX export of the sentence-transformers model ===
+# Pooling and normalization are part of the graph, so the ONNX output is the sentence embedding itself.
+# Needs torch, sentence-transformers, onnx and onnxruntime; serving only needs onnxruntime + tokenizers.
+def export_onnx(model_name=EMBED_MODEL, out_dir="models/all-MiniLM-L6-v2-onnx-int8", opset=17):
+    import torch
+    from onnxruntime.quantization import QuantType, quantize_dynamic
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize, Pooling
+
+    st = SentenceTransformer(model_name, device="cpu")
+    pooling = next(module for module in st if isinstance(module, Pooling))
+    mode = pooling.get_pooling_mode_str() if hasattr(pooling, "get_pooling_mode_str") else pooling.pooling_mode
+    if mode != "mean":
+        raise ValueError(f"Only mean pooling is supported, {model_name} uses {mode}")
+    normalize = any(isinstance(module, Normalize) for module in st)
+    transformer, tokenizer = st[0].auto_model.eval(), st.tokenizer
+
+    class SentenceEncoder(torch.nn.Module):
+        def __init__(self):
+            super().__init__()
+            self.transformer = transformer
+
+        def forward(self, input_ids, attention_mask, token_type_ids):
+            hidden = self.transformer(input_ids=input_ids, attention_mask=attention_mask,
+                                      token_type_ids=token_type_ids).last_hidden_state
+            mask = attention_mask.unsqueeze(-1).to(hidden.dtype)
+            pooled = (hidden * mask).sum(1) / mask.sum(1).clamp(min=1e-9)
+            return torch.nn.functional.normalize(pooled, dim=-1) if normalize else pooled
+
+    os.makedirs(out_dir, exist_ok=True)
+    fp32_path, int8_path = os.path.join(out_dir, "model.onnx"), os.path.join(out_dir, "model_int8.onnx")
+    sample = tokenizer(["an example sentence", "another one"], padding=True, return_tensors="pt")
+    names = ["input_ids", "attention_mask", "token_type_ids"]
+    with torch.no_grad():
+        torch.onnx.export(
+            SentenceEncoder(), tuple(sample[name] for name in names), fp32_path,
+            input_names=names, output_names=["sentence_embedding"], opset_version=opset, dynamo=False,
+            dynamic_axes={**{name: {0: "batch", 1: "sequence"} for name in names}, "sentence_embedding": {0: "batch"}}
+        )
+    # Dynamic quantization: int8 weights, activations quantized on the fly (CPU friendly, no calibration set)
+    quantize_dynamic(fp32_path, int8_path, weight_type=QuantType.QInt8, per_channel=True)
+
+    tokenizer.save_pretrained(out_dir)
+    with open(os.path.join(out_dir, "embedding_config.json"), "w", encoding="utf-8") as f:
+        json.dump({"model_name": model_name, "max_length": st.max_seq_length, "normalize": normalize,
+                   "dimension": st.get_sentence_embedding_dimension(), "pad_token": tokenizer.pad_token,
+                   "pad_id": tokenizer.pad_token_id}, f, indent=2)
+    return int8_path
+
+
+class OnnxEmbeddings(Embeddings):
+    # Drop-in for HuggingFaceEmbeddings: same model, run as int8 ONNX through onnxruntime on CPU
+    def __init__(self, model_dir="models/all-MiniLM-L6-v2-onnx-int8", model_file="model_int8.onnx", batch_size=32, threads=None):
+        from tokenizers import Tokenizer
+
+        with open(os.path.join(model_dir, "embedding_config.json"), encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.model_path = os.path.join(model_dir, model_file)
+        if not os.path.exists(self.model_path):
+            raise FileNotFoundError(f"{self.model_path} not found, run scripts/export_onnx_embeddings.py first")
+        self.batch_size = batch_size
+        self.threads = threads
+        self._tokenizer = Tokenizer.from_file(os.path.join(model_dir, "tokenizer.json"))
+        self._tokenizer.enable_truncation(max_length=self.config["max_length"])
+        self._tokenizer.enable_padding(pad_id=self.config["pad_id"], pad_token=self.config["pad_token"])
+        self._session = None
+        self._session_pid = None
+        self._lock = threading.Lock()
+
+    def _get_session(self):
+        # Created on first use in each process: onnxruntime's thread pools don't survive a fork
+        if self._session is None or self._session_pid != os.getpid():
+            import onnxruntime as ort
+
+            with self._lock:
+                if self._session is None or self._session_pid != os.getpid():
+                    options = ort.SessionOptions()
+                    if self.threads:
+                        options.intra_op_num_threads = self.threads
+                    self._session = ort.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+                    self._session_pid = os.getpid()
+        return self._session
+
+    def _encode(self, texts):
+        session = self._get_session()
+        input_names = {i.name for i in session.get_inputs()}
+        vectors = np.zeros((len(texts), self.config["dimension"]), dtype=np.float32)
+        # Length-sorted batches keep padding (and wasted compute) low
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        for start in range(0, len(order), self.batch_size):
+            batch = order[start:start + self.batch_size]
+            encodings = self._tokenizer.encode_batch([texts[i] for i in batch])
+            feeds = {
+                "input_ids": np.array([e.ids for e in encodings], dtype=np.int64),
+                "attention_mask": np.array([e.attention_mask for e in encodings], dtype=np.int64),
+                "token_type_ids": np.array([e.type_ids for e in encodings], dtype=np.int64)
+            }
+            vectors[batch] = session.run(None, {k: v for k, v in feeds.items() if k in input_names})[0]
+        return vectors
+
+    def embed_documents(self, texts):
+        if not texts:
+            return []
+        return self._encode(list(texts)).tolist()
+
+    def embed_query(self, text):
+        return self._encode([text])[0].tolist()
+
+
+def create_embeddings(batch_size=32):
+    # EMBEDDING_BACKEND=torch (sentence-transformers, default) or onnx (int8, see export_onnx)
+    backend = os.getenv("EMBEDDING_BACKEND", "torch")
+    if backend == "onnx":
+        return OnnxEmbeddings(
+            os.getenv("EMBED_ONNX_PATH", "models/all-MiniLM-L6-v2-onnx-int8"),
+            batch_size=batch_size,
+            threads=int(os.getenv("EMBED_ONNX_THREADS", 0)) or None
+        )
+    if backend == "torch":
+        from langchain_huggingface import HuggingFaceEmbeddings
+
+        return HuggingFaceEmbeddings(model_name=EMBED_MODEL, encode_kwargs={"batch_size": batch_size})
+    raise ValueError(f"Unknown embedding backend: {backend}")
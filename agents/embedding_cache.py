@@ -0,0 +1,126 @@
+import os
+import time
+import queue
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+from langchain_core.embeddings import Embeddings
+
+
+# === Micro-batching embedder ===
+# Queries arriving within `max_wait_ms` of each other are encoded together in one
+# embed_documents call. all-MiniLM-L6-v2 is symmetric (no query instruction), so
+# document and query encodings are the same.
+class MicroBatchEmbedder(Embeddings):
+    def __init__(self, base, max_batch_size=32, max_wait_ms=5):
+        self.base = base
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000
+        self._queue = queue.Queue()
+        self._thread = None
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.items = 0
+
+    def _ensure_worker(self):
+        # Started lazily so a pre-fork parent doesn't hand a dead thread to its workers
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._worker, name="embed-batcher", daemon=True)
+                    self._thread.start()
+
+    def _worker(self):
+        while True:
+            batch = [self._queue.get()]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
+
+            texts = list(dict.fromkeys(text for text, _ in batch))
+            try:
+                vectors = dict(zip(texts, self.base.embed_documents(texts)))
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+                continue
+
+            self.batches += 1
+            self.items += len(batch)
+            for text, future in batch:
+                future.set_result(vectors[text])
+
+    def embed_query(self, text):
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((text, future))
+        return future.result()
+
+    def embed_documents(self, texts):
+        return self.base.embed_documents(texts)
+
+
+# === Query-embedding LRU cache ===
+class CachedEmbeddings(Embeddings):
+    def __init__(self, base, max_size=2048):
+        self.base = base
+        self.max_size = max_size
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def normalize(text):
+        # MiniLM's tokenizer is uncased, so case and whitespace don't change the vector
+        return " ".join(text.lower().split())
+
+    def embed_query(self, text):
+        key = self.normalize(text)
+        with self._lock:
+            vector = self._cache.get(key)
+            if vector is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return list(vector)
+            self.misses += 1
+
+        vector = self.base.embed_query(key)
+        with self._lock:
+            self._cache[key] = tuple(vector)
+            while len(self._cache) > self.max_size:
+                self._cache.popitem(last=False)
+        return list(vector)
+
+    def embed_documents(self, texts):
+        return self.base.embed_documents(texts)
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._cache),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+
+def create_query_embeddings(base):
+    embeddings = base
+    if os.getenv("EMBED_BATCHING", "on").lower() not in ("0", "off", "false", "no"):
+        embeddings = MicroBatchEmbedder(
+            embeddings,
+            max_batch_size=int(os.getenv("EMBED_BATCH_SIZE", 32)),
+            max_wait_ms=float(os.getenv("EMBED_BATCH_WAIT_MS", 5))
+        )
+    cache_size = int(os.getenv("EMBED_CACHE_SIZE", 2048))
+    if cache_size > 0:
+        embeddings = CachedEmbeddings(embeddings, max_size=cache_size)
+    return embeddings
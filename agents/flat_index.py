@@ -0,0 +1,213 @@
+import os
+import json
+import shutil
+import hashlib
+
+import numpy as np
+from langchain_core.documents import Document
+
+# Metadata fields kept for every chunk (the same ones 5 embed_for_langchain writes to Chroma)
+META_FIELDS = ("source_file", "chunk_id", "category")
+
+
+# === Exact in-process vector index over memory-mapped arrays ===
+# Directory layout (FLAT_INDEX_PATH, default flat_index/):
+#   vectors.npy        (n, dim) float16/float32, L2-normalised, so a dot product is the cosine
+#   texts.bin          all chunk texts, UTF-8, back to back; text_offsets.npy (n + 1) int64 into it
+#   meta_<field>.npy   int32 codes per chunk; the distinct values are listed in index.json
+# Everything is opened with mmap: workers share the page cache instead of each holding a copy.
+class FlatIndex:
+    def __init__(self, path):
+        self.path = path
+        self.file_stat = index_file_stat(path)  # taken first: a rebuild while loading shows up as stale
+        with open(os.path.join(path, "index.json"), encoding="utf-8") as f:
+            self.info = json.load(f)
+        self.vectors = np.load(os.path.join(path, "vectors.npy"), mmap_mode="r")
+        self._offsets = np.load(os.path.join(path, "text_offsets.npy"), mmap_mode="r")
+        self._texts = np.memmap(os.path.join(path, "texts.bin"), dtype=np.uint8, mode="r")
+        self._codes = {field: np.load(os.path.join(path, f"meta_{field}.npy"), mmap_mode="r") for field in META_FIELDS}
+        self._values = self.info["values"]
+        self._value_codes = {field: {value: code for code, value in enumerate(values)} for field, values in self._values.items()}
+        self.block_rows = 1024  # float16 only: small blocks stay in cache while being converted
+
+    def __len__(self):
+        return self.vectors.shape[0]
+
+    @property
+    def fingerprint(self):
+        return self.info.get("fingerprint")
+
+    def is_stale(self):
+        # True once build_flat_index has swapped a new index in at self.path (these arrays stay readable
+        # through the old mmaps until the index is dropped)
+        return index_file_stat(self.path) != self.file_stat
+
+    def text(self, i):
+        return bytes(self._texts[self._offsets[i]:self._offsets[i + 1]]).decode("utf-8")
+
+    def metadata(self, i):
+        return {field: self._values[field][self._codes[field][i]] for field in META_FIELDS}
+
+    def document(self, i):
+        return Document(page_content=self.text(i), metadata=self.metadata(i))
+
+    # === Masks ===
+    def mask_for(self, source_files):
+        return self.mask_where({"source_file": {"$in": list(source_files)}})
+
+    def mask_where(self, where):
+        # The subset of Chroma's where filter the agent uses: {field: value} and {field: {"$in": [...]}}
+        mask = np.ones(len(self), dtype=bool)
+        for field, condition in where.items():
+            values = condition["$in"] if isinstance(condition, dict) else [condition]
+            codes = [self._value_codes[field][v] for v in values if v in self._value_codes[field]]
+            mask &= np.isin(self._codes[field], codes)
+        return mask
+
+    # === Search ===
+    def _scores(self, query, rows=None):
+        # float16 has no BLAS path in NumPy, so it is converted and scored in float32 blocks: half the
+        # memory of float32, but the conversion makes each query several times slower
+        vectors = self.vectors if rows is None else self.vectors[rows]
+        if vectors.dtype == np.float32:
+            return vectors @ query
+        scores = np.empty(len(vectors), dtype=np.float32)
+        for start in range(0, len(vectors), self.block_rows):
+            scores[start:start + self.block_rows] = vectors[start:start + self.block_rows].astype(np.float32) @ query
+        return scores
+
+    def search_ids(self, vector, k=6, mask=None):
+        # Exact top-k: (row ids, cosine scores), best first
+        query = np.asarray(vector, dtype=np.float32)
+        query = query / (np.linalg.norm(query) or 1.0)
+        rows = None
+        if mask is not None:
+            rows = np.flatnonzero(mask)
+            if not len(rows):
+                return rows, np.empty(0, dtype=np.float32)
+        scores = self._scores(query, rows)
+        top = np.argpartition(-scores, k)[:k] if len(scores) > k else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return (top if rows is None else rows[top]), scores[top]
+
+    def search_ids_batch(self, vectors, k=6, mask=None):
+        # Many queries at once: one (queries × rows) matrix product instead of a scan per query
+        queries = np.asarray(vectors, dtype=np.float32)
+        norms = np.linalg.norm(queries, axis=1, keepdims=True)
+        queries = queries / np.where(norms == 0, 1.0, norms)
+        rows = np.flatnonzero(mask) if mask is not None else np.arange(len(self))
+        if not len(rows):
+            return [np.empty(0, dtype=np.int64) for _ in queries]
+        vectors = self.vectors if mask is None else self.vectors[rows]
+        scores = np.empty((len(queries), len(rows)), dtype=np.float32)
+        step = len(rows) if vectors.dtype == np.float32 else self.block_rows
+        for start in range(0, len(rows), step):
+            block = vectors[start:start + step]
+            scores[:, start:start + len(block)] = queries @ block.astype(np.float32, copy=False).T
+        if scores.shape[1] > k:
+            top = np.argpartition(-scores, k, axis=1)[:, :k]
+        else:
+            top = np.tile(np.arange(scores.shape[1]), (len(queries), 1))
+        order = np.take_along_axis(scores, top, axis=1).argsort(axis=1)[:, ::-1]
+        return list(rows[np.take_along_axis(top, order, axis=1)])
+
+    def search_batch(self, vectors, k=6, mask=None):
+        return [[self.document(i) for i in ids] for ids in self.search_ids_batch(vectors, k=k, mask=mask)]
+
+    def search(self, vector, k=6, mask=None):
+        ids, _ = self.search_ids(vector, k=k, mask=mask)
+        return [self.document(i) for i in ids]
+
+    def similarity_search_by_vector(self, embedding, k=4, filter=None, **kwargs):
+        # Same call the agent makes on Chroma, so either can sit behind agent.vectorstore
+        return self.search(embedding, k=k, mask=self.mask_where(filter) if filter else None)
+
+    # === Chroma-collection-like reads, for the BM25 builder and the router ===
+    def count(self):
+        return len(self)
+
+    def get(self, include=None, limit=None, offset=0, **kwargs):
+        end = len(self) if limit is None else min(len(self), offset + limit)
+        rows = range(offset, end)
+        return {
+            "ids": [str(i) for i in rows],
+            "documents": [self.text(i) for i in rows],
+            "metadatas": [self.metadata(i) for i in rows]
+        }
+
+
+def index_file_stat(path):
+    # build_flat_index swaps in a whole new directory, so (inode, mtime, size) of index.json + vectors.npy
+    # change with every rebuild
+    stat = []
+    for name in ("index.json", "vectors.npy"):
+        try:
+            st = os.stat(os.path.join(path, name))
+        except OSError:
+            stat.append(None)
+            continue
+        stat.append((st.st_ino, st.st_mtime_ns, st.st_size))
+    return tuple(stat)
+
+
+def build_flat_index(collection, path, dtype="float32", page_size=5000):
+    # Copies vectors, texts and metadata out of the Chroma collection (no re-embedding), page by page.
+    # Written to a temp directory and swapped in, so a running server never sees a half-built index.
+    count = collection.count()
+    if count == 0:
+        raise ValueError("The collection is empty, nothing to index")
+    tmp_path = path.rstrip("/") + ".tmp"
+    shutil.rmtree(tmp_path, ignore_errors=True)
+    os.makedirs(tmp_path)
+
+    vectors, offsets, codes = None, np.zeros(count + 1, dtype=np.int64), {field: np.zeros(count, dtype=np.int32) for field in META_FIELDS}
+    value_codes = {field: {} for field in META_FIELDS}
+    content_hash = hashlib.sha1()  # texts + metadata, what the BM25 built from this index is checked against
+    row = 0
+    with open(os.path.join(tmp_path, "texts.bin"), "wb") as texts:
+        while row < count:
+            page = collection.get(include=["embeddings", "documents", "metadatas"], limit=page_size, offset=row)
+            if not len(page["ids"]):
+                break
+            embeddings = np.asarray(page["embeddings"], dtype=np.float32)
+            if vectors is None:
+                vectors = np.lib.format.open_memmap(os.path.join(tmp_path, "vectors.npy"), mode="w+",
+                                                    dtype=np.dtype(dtype), shape=(count, embeddings.shape[1]))
+            norms = np.linalg.norm(embeddings, axis=1, keepdims=True)
+            vectors[row:row + len(embeddings)] = embeddings / np.where(norms == 0, 1.0, norms)
+
+            for text, metadata in zip(page["documents"], page["metadatas"]):
+                data = (text or "").encode("utf-8")
+                texts.write(data)
+                content_hash.update(data + b"\0" + json.dumps(metadata or {}, sort_keys=True, default=str).encode("utf-8") + b"\n")
+                offsets[row + 1] = offsets[row] + len(data)
+                for field in META_FIELDS:
+                    value = (metadata or {}).get(field)
+                    codes[field][row] = value_codes[field].setdefault(value, len(value_codes[field]))
+                row += 1
+    if row != count:
+        raise RuntimeError(f"The collection changed during the build ({row} of {count} chunks read)")
+
+    vectors.flush()
+    del vectors
+    np.save(os.path.join(tmp_path, "text_offsets.npy"), offsets)
+    for field in META_FIELDS:
+        np.save(os.path.join(tmp_path, f"meta_{field}.npy"), codes[field])
+    with open(os.path.join(tmp_path, "index.json"), "w", encoding="utf-8") as f:
+        json.dump({"count": row, "dtype": dtype, "fingerprint": content_hash.hexdigest(),
+                   "values": {field: list(value_codes[field]) for field in META_FIELDS}}, f, ensure_ascii=False)
+
+    old_path = path.rstrip("/") + ".old"
+    shutil.rmtree(old_path, ignore_errors=True)
+    if os.path.exists(path):
+        os.replace(path, old_path)
+    os.replace(tmp_path, path)
+    shutil.rmtree(old_path, ignore_errors=True)
+    return row
+
+
+def load_flat_index(path=None):
+    path = path or os.getenv("FLAT_INDEX_PATH", "flat_index")
+    if not os.path.exists(os.path.join(path, "index.json")):
+        raise FileNotFoundError(f"No flat index at {path}, build it with scripts/build_flat_index.py")
+    return FlatIndex(path)
@@ -0,0 +1,112 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+from collections import OrderedDict
+
+
+# === Chat transcript shown in the web UI (question, answer, sources, timings per entry) ===
+# Kept server-side and keyed by the session id, so the cookie only carries the sid.
+# Pages are read newest-first by id: page(sid, before=<oldest id on screen>) returns the page above it.
+
+class InMemoryHistoryStore:
+    def __init__(self, max_sessions=1000, max_entries=500):
+        self.max_sessions = max_sessions
+        self.max_entries = max_entries
+        self._sessions = OrderedDict()
+        self._next_id = 1
+        self._lock = threading.Lock()
+
+    def append(self, session_id, entry):
+        with self._lock:
+            entry = {**entry, "id": self._next_id}
+            self._next_id += 1
+            entries = self._sessions.pop(session_id, [])
+            entries.append(entry)
+            self._sessions[session_id] = entries[-self.max_entries:]
+            while len(self._sessions) > self.max_sessions:
+                self._sessions.popitem(last=False)
+            return entry["id"]
+
+    def page(self, session_id, before=None, limit=20):
+        # (entries oldest → newest, id to pass as `before` for the previous page or None)
+        with self._lock:
+            entries = self._sessions.get(session_id, [])
+            if before is not None:
+                entries = [e for e in entries if e["id"] < before]
+            page = entries[-limit:]
+            more = len(entries) > len(page)
+        return list(page), (page[0]["id"] if more and page else None)
+
+    def clear(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+
+
+class SQLiteHistoryStore:
+    def __init__(self, db_path="chat_logs/history.sqlite3", max_entries=500):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        conn = sqlite3.connect(db_path, timeout=30)
+        with conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS history ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " session_id TEXT NOT NULL,"
+                " created_at REAL NOT NULL,"
+                " entry TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_history_session ON history (session_id, id)")
+        conn.close()
+
+    def _connect(self):
+        # One connection per thread and per process: the store may be created in a pre-fork parent
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def append(self, session_id, entry):
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "INSERT INTO history (session_id, created_at, entry) VALUES (?, ?, ?)",
+                (session_id, time.time(), json.dumps(entry, ensure_ascii=False, default=str))
+            )
+            conn.execute(
+                "DELETE FROM history WHERE session_id = ? AND id NOT IN ("
+                " SELECT id FROM history WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                (session_id, session_id, self.max_entries)
+            )
+            return cursor.lastrowid
+
+    def page(self, session_id, before=None, limit=20):
+        rows = self._connect().execute(
+            "SELECT id, entry FROM history WHERE session_id = ? AND id < ? ORDER BY id DESC LIMIT ?",
+            (session_id, before if before is not None else 2 ** 63 - 1, limit + 1)
+        ).fetchall()
+        more = len(rows) > limit
+        rows = rows[:limit]
+        entries = [{**json.loads(entry), "id": row_id} for row_id, entry in reversed(rows)]
+        return entries, (entries[0]["id"] if more and entries else None)
+
+    def clear(self, session_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM history WHERE session_id = ?", (session_id,))
+
+
+def create_history_store(backend=None):
+    backend = backend or os.getenv("HISTORY_BACKEND", "sqlite")
+    max_entries = int(os.getenv("HISTORY_MAX_ENTRIES", 500))
+    if backend == "sqlite":
+        return SQLiteHistoryStore(db_path=os.getenv("HISTORY_DB_PATH", "chat_logs/history.sqlite3"), max_entries=max_entries)
+    if backend == "memory":
+        return InMemoryHistoryStore(max_sessions=int(os.getenv("HISTORY_MAX_SESSIONS", 1000)), max_entries=max_entries)
+    raise ValueError(f"Unknown history backend: {backend}")
@@ -0,0 +1,254 @@
+import os
+import json
+import sqlite3
+import logging
+import itertools
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage, messages_from_dict, messages_to_dict
+
+from agents.context_builder import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+# === In-process LRU store ===
+class InMemorySessionStore:
+    def __init__(self, max_sessions=1000, max_messages=50):
+        self.max_sessions = max_sessions
+        self.max_messages = max_messages
+        self._sessions = OrderedDict()
+        self._summaries = {}
+        self._ids = itertools.count(1)  # message ids, so a summary drops exactly the messages it covers
+        self._lock = threading.Lock()
+
+    def get_messages(self, session_id, limit=None):
+        with self._lock:
+            messages = self._sessions.get(session_id)
+            if messages is None:
+                return []
+            self._sessions.move_to_end(session_id)
+            messages = list(messages)
+        return messages[-limit:] if limit else messages
+
+    def add_turn(self, session_id, question, answer):
+        with self._lock:
+            messages = self._sessions.pop(session_id, [])
+            messages = messages + [HumanMessage(content=question, id=str(next(self._ids))),
+                                   AIMessage(content=answer, id=str(next(self._ids)))]
+            self._sessions[session_id] = messages[-self.max_messages:]
+            while len(self._sessions) > self.max_sessions:
+                evicted, _ = self._sessions.popitem(last=False)
+                self._summaries.pop(evicted, None)
+
+    def get_summary(self, session_id):
+        with self._lock:
+            return self._summaries.get(session_id, "")
+
+    def set_summary(self, session_id, summary, drop_ids=()):
+        # Replaces the running summary and drops the messages it now covers (by id: add_turn may have
+        # trimmed the session since they were read)
+        drop_ids = set(drop_ids)
+        with self._lock:
+            if session_id not in self._sessions:
+                return
+            self._summaries[session_id] = summary
+            self._sessions[session_id] = [m for m in self._sessions[session_id] if m.id not in drop_ids]
+
+    def clear(self, session_id):
+        with self._lock:
+            self._sessions.pop(session_id, None)
+            self._summaries.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._sessions)
+
+
+# === On-disk SQLite store (shared between workers) ===
+class SQLiteSessionStore:
+    def __init__(self, db_path="chat_logs/memory.sqlite3", max_messages=50):
+        self.db_path = db_path
+        self.max_messages = max_messages
+        self._local = threading.local()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS messages ("
+                " id INTEGER PRIMARY KEY AUTOINCREMENT,"
+                " session_id TEXT NOT NULL,"
+                " message TEXT NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_messages_session ON messages (session_id, id)")
+            conn.execute("CREATE TABLE IF NOT EXISTS summaries (session_id TEXT PRIMARY KEY, summary TEXT NOT NULL)")
+
+    def _connect(self):
+        # One connection per thread; WAL lets several worker processes read while one writes
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            self._local.conn = conn
+        return conn
+
+    def get_messages(self, session_id, limit=None):
+        limit = limit or self.max_messages
+        rows = self._connect().execute(
+            "SELECT id, message FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?",
+            (session_id, limit)
+        ).fetchall()
+        messages = messages_from_dict([json.loads(row[1]) for row in reversed(rows)])
+        for message, row in zip(messages, reversed(rows)):
+            message.id = str(row[0])  # row id, what set_summary deletes by
+        return messages
+
+    def add_turn(self, session_id, question, answer):
+        payload = messages_to_dict([HumanMessage(content=question), AIMessage(content=answer)])
+        with self._connect() as conn:
+            conn.executemany(
+                "INSERT INTO messages (session_id, message) VALUES (?, ?)",
+                [(session_id, json.dumps(m, ensure_ascii=False)) for m in payload]
+            )
+            conn.execute(
+                "DELETE FROM messages WHERE session_id = ? AND id NOT IN ("
+                " SELECT id FROM messages WHERE session_id = ? ORDER BY id DESC LIMIT ?)",
+                (session_id, session_id, self.max_messages)
+            )
+
+    def get_summary(self, session_id):
+        row = self._connect().execute("SELECT summary FROM summaries WHERE session_id = ?", (session_id,)).fetchone()
+        return row[0] if row else ""
+
+    def set_summary(self, session_id, summary, drop_ids=()):
+        # Summary update and removal of the messages it covers happen in one transaction. Rows are
+        # deleted by id, so rows that add_turn trimmed (or another worker added) meanwhile aren't touched.
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO summaries (session_id, summary) VALUES (?, ?)"
+                " ON CONFLICT(session_id) DO UPDATE SET summary = excluded.summary",
+                (session_id, summary)
+            )
+            conn.executemany(
+                "DELETE FROM messages WHERE session_id = ? AND id = ?",
+                [(session_id, int(message_id)) for message_id in drop_ids]
+            )
+
+    def clear(self, session_id):
+        with self._connect() as conn:
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            conn.execute("DELETE FROM summaries WHERE session_id = ?", (session_id,))
+
+
+# === Token-bounded history with a rolling summary ===
+# Recent turns are kept verbatim while they fit in `window_tokens`; anything older is folded
+# into a running summary by a background thread, then dropped from the underlying store.
+class SummarizingMemory:
+    SUMMARY_PROMPT = (
+        "You maintain a running summary of a conversation between a George Brown College student and AskGeorge. "
+        "Merge the new lines into the current summary. Keep program names and codes, fees, dates and anything the "
+        "student said about themselves. Answer with the updated summary only, in at most {words} words."
+    )
+
+    def __init__(self, store, llm, window_tokens=600, window_messages=6, max_message_tokens=300, summary_words=120):
+        self.store = store
+        self.llm = llm
+        self.window_tokens = window_tokens
+        self.window_messages = window_messages
+        self.max_message_tokens = max_message_tokens
+        self.summary_words = summary_words
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="memory-summary")
+        self._pending = set()
+        self._lock = threading.Lock()
+
+    def _clip(self, message):
+        # A single long answer is cut down rather than crowding out the rest of the window
+        max_chars = self.max_message_tokens * 4
+        if len(message.content) <= max_chars:
+            return message
+        return message.__class__(content=message.content[:max_chars] + " …")
+
+    def _split(self, messages):
+        # (older messages to summarize, recent window kept verbatim); the window starts on a question
+        used, start = 0, len(messages)
+        while start > 0 and len(messages) - start < self.window_messages:
+            tokens = estimate_tokens(self._clip(messages[start - 1]).content)
+            if used + tokens > self.window_tokens:
+                break
+            used += tokens
+            start -= 1
+        if start < len(messages) and isinstance(messages[start], AIMessage):
+            start += 1
+        return messages[:start], messages[start:]
+
+    def get_messages(self, session_id, limit=None):
+        _, window = self._split(self.store.get_messages(session_id))
+        if limit:
+            window = window[-limit:]
+        history = [self._clip(m) for m in window]
+        summary = self.store.get_summary(session_id)
+        if summary:
+            history.insert(0, SystemMessage(content=f"Summary of the earlier conversation: {summary}"))
+        return history
+
+    def add_turn(self, session_id, question, answer):
+        self.store.add_turn(session_id, question, answer)
+        with self._lock:
+            if session_id in self._pending:
+                return
+            self._pending.add(session_id)
+        self._executor.submit(self._summarize, session_id)
+
+    def _summarize(self, session_id):
+        try:
+            older, _ = self._split(self.store.get_messages(session_id))
+            if not older:
+                return
+            transcript = "\n".join(
+                f"{'Student' if isinstance(m, HumanMessage) else 'AskGeorge'}: {self._clip(m).content}" for m in older
+            )
+            summary = self.store.get_summary(session_id)
+            response = self.llm.invoke([
+                SystemMessage(content=self.SUMMARY_PROMPT.format(words=self.summary_words)),
+                HumanMessage(content=f"Current summary:\n{summary or '(none)'}\n\nNew lines:\n{transcript}")
+            ])
+            # Only the messages that went into the summary are dropped, whatever add_turn did meanwhile
+            self.store.set_summary(session_id, response.content.strip(), drop_ids=[m.id for m in older])
+        except Exception:
+            # Messages stay in the store (still capped by max_messages) and are retried on the next turn
+            logger.exception("Memory summary failed for session %s", session_id)
+        finally:
+            with self._lock:
+                self._pending.discard(session_id)
+
+    def clear(self, session_id):
+        self.store.clear(session_id)
+
+
+def create_memory_store(backend=None, llm=None):
+    # With an llm (and MEMORY_SUMMARY on) the store is wrapped in a token-bounded, summarizing window
+    backend = backend or os.getenv("MEMORY_BACKEND", "memory")
+    max_messages = int(os.getenv("MEMORY_MAX_MESSAGES", 50))
+    if backend == "sqlite":
+        store = SQLiteSessionStore(
+            db_path=os.getenv("MEMORY_DB_PATH", "chat_logs/memory.sqlite3"),
+            max_messages=max_messages
+        )
+    elif backend == "memory":
+        store = InMemorySessionStore(
+            max_sessions=int(os.getenv("MEMORY_MAX_SESSIONS", 1000)),
+            max_messages=max_messages
+        )
+    else:
+        raise ValueError(f"Unknown memory backend: {backend}")
+
+    if llm is None or os.getenv("MEMORY_SUMMARY", "on").lower() in ("0", "off", "false", "no"):
+        return store
+    return SummarizingMemory(
+        store,
+        llm,
+        window_tokens=int(os.getenv("MEMORY_WINDOW_TOKENS", 600)),
+        window_messages=int(os.getenv("MEMORY_WINDOW_MESSAGES", 6)),
+        max_message_tokens=int(os.getenv("MEMORY_MAX_MESSAGE_TOKENS", 300))
+    )
@@ -0,0 +1,132 @@
+import os
+import json
+import time
+import queue
+import atexit
+import threading
+from contextlib import contextmanager
+
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Histogram, generate_latest
+
+# === Prometheus metrics ===
+# With several workers (gunicorn), set PROMETHEUS_MULTIPROC_DIR so /metrics aggregates all of them.
+# prometheus_client writes there but doesn't create it; gunicorn.conf.py also clears it at startup.
+if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+    os.makedirs(os.getenv("PROMETHEUS_MULTIPROC_DIR"), exist_ok=True)
+
+STAGE_SECONDS = Histogram(
+    "askgeorge_stage_seconds", "Latency of each stage of a chat request (embed, retrieve, vector_search, prompt, llm_ttft, llm_total, total)", ["stage"],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30)
+)
+TOKENS = Histogram(
+    "askgeorge_tokens", "Prompt (in) and completion (out) tokens per LLM call", ["direction"],
+    buckets=(64, 128, 256, 512, 1024, 2048, 4096, 8192)
+)
+REQUESTS = Counter("askgeorge_requests_total", "Chat requests", ["mode", "cached"])
+
+
+def metrics_response():
+    # (body, content type) for the /metrics endpoint
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(), CONTENT_TYPE_LATEST
+
+
+@contextmanager
+def timed(timings, stage):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = time.perf_counter() - start
+
+
+def observe(mode, cached, timings, tokens_in=None, tokens_out=None):
+    REQUESTS.labels(mode=mode, cached=str(cached).lower()).inc()
+    for stage, seconds in timings.items():
+        STAGE_SECONDS.labels(stage=stage).observe(seconds)
+    if tokens_in is not None:
+        TOKENS.labels(direction="in").observe(tokens_in)
+    if tokens_out is not None:
+        TOKENS.labels(direction="out").observe(tokens_out)
+
+
+# === Structured request log ===
+# Records are queued by the request thread and written in batches by one background thread,
+# as a single O_APPEND write per batch, so workers can share one file without interleaving lines.
+class AsyncJSONLLogger:
+    def __init__(self, path="logs/requests.jsonl", batch_size=200, flush_interval=1.0, max_queue=10000):
+        self.path = path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._thread = None
+        self._lock = threading.Lock()
+        self.dropped = 0
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        atexit.register(self.flush)
+
+    def _ensure_worker(self):
+        # Started lazily (and restarted after a fork) like the embedding batcher
+        if self._thread is None or not self._thread.is_alive():
+            with self._lock:
+                if self._thread is None or not self._thread.is_alive():
+                    self._thread = threading.Thread(target=self._worker, name="request-log", daemon=True)
+                    self._thread.start()
+
+    def log(self, record):
+        self._ensure_worker()
+        try:
+            self._queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1  # never block a request on logging
+
+    def _drain(self, first=None):
+        batch = [] if first is None else [first]
+        while len(batch) < self.batch_size:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch):
+        if not batch:
+            return
+        data = "".join(json.dumps(record, ensure_ascii=False, default=str) + "\n" for record in batch).encode("utf-8")
+        fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+        try:
+            os.write(fd, data)
+        finally:
+            os.close(fd)
+
+    def _worker(self):
+        while True:
+            try:
+                first = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                continue
+            time.sleep(min(self.flush_interval, 0.05))  # let a burst accumulate into one write
+            try:
+                self._write(self._drain(first))
+            except OSError as e:
+                print(f"⚠️ Request log write failed | {e}")
+
+    def flush(self):
+        while not self._queue.empty():
+            self._write(self._drain())
+
+
+def create_request_logger():
+    path = os.getenv("REQUEST_LOG_PATH", "")
+    if not path:
+        return None
+    return AsyncJSONLLogger(
+        path,
+        batch_size=int(os.getenv("REQUEST_LOG_BATCH", 200)),
+        flush_interval=float(os.getenv("REQUEST_LOG_FLUSH_S", 1.0))
+    )
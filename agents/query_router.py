@@ -0,0 +1,90 @@
+import re
+
+import numpy as np
+
+# === Routes ===
+# Each route is matched by keywords (or, failing that, by embedding similarity to its description)
+# and resolves to the source files in the index whose names match `sources`.
+ROUTES = {
+    "tuition": {
+        "keywords": ["tuition", "fee", "fees", "cost", "costs", "pay", "payment", "osap", "financial aid",
+                     "scholarship", "scholarships", "bursary", "bursaries", "refund"],
+        "sources": r"tuition|fee|financial|payment|osap|refund|scholarship|award",
+        "description": "tuition fees, costs, payments, refunds, OSAP, scholarships and financial aid"
+    },
+    "admissions": {
+        "keywords": ["apply", "application", "admission", "admissions", "requirements", "deadline", "deadlines",
+                     "international", "visa", "study permit", "enrol", "enroll", "enrolment", "enrollment"],
+        "sources": r"admission|international|apply|application|enrol",
+        "description": "applying to college, admission requirements, deadlines and international student applications"
+    },
+    "d2l": {
+        "keywords": ["d2l", "brightspace", "course shell", "online learning"],
+        "sources": r"d2l|brightspace",
+        "description": "logging in to D2L Brightspace and online course materials"
+    },
+    "coned": {
+        "keywords": ["continuing education", "coned", "con ed", "part-time", "part time", "evening", "weekend course"],
+        "sources": r"coned|courses_and_programs|registration|course",
+        "description": "continuing education part-time courses and course registration"
+    },
+    "student_services": {
+        "keywords": ["co-op", "coop", "career", "careers", "accessibility", "aoda", "orientation", "counselling",
+                     "student life", "student services", "field education"],
+        "sources": r"co_op|career|accessib|aoda|orientation|student|field_education",
+        "description": "co-op, career services, accessibility, orientation and student services"
+    },
+}
+
+# Program codes look like T127, C101, S115 (raw_programs/{code}.txt)
+PROGRAM_CODE_RE = re.compile(r"\b([a-z]\d{3})\b", re.IGNORECASE)
+
+
+class QueryRouter:
+    def __init__(self, source_files, embeddings=None, routes=ROUTES, embed_threshold=0.5):
+        self.source_files = sorted(set(source_files))
+        self.embeddings = embeddings
+        self.embed_threshold = embed_threshold
+        self.routes = {}
+        for name, route in routes.items():
+            pattern = re.compile(route["sources"], re.IGNORECASE)
+            files = [f for f in self.source_files if pattern.search(f)]
+            if not files:
+                continue  # nothing in the index for this route
+            keyword_re = re.compile(r"\b(" + "|".join(re.escape(k) for k in route["keywords"]) + r")\b", re.IGNORECASE)
+            self.routes[name] = {"keywords": keyword_re, "files": files, "description": route["description"]}
+        self._file_lookup = {f.lower(): f for f in self.source_files}
+        self._descriptions = None
+
+    def _description_matrix(self):
+        # Route descriptions are embedded once, on first use
+        if self._descriptions is None:
+            names = list(self.routes)
+            vectors = np.asarray(self.embeddings.embed_documents([self.routes[n]["description"] for n in names]), dtype=np.float32)
+            vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+            self._descriptions = (names, vectors)
+        return self._descriptions
+
+    def route(self, question, vector=None):
+        # Returns {"routes": [...], "source_files": [...]} or None to search everything
+        files = [
+            self._file_lookup[f"{code.lower()}.txt"]
+            for code in PROGRAM_CODE_RE.findall(question)
+            if f"{code.lower()}.txt" in self._file_lookup
+        ]
+        if files:
+            return {"routes": ["program"], "source_files": files}
+
+        names = [name for name, route in self.routes.items() if route["keywords"].search(question)]
+        if not names and vector is not None and self.embeddings is not None and self.routes:
+            route_names, matrix = self._description_matrix()
+            query = np.asarray(vector, dtype=np.float32)
+            scores = matrix @ (query / (np.linalg.norm(query) or 1.0))
+            best = int(np.argmax(scores))
+            if scores[best] >= self.embed_threshold:
+                names = [route_names[best]]
+
+        if not names:
+            return None
+        files = sorted({f for name in names for f in self.routes[name]["files"]})
+        return {"routes": names, "source_files": files}
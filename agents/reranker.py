@@ -0,0 +1,68 @@
+import os
+import time
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
+
+
+# === Cross-encoder reranking with a hard latency budget ===
+# Candidates are rescored in small batches on a worker thread. If scoring hasn't finished
+# within `budget_ms`, the request gets the retriever's own order and the worker stops at
+# the next batch boundary.
+class CrossEncoderReranker:
+    def __init__(self, model_name="cross-encoder/ms-marco-MiniLM-L-6-v2", budget_ms=200, batch_size=8, max_length=256):
+        from sentence_transformers import CrossEncoder
+
+        self.model = CrossEncoder(model_name, max_length=max_length, device="cpu")
+        self.budget = budget_ms / 1000
+        self.batch_size = batch_size
+        self._pool = ThreadPoolExecutor(max_workers=int(os.getenv("RERANK_THREADS", 2)), thread_name_prefix="rerank")
+        self._lock = threading.Lock()
+        self.reranked = 0
+        self.fallbacks = 0
+
+    def _score(self, question, docs, cancelled):
+        scores = []
+        for start in range(0, len(docs), self.batch_size):
+            if cancelled.is_set():
+                return None
+            batch = docs[start:start + self.batch_size]
+            scores.extend(self.model.predict([(question, doc.page_content) for doc in batch], batch_size=self.batch_size))
+        return scores
+
+    def rerank(self, question, docs, top_n):
+        if len(docs) <= 1:
+            return docs[:top_n]
+
+        cancelled = threading.Event()
+        deadline = time.perf_counter() + self.budget
+        future = self._pool.submit(self._score, question, docs, cancelled)
+        try:
+            scores = future.result(timeout=max(deadline - time.perf_counter(), 0))
+        except FutureTimeout:
+            cancelled.set()
+            with self._lock:
+                self.fallbacks += 1
+            return docs[:top_n]
+
+        with self._lock:
+            self.reranked += 1
+        order = sorted(range(len(docs)), key=lambda i: scores[i], reverse=True)
+        return [docs[i] for i in order[:top_n]]
+
+    def stats(self):
+        total = self.reranked + self.fallbacks
+        return {
+            "reranked": self.reranked,
+            "fallbacks": self.fallbacks,
+            "fallback_rate": round(self.fallbacks / total, 4) if total else 0.0
+        }
+
+
+def create_reranker():
+    if os.getenv("RERANKER", "off").lower() in ("0", "off", "false", "no"):
+        return None
+    return CrossEncoderReranker(
+        model_name=os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2"),
+        budget_ms=float(os.getenv("RERANK_BUDGET_MS", 200)),
+        batch_size=int(os.getenv("RERANK_BATCH_SIZE", 8))
+    )
@@ -0,0 +1,62 @@
+import os
+import gc
+import time
+import threading
+
+_agent = None
+_shared = None
+_lock = threading.Lock()
+
+
+# === Process-wide agent: built on first use instead of at import ===
+def get_agent():
+    global _agent
+    if _agent is None:
+        with _lock:
+            if _agent is None:
+                from agents.conversational_agent import ConversationalAgent
+
+                _agent = ConversationalAgent(persist_path=os.getenv("CHROMA_PATH", "chroma_index"), shared=_shared)
+    return _agent
+
+
+def warm_up(question="How much is tuition at George Brown?"):
+    # Builds the agent and runs one retrieval (model forward pass, index segments, BM25, router,
+    # reranker) so the first user request doesn't pay for it. The LLM is not called.
+    start = time.perf_counter()
+    agent = get_agent()
+    built = time.perf_counter()
+    vector = agent.embeddings.embed_query(question)
+    agent._retrieve_docs(question, vector)
+    done = time.perf_counter()
+    timings = {"build_s": round(built - start, 3), "first_retrieval_s": round(done - built, 3)}
+    print(f"🔥 Agent warm (pid {os.getpid()}): built in {timings['build_s']}s, first retrieval in {timings['first_retrieval_s']}s")
+    return timings
+
+
+# === Pre-fork serving ===
+# The parent loads the read-only components once; each forked worker then builds its own agent
+# (thread pools, Chroma client, LLM client, memory) on top of them. Nothing that owns threads,
+# sockets or SQLite handles is created before the fork.
+def preload():
+    global _shared
+    from agents.conversational_agent import load_shared_components
+
+    start = time.perf_counter()
+    with _lock:
+        if _shared is None:
+            _shared = load_shared_components(os.getenv("CHROMA_PATH", "chroma_index"))
+            _release_chroma()
+    # Parked in the permanent generation so the collector doesn't write to (and un-share) their pages
+    gc.collect()
+    gc.freeze()
+    print(f"📦 Preloaded shared components in {time.perf_counter() - start:.2f}s (pid {os.getpid()})")
+
+
+def _release_chroma():
+    # Chroma caches its client (and SQLite connections) per path; those must not be inherited by workers
+    try:
+        from chromadb.api.client import SharedSystemClient
+    except ImportError:
+        return
+    SharedSystemClient.clear_system_cache()
@@ -1,33 +1,82 @@
-from flask import Flask, render_template, request, session, redirect, url_for, jsonify
+from flask import Flask, Response, render_template, request, session, redirect, url_for, jsonify, stream_with_context
+import json
 import time
 import os
+import logging
+import uuid
 from dotenv import load_dotenv
 from langchain_core.documents import Document
 load_dotenv()
 
-from agents.conversational_agent import ConversationalAgent
+from agents.history_store import create_history_store
+from agents.metrics import metrics_response
+from agents.runtime import get_agent, warm_up
 
 app = Flask(__name__)
 app.secret_key = 'your-secret-key'  # ⚠️ Use a secure random key in production
 port = int(os.environ.get("PORT", 10000))
+logger = logging.getLogger(__name__)
 
-# 🌐 Initialize LangChain-based agent with memory + Gemini + ChromaDB
-agent = ConversationalAgent(persist_path="chroma_index")
+# Sent to the browser when a stream fails; the exception itself only goes to the server log
+STREAM_ERROR = "⚠️ Sorry, something went wrong while answering. Please try again."
 
+# 🌐 The LangChain agent (memory + Gemini + ChromaDB) is built on first use via get_agent();
+# servers call warm_up() at startup (or preload it pre-fork, see gunicorn.conf.py)
+
+
+def get_session_id():
+    # Conversation memory lives server-side, keyed by this id
+    if 'sid' not in session:
+        session['sid'] = uuid.uuid4().hex
+    return session['sid']
+
+
+def build_entry(question, result, start_time):
+    source_files = [
+        doc.metadata.get("source_file", "unknown")
+        if isinstance(doc, Document) else "unknown"
+        for doc in result["sources"]
+    ]
+    return {
+        "question": question,
+        "answer": result["answer"],
+        "sources": source_files,
+        "llm": "gemini",
+        "timing": {
+            "total": round(time.time() - start_time, 2),
+            "stages_ms": result.get("timings")
+        },
+        "tokens": result.get("tokens"),
+        "history_len": len(result["chat_history"]),
+        "cached": result.get("cached", False),
+        "context": result.get("context_stats")
+    }
+
+
+# The transcript shown in chat.html lives server-side (agents/history_store.py), keyed by the sid,
+# so the cookie stays a few bytes and streamed answers can be saved after the headers are sent.
+history_store = create_history_store()
+HISTORY_PAGE_SIZE = int(os.getenv("HISTORY_PAGE_SIZE", 20))
+
+def reset_chat_history():
+    session_id = get_session_id()
+    get_agent().clear_memory(session_id)
+    history_store.clear(session_id)
+
+
+def sse(event, data):
+    return f"event: {event}\ndata: {json.dumps(data, ensure_ascii=False)}\n\n"
 
 @app.route('/', methods=['GET', 'POST'])
 def select_model():
     if request.method == 'POST':
         # No model selection needed anymore; only Gemini for now
-        session['chat_history'] = []
+        reset_chat_history()
         return redirect(url_for('chat'))
     return render_template('select_model.html')
 
 @app.route('/chat', methods=['GET', 'POST'])
 def chat():
-    if 'chat_history' not in session:
-        session['chat_history'] = []
-
     if request.method == 'POST':
         question = request.form.get('question', '').strip()
 
@@ -35,42 +84,74 @@ def chat():
             return jsonify({"answer": "Please ask a question.", "question": ""}), 400
 
         start_time = time.time()
-        result = agent.run(question)
-        answer = result["answer"]
-        chat_history = result["chat_history"]
-        source_files = [
-            doc.metadata.get("source_file", "unknown")
-            if isinstance(doc, Document) else "unknown"
-            for doc in result["sources"]
-        ]
-
-        entry = {
-            "question": question,
-            "answer": answer,
-            "sources": source_files,
-            "llm": "gemini",
-            "timing": {
-                "total": round(time.time() - start_time, 2)
-            },
-            "history_len": len(chat_history)
-        }
-
-        session['chat_history'].append(entry)
-        session.modified = True
-
-        return jsonify({"answer": answer, "question": question})
+        result = get_agent().run(question, session_id=get_session_id())
+        entry = build_entry(question, result, start_time)
+        history_store.append(get_session_id(), entry)
 
+        return jsonify({"answer": entry["answer"], "question": question})
+
+    session.pop('chat_history', None)  # transcripts left in cookies by older versions
+    chat_history, next_before = history_store.page(get_session_id(), limit=HISTORY_PAGE_SIZE)
     return render_template(
         'chat.html',
-        chat_history=session.get('chat_history', []),
+        chat_history=chat_history,
+        next_before=next_before,
         selected_llm="gemini"
     )
 
+@app.route('/chat/history')
+def chat_history_page():
+    # Older pages of the transcript, fetched by chat.html when scrolled to the top
+    before = request.args.get('before', type=int)
+    limit = min(request.args.get('limit', HISTORY_PAGE_SIZE, type=int), 100)
+    entries, next_before = history_store.page(get_session_id(), before=before, limit=limit)
+    return jsonify({"entries": entries, "next_before": next_before})
+
+@app.route('/chat/stream', methods=['POST'])
+def chat_stream():
+    question = request.form.get('question', '').strip()
+    if not question:
+        return jsonify({"answer": "Please ask a question.", "question": ""}), 400
+
+    session_id = get_session_id()
+
+    def generate():
+        start_time = time.time()
+        try:
+            for event in get_agent().stream(question, session_id=session_id):
+                if event["type"] == "token":
+                    yield sse("token", {"content": event["content"]})
+                else:
+                    entry = build_entry(question, event, start_time)
+                    history_store.append(session_id, entry)
+                    yield sse("done", {"answer": entry["answer"], "sources": entry["sources"], "timing": entry["timing"]})
+        except Exception:
+            logger.exception("Streaming answer failed (session %s)", session_id)
+            yield sse("error", {"answer": STREAM_ERROR})
+
+    return Response(
+        stream_with_context(generate()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+@app.route('/cache/stats')
+def cache_stats():
+    answer_cache = get_agent().answer_cache
+    if answer_cache is None:
+        return jsonify({"enabled": False})
+    return jsonify({"enabled": True, **answer_cache.stats()})
+
+@app.route('/metrics')
+def metrics():
+    body, content_type = metrics_response()
+    return Response(body, mimetype=content_type)
+
 @app.route('/clear')
 def clear():
-    session.pop('chat_history', None)
-    session.modified = True
+    reset_chat_history()
     return redirect(url_for('chat'))
 
 if __name__ == "__main__":
+    warm_up()
     app.run(host="0.0.0.0", port=port)
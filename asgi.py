@@ -0,0 +1,90 @@
+import time
+import uuid
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.responses import JSONResponse, StreamingResponse
+from starlette.routing import Mount, Route
+
+# Reuse the Flask app for pages/sessions; only the LLM-bound routes are served natively async
+import app as flask_app
+from agents.runtime import get_agent, warm_up
+
+logger = logging.getLogger(__name__)
+
+
+def get_session_id(request):
+    # Read the sid out of Flask's signed session cookie so both apps share one conversation
+    cookie = request.cookies.get(flask_app.app.config["SESSION_COOKIE_NAME"])
+    serializer = flask_app.app.session_interface.get_signing_serializer(flask_app.app)
+    if cookie and serializer:
+        try:
+            return serializer.loads(cookie).get("sid") or uuid.uuid4().hex
+        except Exception:
+            pass
+    return uuid.uuid4().hex
+
+
+async def chat(request):
+    form = await request.form()
+    question = (form.get("question") or "").strip()
+    if not question:
+        return JSONResponse({"answer": "Please ask a question.", "question": ""}, status_code=400)
+
+    session_id = get_session_id(request)
+    start_time = time.time()
+    result = await get_agent().arun(question, session_id=session_id)
+    entry = flask_app.build_entry(question, result, start_time)
+    await asyncio.to_thread(flask_app.history_store.append, session_id, entry)
+    return JSONResponse({"answer": entry["answer"], "question": question})
+
+
+async def chat_stream(request):
+    form = await request.form()
+    question = (form.get("question") or "").strip()
+    if not question:
+        return JSONResponse({"answer": "Please ask a question.", "question": ""}, status_code=400)
+
+    session_id = get_session_id(request)
+
+    async def generate():
+        start_time = time.time()
+        try:
+            async for event in get_agent().astream(question, session_id=session_id):
+                if event["type"] == "token":
+                    yield flask_app.sse("token", {"content": event["content"]})
+                else:
+                    entry = flask_app.build_entry(question, event, start_time)
+                    await asyncio.to_thread(flask_app.history_store.append, session_id, entry)
+                    yield flask_app.sse("done", {"answer": entry["answer"], "sources": entry["sources"], "timing": entry["timing"]})
+        except Exception:
+            logger.exception("Streaming answer failed (session %s)", session_id)
+            yield flask_app.sse("error", {"answer": flask_app.STREAM_ERROR})
+
+    return StreamingResponse(
+        generate(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@asynccontextmanager
+async def lifespan(app):
+    # Build + warm the agent before serving so the first request doesn't block the event loop on it
+    await asyncio.to_thread(warm_up)
+    yield
+
+
+app = Starlette(lifespan=lifespan, routes=[
+    Route("/chat", chat, methods=["POST"]),
+    Route("/chat/stream", chat_stream, methods=["POST"]),
+    Mount("/", app=WSGIMiddleware(flask_app.app)),
+])
+
+# Run with: uvicorn asgi:app --host 0.0.0.0 --port 10000
+if __name__ == "__main__":
+    import uvicorn
+    uvicorn.run(app, host="0.0.0.0", port=flask_app.port)
@@ -0,0 +1,63 @@
+# Sync (thread pool) vs async (semaphore-capped event loop) throughput against a stub LLM
+#
+#   python benchmarks/async_throughput.py --requests 200 --threads 8 --latency 0.5
+
+import os
+import sys
+import time
+import asyncio
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.dirname(__file__))
+
+from agents.conversational_agent import ConversationalAgent
+from stub_llm import StubChatModel
+
+QUESTION = "How much is tuition for international students?"
+
+
+def bench_sync(agent, n_requests, threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda i: agent.run(QUESTION, session_id=f"sync-{i}"), range(n_requests)))
+    return time.perf_counter() - start
+
+
+async def bench_async(agent, n_requests):
+    start = time.perf_counter()
+    await asyncio.gather(*(agent.arun(QUESTION, session_id=f"async-{i}") for i in range(n_requests)))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8, help="sync worker threads (like a threaded WSGI worker)")
+    parser.add_argument("--concurrency", type=int, default=100, help="max in-flight LLM calls on the async path")
+    parser.add_argument("--latency", type=float, default=0.5, help="stub LLM latency in seconds")
+    parser.add_argument("--persist-path", default=os.path.join(base_dir, "chroma_index"))
+    args = parser.parse_args()
+
+    # Every request asks the same question: with the answer cache on they would all be cache hits
+    os.environ["ANSWER_CACHE"] = "off"
+    agent = ConversationalAgent(
+        persist_path=args.persist_path,
+        llm=StubChatModel(latency=args.latency),
+        max_concurrency=args.concurrency
+    )
+    agent.run(QUESTION, session_id="warmup")
+
+    sync_time = bench_sync(agent, args.requests, args.threads)
+    async_time = asyncio.run(bench_async(agent, args.requests))
+
+    print(f"📊 {args.requests} requests, stub LLM latency {args.latency}s")
+    print(f"   sync  ({args.threads} threads):        {sync_time:.2f}s → {args.requests / sync_time:.1f} req/s")
+    print(f"   async (≤{args.concurrency} in flight):  {async_time:.2f}s → {args.requests / async_time:.1f} req/s")
+    print(f"   ⚡ speedup: {sync_time / async_time:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,145 @@
+# PyTorch vs int8 ONNX embeddings: equivalence (cosine per text, top-k retrieval overlap), load time,
+# query latency, batch throughput and memory. Each backend runs in a fresh interpreter.
+#
+#   python scripts/export_onnx_embeddings.py
+#   python benchmarks/embeddings.py --max-chunks 2000 --min-cosine 0.98
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.join(base_dir, "scripts"))
+sys.path.insert(0, os.path.dirname(__file__))
+
+from rag_suite import load_questions, percentiles
+from startup import memory_mb
+
+BACKENDS = ("torch", "onnx")
+
+
+def load_texts(chunk_store, questions_path, max_chunks):
+    from chunk_store import iter_chunks
+
+    questions = [item["question"] for item in load_questions(questions_path)]
+    chunks = []
+    for record in iter_chunks(chunk_store, columns=["text"]):
+        chunks.append(record["text"])
+        if len(chunks) >= max_chunks:
+            break
+    return questions, chunks
+
+
+def run_backend(backend, texts_path, vectors_path, batch_size):
+    # One backend in this interpreter: load, time queries and batches, save vectors for the comparison
+    with open(texts_path, encoding="utf-8") as f:
+        texts = json.load(f)
+    start = time.perf_counter()
+    os.environ["EMBEDDING_BACKEND"] = backend
+    from agents.embedding_backend import create_embeddings
+
+    embeddings = create_embeddings(batch_size=batch_size)
+    embeddings.embed_query("warm up")
+    load_s = time.perf_counter() - start
+
+    query_ms = []
+    for question in texts["questions"]:
+        t0 = time.perf_counter()
+        embeddings.embed_query(question)
+        query_ms.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    chunk_vectors = embeddings.embed_documents(texts["chunks"]) if texts["chunks"] else []
+    batch_s = time.perf_counter() - t0
+
+    vectors = np.array(embeddings.embed_documents(texts["questions"]) + chunk_vectors, dtype=np.float32)
+    np.save(vectors_path, vectors)
+    return {
+        "backend": backend,
+        "load_s": round(load_s, 3),
+        "query_ms": percentiles(query_ms),
+        "chunks_per_s": round(len(texts["chunks"]) / batch_s, 1) if texts["chunks"] else None,
+        **memory_mb()
+    }
+
+
+def compare(reference, candidate, n_questions, k):
+    ref = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    cand = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosine = (ref * cand).sum(axis=1)
+    result = {
+        "cosine_mean": round(float(cosine.mean()), 5),
+        "cosine_min": round(float(cosine.min()), 5),
+        "cosine_p1": round(float(np.percentile(cosine, 1)), 5)
+    }
+    # What retrieval sees: do the questions get the same top-k chunks from either backend?
+    if len(ref) > n_questions + k:
+        top_ref = np.argsort(-(ref[:n_questions] @ ref[n_questions:].T), axis=1)[:, :k]
+        top_cand = np.argsort(-(cand[:n_questions] @ cand[n_questions:].T), axis=1)[:, :k]
+        overlap = [len(set(a) & set(b)) / k for a, b in zip(top_ref, top_cand)]
+        result[f"top{k}_overlap"] = round(float(np.mean(overlap)), 4)
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", default=os.path.join(os.path.dirname(__file__), "questions.jsonl"))
+    parser.add_argument("--chunks", default=os.path.join(base_dir, "chunks", "chunks.jsonl"))
+    parser.add_argument("--max-chunks", type=int, default=2000)
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--min-cosine", type=float, default=0.98, help="fail if any text agrees less than this")
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--backend", choices=BACKENDS, help=argparse.SUPPRESS)
+    parser.add_argument("--texts", help=argparse.SUPPRESS)
+    parser.add_argument("--vectors", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.backend:
+        print(json.dumps(run_backend(args.backend, args.texts, args.vectors, args.batch_size)))
+        return
+
+    questions, chunks = load_texts(args.chunks, args.questions, args.max_chunks)
+    print(f"📚 {len(questions)} questions, {len(chunks)} chunks")
+    with tempfile.TemporaryDirectory() as tmp:
+        texts_path = os.path.join(tmp, "texts.json")
+        with open(texts_path, "w", encoding="utf-8") as f:
+            json.dump({"questions": questions, "chunks": chunks}, f)
+
+        results, vectors = {}, {}
+        for backend in BACKENDS:
+            vectors_path = os.path.join(tmp, f"{backend}.npy")
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "--backend", backend, "--texts", texts_path,
+                                  "--vectors", vectors_path, "--batch-size", str(args.batch_size)],
+                                 cwd=base_dir, capture_output=True, text=True, check=True).stdout
+            results[backend] = json.loads(out.strip().splitlines()[-1])
+            vectors[backend] = np.load(vectors_path)
+
+    results["equivalence"] = compare(vectors["torch"], vectors["onnx"], len(questions), args.k)
+
+    print(f"{'backend':>8} {'load s':>8} {'query p50 ms':>13} {'query p95 ms':>13} {'chunks/s':>9} {'RSS MB':>8} {'private MB':>11}")
+    for backend in BACKENDS:
+        r = results[backend]
+        print(f"{backend:>8} {r['load_s']:>8} {r['query_ms']['p50']:>13} {r['query_ms']['p95']:>13} "
+              f"{str(r['chunks_per_s']):>9} {r['rss_mb']:>8} {r['private_mb']:>11}")
+    print(f"🔍 Equivalence: {results['equivalence']}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+    if results["equivalence"]["cosine_min"] < args.min_cosine:
+        print(f"❌ ONNX vectors disagree with PyTorch (min cosine {results['equivalence']['cosine_min']} < {args.min_cosine})")
+        sys.exit(1)
+    print("✅ ONNX embeddings match the PyTorch model")
+
+
+if __name__ == "__main__":
+    main()
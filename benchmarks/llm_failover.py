@@ -0,0 +1,85 @@
+# Tail latency of the provider chain against local stub servers (no API calls)
+#
+#   python benchmarks/llm_failover.py --requests 200 --slow-rate 0.1 --hedge-after-ms 400
+
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from langchain_core.messages import HumanMessage
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.dirname(__file__))
+
+from llm.providers import OllamaProvider, OpenAIProvider
+from llm.resilient import ResilientChatModel
+from stub_llm_server import start_stub_server
+
+
+def run(llm, n, concurrency):
+    messages = [HumanMessage(content="How much is tuition?")]
+
+    def one(_):
+        start = time.perf_counter()
+        try:
+            llm.invoke(messages)
+            return (time.perf_counter() - start) * 1000, None
+        except Exception as e:
+            return (time.perf_counter() - start) * 1000, e
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        results = list(pool.map(one, range(n)))
+    latencies = [ms for ms, error in results if error is None]
+    return {
+        "ok": len(latencies),
+        "errors": sum(error is not None for _, error in results),
+        "p50_ms": round(float(np.percentile(latencies, 50)), 1) if latencies else None,
+        "p95_ms": round(float(np.percentile(latencies, 95)), 1) if latencies else None,
+        "p99_ms": round(float(np.percentile(latencies, 99)), 1) if latencies else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--latency", type=float, default=0.2, help="primary first-token latency (s)")
+    parser.add_argument("--slow-rate", type=float, default=0.1, help="share of primary requests that stall")
+    parser.add_argument("--slow-latency", type=float, default=3.0)
+    parser.add_argument("--timeout", type=float, default=5.0, help="per-provider first-token timeout (s)")
+    parser.add_argument("--hedge-after-ms", type=float, default=400)
+    args = parser.parse_args()
+
+    primary, _ = start_stub_server(latency=args.latency, slow_rate=args.slow_rate, slow_latency=args.slow_latency, seed=1)
+    backup, backup_config = start_stub_server(latency=args.latency * 1.5, seed=2)
+    down, _ = start_stub_server(error_rate=1.0)
+
+    def chain(primary_port, hedge_after_ms=None):
+        return ResilientChatModel(
+            providers=[
+                OpenAIProvider("stub", f"http://127.0.0.1:{primary_port}", timeout=args.timeout),
+                OllamaProvider("stub", f"http://127.0.0.1:{backup.server_address[1]}", timeout=args.timeout),
+            ],
+            hedge_after_ms=hedge_after_ms
+        )
+
+    scenarios = [
+        ("slow primary, no hedge", chain(primary.server_address[1])),
+        (f"slow primary, hedge {args.hedge_after_ms:g}ms", chain(primary.server_address[1], args.hedge_after_ms)),
+        ("primary down (failover)", chain(down.server_address[1])),
+    ]
+
+    print(f"{'':>28} {'ok':>5} {'err':>4} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, llm in scenarios:
+        before = backup_config.requests
+        result = run(llm, args.requests, args.concurrency)
+        print(f"{name:>28} {result['ok']:>5} {result['errors']:>4} {result['p50_ms']:>8} {result['p95_ms']:>8} {result['p99_ms']:>8}"
+              f"   backup calls: {backup_config.requests - before}, {llm.stats()}")
+
+
+if __name__ == "__main__":
+    main()
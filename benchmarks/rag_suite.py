@@ -0,0 +1,362 @@
+# Offline RAG benchmark suite: retrieval latency + recall@k, end-to-end stage timings, HTTP load on the
+# Flask and ASGI apps, and ingestion throughput. The LLM is a local stub server with fixed latency and a
+# fixed reply, so runs are repeatable and make no API calls. Results are written as JSON.
+#
+#   python benchmarks/rag_suite.py --clients 16 --requests 200
+#   python benchmarks/rag_suite.py --compare benchmarks/results/old.json benchmarks/results/new.json
+
+import os
+import sys
+import json
+import atexit
+import glob
+import time
+import socket
+import shutil
+import argparse
+import tempfile
+import threading
+import subprocess
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+import numpy as np
+import requests
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+scripts_dir = os.path.join(base_dir, "scripts")
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.dirname(__file__))
+
+
+def percentiles(values):
+    if not values:
+        return None
+    return {
+        "p50": round(float(np.percentile(values, 50)), 2),
+        "p95": round(float(np.percentile(values, 95)), 2),
+        "p99": round(float(np.percentile(values, 99)), 2),
+        "mean": round(float(np.mean(values)), 2)
+    }
+
+
+def load_questions(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def load_script(filename, name):
+    # The numbered pipeline scripts have spaces in their names, so they're loaded by path
+    if scripts_dir not in sys.path:
+        sys.path.insert(0, scripts_dir)
+    spec = importlib.util.spec_from_file_location(name, os.path.join(scripts_dir, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module  # so worker processes can unpickle its functions
+    spec.loader.exec_module(module)
+    return module
+
+
+# === Retrieval: latency percentiles and recall@k against labelled source files ===
+def bench_retrieval(agent, questions, repeat):
+    embed_ms, retrieve_ms, vector_search_ms, hits, reciprocal_ranks = [], [], [], 0, []
+    for item in questions:
+        start = time.perf_counter()
+        vector = agent.embeddings.embed_query(item["question"])
+        embed_ms.append((time.perf_counter() - start) * 1000)
+        for _ in range(repeat):
+            start, timings = time.perf_counter(), {}
+            docs = agent._retrieve_docs(item["question"], vector, timings)
+            retrieve_ms.append((time.perf_counter() - start) * 1000)
+            vector_search_ms.append(timings["vector_search"] * 1000)
+        ranks = [i for i, doc in enumerate(docs) if doc.metadata.get("source_file") in item["sources"]]
+        hits += bool(ranks)
+        reciprocal_ranks.append(1 / (ranks[0] + 1) if ranks else 0.0)
+    return {
+        "questions": len(questions),
+        "k": agent.top_k if agent.reranker is None else agent.rerank_top_n,
+        "embed_ms": percentiles(embed_ms),
+        "retrieve_ms": percentiles(retrieve_ms),
+        "vector_search_ms": percentiles(vector_search_ms),
+        "recall_at_k": round(hits / len(questions), 3),
+        "mrr": round(float(np.mean(reciprocal_ranks)), 3)
+    }
+
+
+# === End to end through ConversationalAgent.run (per-stage timings from the agent itself) ===
+def bench_end_to_end(agent, questions):
+    stages = {}
+    for i, item in enumerate(questions):
+        result = agent.run(item["question"], session_id=f"bench-e2e-{i}")
+        for stage, ms in result["timings"].items():
+            stages.setdefault(stage, []).append(ms)
+    return {stage: percentiles(values) for stage, values in stages.items()}
+
+
+# === HTTP load: N concurrent clients against the Flask and ASGI apps ===
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def serve_flask():
+    from werkzeug.serving import make_server
+    import app as flask_app
+
+    server = make_server("127.0.0.1", 0, flask_app.app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return f"http://127.0.0.1:{server.server_port}", server.shutdown
+
+
+def serve_asgi():
+    import uvicorn
+    import asgi
+
+    port = free_port()
+    server = uvicorn.Server(uvicorn.Config(asgi.app, host="127.0.0.1", port=port, log_level="warning"))
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.05)
+
+    def stop():
+        server.should_exit = True
+    return f"http://127.0.0.1:{port}", stop
+
+
+def load_test(url, path, questions, clients, total):
+    stream = path.endswith("/stream")
+    latencies, ttfts, errors = [], [], []
+    lock = threading.Lock()
+
+    def client(offset):
+        session = requests.Session()  # keep-alive, like a browser
+        for i in range(offset, total, clients):
+            session.cookies.clear()  # fresh conversation per request, so history doesn't grow the cookie
+            question = questions[i % len(questions)]["question"]
+            start = time.perf_counter()
+            ttft = None
+            try:
+                with session.post(url + path, data={"question": question}, stream=stream, timeout=60) as response:
+                    response.raise_for_status()
+                    if stream:
+                        for line in response.iter_lines(decode_unicode=True):
+                            if ttft is None and line == "event: token":
+                                ttft = (time.perf_counter() - start) * 1000
+                            if line == "event: error":
+                                raise RuntimeError("stream error event")
+                    else:
+                        response.json()
+            except Exception as e:
+                with lock:
+                    errors.append(str(e))
+                continue
+            with lock:
+                latencies.append((time.perf_counter() - start) * 1000)
+                if ttft is not None:
+                    ttfts.append(ttft)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=clients) as pool:
+        list(pool.map(client, range(clients)))
+    elapsed = time.perf_counter() - start
+
+    result = {
+        "requests": total,
+        "errors": len(errors),
+        "throughput_rps": round(len(latencies) / elapsed, 2),
+        "latency_ms": percentiles(latencies)
+    }
+    if stream:
+        result["ttft_ms"] = percentiles(ttfts)
+    return result
+
+
+# === Ingestion: pages/s (PDF extraction), chunks/s (tokenizer chunking), embeddings/s ===
+def bench_pdf_extraction(max_pdfs, workers):
+    pdfs = sorted(glob.glob(os.path.join(base_dir, "pdfs", "*.pdf")))[:max_pdfs]
+    if not pdfs:
+        return {"skipped": "no PDFs in pdfs/"}
+    extractor = load_script("2 pdf_to_text.py", "pdf_to_text")
+    pages, failed = 0, 0
+    start = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(extractor.extract_pages, path, 0, None, 120) for path in pdfs]
+        for future in futures:
+            try:
+                pages += len(future.result())
+            except Exception:
+                failed += 1
+    elapsed = time.perf_counter() - start
+    return {"files": len(pdfs), "failed": failed, "pages": pages, "seconds": round(elapsed, 3),
+            "pages_per_s": round(pages / elapsed, 2)}
+
+
+def bench_chunking(max_docs):
+    paths = sorted(glob.glob(os.path.join(base_dir, "clean_text", "*.txt")) + glob.glob(os.path.join(base_dir, "pages", "*.txt")))[:max_docs]
+    if not paths:
+        return {"skipped": "no text in clean_text/ or pages/"}, []
+    chunker = load_script("4 chunk_texts.py", "chunk_texts")
+    from transformers import AutoTokenizer
+
+    tokenizer = AutoTokenizer.from_pretrained(chunker.TOKENIZER)
+    texts = []
+    for path in paths:
+        with open(path, "r", encoding="utf-8") as f:
+            texts.append(f.read())
+
+    start = time.perf_counter()
+    chunks = []
+    for text in texts:
+        chunks.extend(chunker.chunk_source(tokenizer, chunker.clean_text(text), chunker.MAX_TOKENS, chunker.OVERLAP, chunker.MIN_TOKENS))
+    elapsed = time.perf_counter() - start
+    return {
+        "docs": len(texts),
+        "chunks": len(chunks),
+        "tokens": sum(count for _, count in chunks),
+        "seconds": round(elapsed, 3),
+        "docs_per_s": round(len(texts) / elapsed, 2),
+        "chunks_per_s": round(len(chunks) / elapsed, 2)
+    }, [text for text, _ in chunks]
+
+
+def bench_embedding(embeddings, texts, max_chunks, batch_size):
+    texts = texts[:max_chunks]
+    if not texts:
+        return {"skipped": "no chunks to embed"}
+    start = time.perf_counter()
+    for i in range(0, len(texts), batch_size):
+        embeddings.embed_documents(texts[i:i + batch_size])
+    elapsed = time.perf_counter() - start
+    return {"chunks": len(texts), "batch_size": batch_size, "seconds": round(elapsed, 3),
+            "embeddings_per_s": round(len(texts) / elapsed, 2)}
+
+
+# === Comparing two result files ===
+def flatten(data, prefix=""):
+    flat = {}
+    for key, value in data.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, list):
+            for item in value:
+                if isinstance(item, dict) and "name" in item:
+                    flat.update(flatten(item, f"{name}.{item['name']}."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+
+def compare(old_path, new_path):
+    with open(old_path, "r", encoding="utf-8") as f:
+        old = json.load(f)
+    with open(new_path, "r", encoding="utf-8") as f:
+        new = json.load(f)
+    print(f"{'metric':<52} {old.get('commit', 'old'):>12} {new.get('commit', 'new'):>12} {'change':>9}")
+    old_flat, new_flat = flatten(old["results"]), flatten(new["results"])
+    for key in sorted(old_flat.keys() & new_flat.keys()):
+        before, after = old_flat[key], new_flat[key]
+        change = f"{(after - before) / before * 100:+.1f}%" if before else ""
+        print(f"{key:<52} {before:>12} {after:>12} {change:>9}")
+
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], cwd=base_dir, capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline RAG benchmark and load test (stub LLM, no API calls).")
+    parser.add_argument("--questions", default=os.path.join(os.path.dirname(__file__), "questions.jsonl"))
+    parser.add_argument("--repeat", type=int, default=5, help="retrieval repetitions per question")
+    parser.add_argument("--clients", type=int, default=16, help="concurrent HTTP clients")
+    parser.add_argument("--requests", type=int, default=200, help="HTTP requests per target")
+    parser.add_argument("--llm-latency", type=float, default=0.3, help="stub LLM first-token latency (s)")
+    parser.add_argument("--token-delay", type=float, default=0.005, help="stub LLM delay between tokens (s)")
+    parser.add_argument("--max-pdfs", type=int, default=50)
+    parser.add_argument("--max-docs", type=int, default=200)
+    parser.add_argument("--max-chunks", type=int, default=2000)
+    parser.add_argument("--embed-batch-size", type=int, default=64)
+    parser.add_argument("--pdf-workers", type=int, default=os.cpu_count())
+    parser.add_argument("--skip", nargs="*", default=[], choices=["retrieval", "e2e", "load", "ingestion"])
+    parser.add_argument("--output", help="default: benchmarks/results/<commit>-<timestamp>.json")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="print the difference between two result files")
+    args = parser.parse_args()
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    if args.compare:
+        compare(*args.compare)
+        return
+
+    os.chdir(base_dir)
+    results = {}
+
+    # PDF extraction forks its pool before any server threads exist
+    if "ingestion" not in args.skip:
+        print("📄 Ingestion: PDF extraction + chunking...")
+        results["ingestion"] = {"pdf_extraction": bench_pdf_extraction(args.max_pdfs, args.pdf_workers)}
+        results["ingestion"]["chunking"], chunk_texts = bench_chunking(args.max_docs)
+
+    # Deterministic LLM behind the real provider chain; caches off so every request does the full work.
+    # History and session memory go to a scratch directory, so the load test doesn't fill chat_logs/
+    from stub_llm_server import start_stub_server
+
+    stub, _ = start_stub_server(latency=args.llm_latency, token_delay=args.token_delay)
+    scratch_dir = tempfile.mkdtemp(prefix="rag_suite_")
+    atexit.register(shutil.rmtree, scratch_dir, ignore_errors=True)
+    os.environ.update({
+        "LLM_PROVIDERS": "ollama",
+        "OLLAMA_BASE_URL": f"http://127.0.0.1:{stub.server_address[1]}",
+        "ANSWER_CACHE": "off",
+        "EMBED_CACHE_SIZE": "0",
+        "MEMORY_SUMMARY": "off",
+        "HISTORY_DB_PATH": os.path.join(scratch_dir, "history.sqlite3"),
+        "MEMORY_DB_PATH": os.path.join(scratch_dir, "memory.sqlite3"),
+    })
+    from agents.runtime import get_agent, warm_up
+
+    warm_up()
+    agent = get_agent()
+    questions = load_questions(args.questions)
+
+    if "ingestion" not in args.skip:
+        texts = chunk_texts or (agent.bm25.texts if agent.bm25 is not None else [])
+        results["ingestion"]["embedding"] = bench_embedding(agent.embeddings, texts, args.max_chunks, args.embed_batch_size)
+
+    if "retrieval" not in args.skip:
+        print("🔎 Retrieval latency and recall@k...")
+        results["retrieval"] = bench_retrieval(agent, questions, args.repeat)
+
+    if "e2e" not in args.skip:
+        print("🧩 End-to-end stage timings...")
+        results["end_to_end_ms"] = bench_end_to_end(agent, questions)
+
+    if "load" not in args.skip:
+        results["load"] = []
+        for server_name, serve in (("flask", serve_flask), ("asgi", serve_asgi)):
+            url, stop = serve()
+            for path in ("/chat", "/chat/stream"):
+                print(f"🚦 Load: {server_name} {path} ({args.clients} clients, {args.requests} requests)...")
+                results["load"].append({"name": f"{server_name}{path}", **load_test(url, path, questions, args.clients, args.requests)})
+            stop()
+
+    report = {
+        "commit": git_commit(),
+        "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "config": vars(args),
+        "results": results
+    }
+    output = args.output or os.path.join(base_dir, "benchmarks", "results", f"{report['commit']}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(output), exist_ok=True)
+    with open(output, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps(results, indent=2))
+    print(f"💾 Results → {output}")
+
+
+if __name__ == "__main__":
+    main()
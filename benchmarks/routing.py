@@ -0,0 +1,66 @@
+# Retrieval latency and recall@k with and without query routing (the LLM is never called: stub model,
+# so no API key is needed)
+#
+#   python benchmarks/routing.py --questions benchmarks/questions.jsonl --repeat 5
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.dirname(__file__))
+
+from agents.conversational_agent import ConversationalAgent
+from rag_suite import load_questions
+from stub_llm import StubChatModel
+
+
+def evaluate(agent, questions, repeat):
+    latencies, hits = [], 0
+    for item in questions:
+        vector = agent.embeddings.embed_query(item["question"])
+        for _ in range(repeat):
+            start = time.perf_counter()
+            docs = agent._retrieve_docs(item["question"], vector)
+            latencies.append((time.perf_counter() - start) * 1000)
+        retrieved = {doc.metadata.get("source_file") for doc in docs}
+        hits += bool(retrieved & set(item["sources"]))
+    return {
+        "p50_ms": round(float(np.percentile(latencies, 50)), 2),
+        "p95_ms": round(float(np.percentile(latencies, 95)), 2),
+        "recall_at_k": round(hits / len(questions), 3)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--questions", default=os.path.join(os.path.dirname(__file__), "questions.jsonl"))
+    parser.add_argument("--persist-path", default=os.path.join(base_dir, "chroma_index"))
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+    if args.repeat < 1:
+        parser.error("--repeat must be at least 1")
+
+    questions = load_questions(args.questions)
+    agent = ConversationalAgent(persist_path=args.persist_path, llm=StubChatModel())
+    router = agent.router
+
+    routed = [q["question"] for q in questions if router and router.route(q["question"], agent.embeddings.embed_query(q["question"]))]
+    print(f"🧭 {len(routed)}/{len(questions)} questions routed to a subset of the index")
+
+    agent.router = None
+    baseline = evaluate(agent, questions, args.repeat)
+    agent.router = router
+    with_routing = evaluate(agent, questions, args.repeat)
+
+    print(f"{'':>14} {'p50 ms':>8} {'p95 ms':>8} {'recall@' + str(agent.top_k):>10}")
+    for name, result in [("no routing", baseline), ("routing", with_routing)]:
+        print(f"{name:>14} {result['p50_ms']:>8} {result['p95_ms']:>8} {result['recall_at_k']:>10}")
+
+
+if __name__ == "__main__":
+    main()
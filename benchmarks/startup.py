@@ -0,0 +1,116 @@
+# Startup time and memory per worker: independent workers vs. workers forked from a preloaded parent
+#
+#   python benchmarks/startup.py --workers 4
+#
+# Memory comes from /proc/<pid>/smaps_rollup (Linux). PSS splits shared pages between the processes
+# sharing them, so the PSS total is the real footprint of the whole server.
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+import multiprocessing as mp
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, base_dir)
+
+
+def memory_mb(pid="self"):
+    fields = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(":")] = int(parts[1])
+    return {
+        "rss_mb": round(fields.get("Rss", 0) / 1024, 1),
+        "pss_mb": round(fields.get("Pss", 0) / 1024, 1),
+        "private_mb": round((fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0)) / 1024, 1)
+    }
+
+
+def worker(forked_at, ready, measure, results):
+    from agents.runtime import warm_up
+
+    timings = warm_up()
+    startup_s = time.perf_counter() - forked_at
+    ready.put(os.getpid())
+    measure.wait()  # all workers alive at once, so shared pages are split between them
+    results.put({"pid": os.getpid(), "startup_s": round(startup_s, 3), **timings, **memory_mb()})
+    measure.wait()
+
+
+def run_mode(mode, workers):
+    ctx = mp.get_context("fork")
+    ready, results = ctx.Queue(), ctx.Queue()
+    measure = ctx.Barrier(workers + 1)
+
+    start = time.perf_counter()
+    parent = {"preload_s": 0.0}
+    if mode == "preload":
+        from agents.runtime import preload
+
+        preload()
+        parent["preload_s"] = round(time.perf_counter() - start, 3)
+
+    procs = []
+    for _ in range(workers):
+        proc = ctx.Process(target=worker, args=(time.perf_counter(), ready, measure, results))
+        proc.start()
+        procs.append(proc)
+    for _ in procs:
+        ready.get()
+    all_ready_s = round(time.perf_counter() - start, 3)
+
+    measure.wait()
+    per_worker = sorted((results.get() for _ in procs), key=lambda r: r["pid"])
+    parent.update(memory_mb())
+    measure.wait()
+    for proc in procs:
+        proc.join()
+
+    return {
+        "mode": mode,
+        "workers": workers,
+        "all_ready_s": all_ready_s,
+        "parent": parent,
+        "per_worker": per_worker,
+        "total_pss_mb": round(parent["pss_mb"] + sum(w["pss_mb"] for w in per_worker), 1)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--mode", choices=["cold", "preload"], help="run a single mode and print JSON")
+    parser.add_argument("--output", help="write both results as JSON")
+    args = parser.parse_args()
+
+    if args.mode:
+        print(json.dumps(run_mode(args.mode, args.workers)))
+        return
+
+    # Each mode runs in a fresh interpreter so nothing is already imported or loaded
+    results = []
+    for mode in ("cold", "preload"):
+        out = subprocess.run([sys.executable, os.path.abspath(__file__), "--mode", mode, "--workers", str(args.workers)],
+                             cwd=base_dir, capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(out.strip().splitlines()[-1]))
+
+    print(f"{'mode':>8} {'preload s':>10} {'all ready s':>12} {'worker start s':>15} {'RSS/worker MB':>14} "
+          f"{'PSS/worker MB':>14} {'private/worker MB':>18} {'total PSS MB':>13}")
+    for r in results:
+        n = len(r["per_worker"])
+        avg = lambda key: round(sum(w[key] for w in r["per_worker"]) / n, 2)
+        print(f"{r['mode']:>8} {r['parent']['preload_s']:>10} {r['all_ready_s']:>12} {avg('startup_s'):>15} {avg('rss_mb'):>14} "
+              f"{avg('pss_mb'):>14} {avg('private_mb'):>18} {r['total_pss_mb']:>13}")
+
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
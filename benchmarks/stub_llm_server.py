@@ -0,0 +1,109 @@
+# Local stand-in for LLM HTTP APIs: speaks Ollama (/api/chat) and OpenAI (/chat/completions) streaming
+#
+#   python benchmarks/stub_llm_server.py --port 11434 --latency 0.2 --slow-rate 0.1 --slow-latency 3
+#   LLM_PROVIDERS=openai,ollama OPENAI_BASE_URL=http://127.0.0.1:8001 OLLAMA_BASE_URL=http://127.0.0.1:11434 ...
+
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+REPLY = "From what I know, tuition at George Brown depends on your program."
+
+
+class StubConfig:
+    def __init__(self, latency=0.2, token_delay=0.0, slow_rate=0.0, slow_latency=3.0, error_rate=0.0, reply=REPLY, seed=0):
+        self.latency = latency
+        self.token_delay = token_delay
+        self.slow_rate = slow_rate
+        self.slow_latency = slow_latency
+        self.error_rate = error_rate
+        self.reply = reply
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def draw(self):
+        # (first-token delay, fail?) for one request
+        with self.lock:
+            self.requests += 1
+            fail = self.random.random() < self.error_rate
+            slow = self.random.random() < self.slow_rate
+        return (self.slow_latency if slow else self.latency), fail
+
+
+def make_handler(config):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def log_message(self, *args):
+            pass
+
+        def _tokens(self):
+            words = config.reply.split(" ")
+            return [w if i == 0 else " " + w for i, w in enumerate(words)]
+
+        def do_POST(self):
+            self.rfile.read(int(self.headers.get("Content-Length", 0)))
+            delay, fail = config.draw()
+            if fail:
+                self.send_response(503)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            ollama = self.path.startswith("/api/chat")
+            self.send_response(200)
+            self.send_header("Content-Type", "application/x-ndjson" if ollama else "text/event-stream")
+            self.send_header("Connection", "close")
+            self.end_headers()
+            try:
+                time.sleep(delay)
+                for token in self._tokens():
+                    if ollama:
+                        line = json.dumps({"message": {"role": "assistant", "content": token}, "done": False}) + "\n"
+                    else:
+                        line = "data: " + json.dumps({"choices": [{"delta": {"content": token}}]}) + "\n\n"
+                    self.wfile.write(line.encode())
+                    self.wfile.flush()
+                    time.sleep(config.token_delay)
+                self.wfile.write((json.dumps({"done": True}) + "\n" if ollama else "data: [DONE]\n\n").encode())
+            except (BrokenPipeError, ConnectionResetError):
+                pass  # the client cancelled (lost a hedge race)
+            self.close_connection = True
+
+    return Handler
+
+
+def start_stub_server(port=0, **kwargs):
+    # Starts in a daemon thread; returns (server, config). server.server_address[1] is the bound port.
+    config = StubConfig(**kwargs)
+    server = ThreadingHTTPServer(("127.0.0.1", port), make_handler(config))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, config
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--port", type=int, default=11434)
+    parser.add_argument("--latency", type=float, default=0.2)
+    parser.add_argument("--token-delay", type=float, default=0.0)
+    parser.add_argument("--slow-rate", type=float, default=0.0)
+    parser.add_argument("--slow-latency", type=float, default=3.0)
+    parser.add_argument("--error-rate", type=float, default=0.0)
+    args = parser.parse_args()
+
+    server, _ = start_stub_server(args.port, latency=args.latency, token_delay=args.token_delay, slow_rate=args.slow_rate,
+                                  slow_latency=args.slow_latency, error_rate=args.error_rate)
+    print(f"🧪 Stub LLM server on http://127.0.0.1:{server.server_address[1]}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
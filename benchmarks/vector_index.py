@@ -0,0 +1,132 @@
+# Chroma vs the memory-mapped flat index (float16 / float32): load time, query latency with and without
+# a source_file filter, recall@k against exact search, and memory. Each engine runs in a fresh interpreter.
+#
+#   python benchmarks/vector_index.py --repeat 20
+#
+# The flat index's vectors and texts are file-backed mmap pages: they show up in RSS but not in
+# private memory, because every worker maps the same page cache.
+
+import os
+import sys
+import json
+import time
+import argparse
+import tempfile
+import subprocess
+
+import numpy as np
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.dirname(__file__))
+
+from rag_suite import load_questions, percentiles
+from startup import memory_mb
+
+ENGINES = ("chroma", "flat-float32", "flat-float16")
+
+
+def open_engine(engine, chroma_path, flat_dir):
+    if engine == "chroma":
+        from langchain_chroma import Chroma
+
+        return Chroma(persist_directory=chroma_path)
+    from agents.flat_index import load_flat_index
+
+    return load_flat_index(os.path.join(flat_dir, engine))
+
+
+def run_engine(engine, chroma_path, flat_dir, queries_path, k, repeat):
+    with open(queries_path, encoding="utf-8") as f:
+        queries = json.load(f)
+    start = time.perf_counter()
+    store = open_engine(engine, chroma_path, flat_dir)
+    store.similarity_search_by_vector(queries[0]["vector"], k=k)
+    load_s = time.perf_counter() - start
+
+    latency = {"all": [], "filtered": []}
+    results = {"all": [], "filtered": []}
+    for round_ in range(repeat):
+        for query in queries:
+            for mode in ("all", "filtered"):
+                where = {"source_file": {"$in": query["sources"]}} if mode == "filtered" else None
+                t0 = time.perf_counter()
+                docs = store.similarity_search_by_vector(query["vector"], k=k, filter=where)
+                latency[mode].append((time.perf_counter() - t0) * 1000)
+                if round_ == 0:
+                    results[mode].append([(d.metadata.get("source_file"), str(d.metadata.get("chunk_id")), d.page_content[:64]) for d in docs])
+    return {
+        "engine": engine,
+        "load_s": round(load_s, 3),
+        "query_ms": percentiles(latency["all"]),
+        "filtered_query_ms": percentiles(latency["filtered"]),
+        "results": results,
+        **memory_mb()
+    }
+
+
+def recall(results, truth, k):
+    hits = [len(set(map(tuple, r)) & set(map(tuple, t))) / max(min(k, len(t)), 1) for r, t in zip(results, truth)]
+    return round(float(np.mean(hits)), 4)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--chroma", default=os.getenv("CHROMA_PATH", "chroma_index"))
+    parser.add_argument("--questions", default=os.path.join(os.path.dirname(__file__), "questions.jsonl"))
+    parser.add_argument("--k", type=int, default=6)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--output", help="write the results as JSON")
+    parser.add_argument("--engine", choices=ENGINES, help=argparse.SUPPRESS)
+    parser.add_argument("--flat-dir", help=argparse.SUPPRESS)
+    parser.add_argument("--queries", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.engine:
+        print(json.dumps(run_engine(args.engine, args.chroma, args.flat_dir, args.queries, args.k, args.repeat)))
+        return
+
+    import chromadb
+    from agents.embedding_backend import create_embeddings
+    from agents.flat_index import build_flat_index
+
+    questions = load_questions(args.questions)
+    vectors = create_embeddings().embed_documents([item["question"] for item in questions])
+    queries = [{"vector": vector, "sources": item["sources"]} for item, vector in zip(questions, vectors)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        collection = chromadb.PersistentClient(path=args.chroma).get_collection("langchain")
+        for dtype in ("float32", "float16"):
+            build_flat_index(collection, os.path.join(tmp, f"flat-{dtype}"), dtype=dtype)
+        queries_path = os.path.join(tmp, "queries.json")
+        with open(queries_path, "w", encoding="utf-8") as f:
+            json.dump(queries, f)
+
+        results = {}
+        for engine in ENGINES:
+            out = subprocess.run([sys.executable, os.path.abspath(__file__), "--engine", engine, "--chroma", args.chroma,
+                                  "--flat-dir", tmp, "--queries", queries_path, "--k", str(args.k), "--repeat", str(args.repeat)],
+                                 cwd=base_dir, capture_output=True, text=True, check=True).stdout
+            results[engine] = json.loads(out.strip().splitlines()[-1])
+
+    # Exact float32 search is the ground truth; Chroma's HNSW is approximate, float16 rounds the vectors
+    truth = results["flat-float32"]["results"]
+    print(f"📚 {collection.count()} chunks, {len(queries)} questions × {args.repeat}, k={args.k}")
+    print(f"{'engine':>13} {'load s':>7} {'p50 ms':>7} {'p95 ms':>7} {'filtered p50':>13} {'recall@k':>9} "
+          f"{'filtered recall':>16} {'RSS MB':>7} {'private MB':>11}")
+    for engine in ENGINES:
+        r = results[engine]
+        r["recall"] = recall(r["results"]["all"], truth["all"], args.k)
+        r["filtered_recall"] = recall(r["results"]["filtered"], truth["filtered"], args.k)
+        print(f"{engine:>13} {r['load_s']:>7} {r['query_ms']['p50']:>7} {r['query_ms']['p95']:>7} "
+              f"{r['filtered_query_ms']['p50']:>13} {r['recall']:>9} {r['filtered_recall']:>16} {r['rss_mb']:>7} {r['private_mb']:>11}")
+
+    if args.output:
+        for r in results.values():
+            del r["results"]
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
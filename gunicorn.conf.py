@@ -0,0 +1,45 @@
+# Pre-fork serving: shared components load once in the master, workers fork from it.
+#
+#   gunicorn app:app -c gunicorn.conf.py                                   # Flask (sync workers)
+#   gunicorn asgi:app -c gunicorn.conf.py -k uvicorn.workers.UvicornWorker  # ASGI
+import os
+import glob
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+bind = f"0.0.0.0:{os.getenv('PORT', 10000)}"
+workers = int(os.getenv("WEB_CONCURRENCY", 2))
+threads = int(os.getenv("GUNICORN_THREADS", 8))
+timeout = 120
+preload_app = True
+
+
+def on_starting(server):
+    # Multi-process Prometheus metrics: files left by a previous run would be counted again
+    metrics_dir = os.getenv("PROMETHEUS_MULTIPROC_DIR")
+    if metrics_dir:
+        os.makedirs(metrics_dir, exist_ok=True)
+        for path in glob.glob(os.path.join(metrics_dir, "*.db")):
+            os.remove(path)
+
+    # Embedding model, BM25 index and reranker are loaded here and shared copy-on-write by every worker
+    from agents.runtime import preload
+
+    preload()
+
+
+def post_fork(server, worker):
+    # Per-worker pieces (Chroma client, thread pools, LLM client) are built after the fork, then warmed
+    from agents.runtime import warm_up
+
+    warm_up()
+
+
+def child_exit(server, worker):
+    # Multi-process Prometheus metrics: drop the files of workers that have exited
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        from prometheus_client import multiprocess
+
+        multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,225 @@
+import os
+import json
+import socket
+import threading
+
+import requests
+from langchain_core.messages import AIMessage, SystemMessage
+
+
+# === Streaming HTTP providers (revived from llm_obsolete.py) ===
+# Each provider turns LangChain messages into its own request format and yields text as it
+# arrives. Base URLs are configurable so any of them can be pointed at a local stub server.
+def to_role_messages(messages):
+    roles = []
+    for message in messages:
+        if isinstance(message, SystemMessage):
+            role = "system"
+        elif isinstance(message, AIMessage):
+            role = "assistant"
+        else:
+            role = "user"
+        roles.append({"role": role, "content": message.content})
+    return roles
+
+
+def to_prompt(messages):
+    return "\n\n".join(f"{m['role'].upper()}: {m['content']}" for m in to_role_messages(messages)) + "\n\nASSISTANT:"
+
+
+def iter_sse(response):
+    for line in response.iter_lines(decode_unicode=True):
+        if line and line.startswith("data:"):
+            data = line[5:].strip()
+            if data == "[DONE]":
+                return
+            yield json.loads(data)
+
+
+class StreamCancel:
+    # Cancel flag for one provider call. Setting it also shuts the socket of the call's HTTP response,
+    # so a thread blocked on a read returns at once instead of holding its pool thread until read_timeout.
+    def __init__(self):
+        self._event = threading.Event()
+        self._response = None
+        self._lock = threading.Lock()
+
+    def is_set(self):
+        return self._event.is_set()
+
+    def attach(self, response):
+        with self._lock:
+            self._response = response
+            cancelled = self._event.is_set()
+        if cancelled:
+            self._shutdown(response)
+
+    def set(self):
+        with self._lock:
+            self._event.set()
+            response = self._response
+        if response is not None:
+            self._shutdown(response)
+
+    @staticmethod
+    def _shutdown(response):
+        # response.close() would wait for the blocked read to finish (it holds the buffer's lock), so the
+        # socket underneath is shut instead. It is found on the pooled connection, or through the
+        # response's file object once urllib3 has detached it (Connection: close).
+        sock = getattr(getattr(response.raw, "_connection", None), "sock", None)
+        if sock is None:
+            fp = getattr(getattr(response.raw, "_fp", None), "fp", None)
+            sock = getattr(getattr(fp, "raw", None), "_sock", None)
+        if sock is None:
+            return  # nothing to shut: the pump stops at its next chunk
+        try:
+            sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass  # already closed
+
+
+class Provider:
+    name = "provider"
+
+    def __init__(self, model, base_url, api_key=None, timeout=10.0, read_timeout=30.0):
+        self.model = model
+        self.base_url = base_url.rstrip("/")
+        self.api_key = api_key
+        self.timeout = timeout            # first token must arrive within this many seconds
+        self.read_timeout = read_timeout  # max gap between chunks once streaming
+
+    def _post(self, url, payload, headers=None, cancel=None):
+        response = requests.post(url, json=payload, headers=headers, stream=True, timeout=(self.timeout, self.read_timeout))
+        if cancel is not None:
+            cancel.attach(response)
+        response.raise_for_status()
+        return response
+
+    def stream(self, messages, cancel=None):
+        raise NotImplementedError
+
+
+# === 1. Ollama ===
+class OllamaProvider(Provider):
+    name = "ollama"
+
+    def stream(self, messages, cancel=None):
+        payload = {"model": self.model, "messages": to_role_messages(messages), "stream": True}
+        with self._post(f"{self.base_url}/api/chat", payload, cancel=cancel) as response:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line:
+                    continue
+                data = json.loads(line)
+                if data.get("error"):
+                    raise RuntimeError(f"Ollama error: {data['error']}")
+                yield data.get("message", {}).get("content", "")
+                if data.get("done"):
+                    return
+
+
+# === 2. OpenAI (and OpenAI-compatible servers) ===
+class OpenAIProvider(Provider):
+    name = "openai"
+
+    def stream(self, messages, cancel=None):
+        payload = {"model": self.model, "messages": to_role_messages(messages), "stream": True}
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        with self._post(f"{self.base_url}/chat/completions", payload, headers, cancel=cancel) as response:
+            for event in iter_sse(response):
+                choices = event.get("choices") or [{}]
+                yield choices[0].get("delta", {}).get("content") or ""
+
+
+# === 3. Claude ===
+class ClaudeProvider(Provider):
+    name = "claude"
+
+    def stream(self, messages, cancel=None):
+        roles = to_role_messages(messages)
+        system = "\n\n".join(m["content"] for m in roles if m["role"] == "system")
+        payload = {
+            "model": self.model,
+            "max_tokens": 1024,
+            "system": system,
+            "messages": [m for m in roles if m["role"] != "system"],
+            "stream": True
+        }
+        headers = {"x-api-key": self.api_key or "", "anthropic-version": "2023-06-01"}
+        with self._post(f"{self.base_url}/v1/messages", payload, headers, cancel=cancel) as response:
+            for event in iter_sse(response):
+                if event.get("type") == "content_block_delta":
+                    yield event["delta"].get("text", "")
+                elif event.get("type") == "error":
+                    raise RuntimeError(f"Claude error: {event.get('error')}")
+
+
+# === 4. Hugging Face (no streaming: the whole reply arrives as one chunk) ===
+class HuggingFaceProvider(Provider):
+    name = "huggingface"
+
+    def stream(self, messages, cancel=None):
+        payload = {
+            "inputs": to_prompt(messages),
+            "parameters": {"max_new_tokens": 256, "return_full_text": False},
+            "options": {"wait_for_model": True}
+        }
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        with self._post(f"{self.base_url}/{self.model}", payload, headers, cancel=cancel) as response:
+            result = response.json()
+        if not isinstance(result, list):
+            raise RuntimeError(f"Hugging Face error: {result}")
+        yield result[0]["generated_text"].strip()
+
+
+# === 5. Google Gemini ===
+class GeminiProvider(Provider):
+    name = "gemini"
+
+    def stream(self, messages, cancel=None):
+        roles = to_role_messages(messages)
+        system = "\n\n".join(m["content"] for m in roles if m["role"] == "system")
+        payload = {
+            "contents": [
+                {"role": "model" if m["role"] == "assistant" else "user", "parts": [{"text": m["content"]}]}
+                for m in roles if m["role"] != "system"
+            ]
+        }
+        if system:
+            payload["systemInstruction"] = {"parts": [{"text": system}]}
+        # The key goes in a header: a URL ends up in HTTPError messages and from there in the logs
+        url = f"{self.base_url}/models/{self.model}:streamGenerateContent?alt=sse"
+        headers = {"x-goog-api-key": self.api_key}
+        with self._post(url, payload, headers, cancel=cancel) as response:
+            for event in iter_sse(response):
+                for candidate in event.get("candidates", [])[:1]:
+                    yield "".join(part.get("text", "") for part in candidate.get("content", {}).get("parts", []))
+
+
+# === Registry ===
+# name → (class, default model, default base URL, API key env var)
+PROVIDERS = {
+    "gemini": (GeminiProvider, "gemini-1.5-flash", "https://generativelanguage.googleapis.com/v1beta", "GOOGLE_API_KEY"),
+    "ollama": (OllamaProvider, "phi3:mini", "http://localhost:11434", None),
+    "openai": (OpenAIProvider, "gpt-4o-mini", "https://api.openai.com/v1", "OPENAI_API_KEY"),
+    "claude": (ClaudeProvider, "claude-3-haiku-20240307", "https://api.anthropic.com", "ANTHROPIC_API_KEY"),
+    "huggingface": (HuggingFaceProvider, "tiiuae/falcon-7b-instruct", "https://api-inference.huggingface.co/models", "HUGGINGFACE_API_KEY"),
+}
+
+
+def create_provider(name):
+    # Per-provider settings come from {NAME}_MODEL, {NAME}_BASE_URL, {NAME}_TIMEOUT, {NAME}_READ_TIMEOUT
+    name = name.strip().lower()
+    if name not in PROVIDERS:
+        raise ValueError(f"Unknown LLM provider: {name} (choose from {', '.join(PROVIDERS)})")
+    cls, model, base_url, key_env = PROVIDERS[name]
+    prefix = name.upper()
+    api_key = os.getenv(key_env) if key_env else None
+    if name == "gemini":
+        api_key = api_key or os.getenv("GOOGLE_GEMINI_API_KEY")
+    return cls(
+        model=os.getenv(f"{prefix}_MODEL", model),
+        base_url=os.getenv(f"{prefix}_BASE_URL", base_url),
+        api_key=api_key,
+        timeout=float(os.getenv(f"{prefix}_TIMEOUT", 10)),
+        read_timeout=float(os.getenv(f"{prefix}_READ_TIMEOUT", 30))
+    )
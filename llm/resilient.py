@@ -0,0 +1,248 @@
+import os
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, List, Optional
+
+from langchain_core.language_models.chat_models import BaseChatModel
+from langchain_core.messages import AIMessage, AIMessageChunk
+from langchain_core.outputs import ChatGeneration, ChatGenerationChunk, ChatResult
+from pydantic import PrivateAttr
+
+from llm.providers import StreamCancel, create_provider
+
+logger = logging.getLogger(__name__)
+
+
+# === Circuit breaker ===
+# After `failure_threshold` consecutive failures the provider is skipped for `reset_timeout`
+# seconds, then a single trial request decides whether it closes again. Whoever holds the trial must
+# end it with record_success/record_failure, or release_trial if the request was abandoned.
+class CircuitBreaker:
+    def __init__(self, failure_threshold=3, reset_timeout=30.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.failures = 0
+        self.opened_at = None
+        self._trial = False
+        self._lock = threading.Lock()
+
+    @property
+    def state(self):
+        if self.opened_at is None:
+            return "closed"
+        return "half-open" if time.monotonic() - self.opened_at >= self.reset_timeout else "open"
+
+    def allow(self):
+        # True, "trial" when this call took the half-open trial, or False
+        with self._lock:
+            state = self.state
+            if state == "closed":
+                return True
+            if state == "half-open" and not self._trial:
+                self._trial = True
+                return "trial"
+            return False
+
+    def release_trial(self):
+        with self._lock:
+            self._trial = False
+
+    def record_success(self):
+        with self._lock:
+            self.failures = 0
+            self.opened_at = None
+            self._trial = False
+
+    def record_failure(self):
+        with self._lock:
+            self.failures += 1
+            self._trial = False
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+# === Failover + hedging chat model ===
+# Providers are tried in order. The first one to produce a token wins and the others are cancelled.
+# A provider that errors, or has no first token within its timeout, counts as a failure and the next
+# one is started. With `hedge_after_ms`, the next provider is also started when the current one is
+# merely slow, so one degraded provider can't drag out tail latency.
+class ResilientChatModel(BaseChatModel):
+    providers: List[Any]
+    hedge_after_ms: Optional[float] = None
+    failure_threshold: int = 3
+    reset_timeout: float = 30.0
+
+    _breakers: dict = PrivateAttr(default_factory=dict)
+    _pool: Any = PrivateAttr(default=None)
+    _stats: dict = PrivateAttr(default_factory=dict)
+    _lock: Any = PrivateAttr(default_factory=threading.Lock)
+
+    def model_post_init(self, __context):
+        self._breakers = {p.name: CircuitBreaker(self.failure_threshold, self.reset_timeout) for p in self.providers}
+        self._pool = ThreadPoolExecutor(max_workers=int(os.getenv("LLM_PROVIDER_THREADS", 64)), thread_name_prefix="llm-provider")
+        self._stats = {"hedges": 0, "failovers": 0, "wins": {p.name: 0 for p in self.providers}}
+
+    @property
+    def _llm_type(self) -> str:
+        return "resilient"
+
+    def stats(self):
+        with self._lock:
+            return {
+                **self._stats,
+                "wins": dict(self._stats["wins"]),
+                "breakers": {name: breaker.state for name, breaker in self._breakers.items()}
+            }
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _pump(self, idx, provider, messages, events, cancel):
+        # Runs on a pool thread; cancelling shuts the HTTP response, so a blocked read returns at once
+        try:
+            for text in provider.stream(messages, cancel=cancel):
+                if cancel.is_set():
+                    return
+                if text:
+                    events.put((idx, "token", text))
+            events.put((idx, "done", None))
+        except Exception as e:
+            if not cancel.is_set():
+                events.put((idx, "error", e))
+
+    def _abandon(self, provider, cancel, trial):
+        # A provider stopped without a verdict (hedge loser, stream dropped by the caller)
+        cancel.set()
+        if trial:
+            self._breakers[provider.name].release_trial()
+
+    def _race(self, messages):
+        # Returns (winning provider, first event, event queue, its index, its cancel flag, whether it holds
+        # its breaker's trial). Breakers are only consulted when a provider is actually started.
+        events = queue.Queue()
+        running = {}  # index → (provider, cancel flag, first-token deadline, holds the trial)
+        remaining = list(self.providers)
+        started = 0
+
+        def launch():
+            # Starts the next provider whose breaker lets it through; False when none is left
+            nonlocal started
+            while remaining:
+                provider = remaining.pop(0)
+                trial = self._breakers[provider.name].allow()
+                if not trial:
+                    continue
+                cancel = StreamCancel()
+                running[started] = (provider, cancel, time.monotonic() + provider.timeout, trial == "trial")
+                self._pool.submit(self._pump, started, provider, messages, events, cancel)
+                started += 1
+                return True
+            return False
+
+        if not launch():
+            raise RuntimeError("All LLM providers are unavailable (circuit open)")
+        hedge_at = time.monotonic() + self.hedge_after_ms / 1000 if self.hedge_after_ms is not None else None
+        last_error = None
+
+        while running:
+            now = time.monotonic()
+            wake = min(deadline for _, _, deadline, _ in running.values())
+            if hedge_at is not None and remaining:
+                wake = min(wake, hedge_at)
+            try:
+                idx, kind, payload = events.get(timeout=max(wake - now, 0))
+            except queue.Empty:
+                now = time.monotonic()
+                if hedge_at is not None and now >= hedge_at and remaining:
+                    hedge_at = None
+                    if launch():
+                        self._count("hedges")
+                    continue
+                for idx, (provider, cancel, deadline, _) in list(running.items()):
+                    if now >= deadline:
+                        cancel.set()
+                        del running[idx]
+                        self._breakers[provider.name].record_failure()
+                        last_error = TimeoutError(f"{provider.name}: no first token within {provider.timeout}s")
+                if not running and launch():
+                    self._count("failovers")
+                continue
+
+            if idx not in running:
+                continue  # late event from a provider that already lost or timed out
+            provider, cancel, _, trial = running[idx]
+            if kind == "error":
+                del running[idx]
+                self._breakers[provider.name].record_failure()
+                last_error = payload
+                logger.warning("LLM provider %s failed: %s", provider.name, payload)
+                if not running and launch():
+                    self._count("failovers")
+                continue
+
+            for other, (other_provider, other_cancel, _, other_trial) in running.items():
+                if other != idx:
+                    self._abandon(other_provider, other_cancel, other_trial)
+            with self._lock:
+                self._stats["wins"][provider.name] += 1
+            return provider, (kind, payload), events, idx, cancel, trial
+
+        raise last_error or RuntimeError("No LLM provider produced an answer")
+
+    def _stream_text(self, messages):
+        provider, (kind, payload), events, winner, cancel, trial = self._race(messages)
+        breaker = self._breakers[provider.name]
+        settled = False
+        try:
+            while kind == "token":
+                yield provider.name, payload
+                while True:
+                    idx, kind, payload = events.get(timeout=provider.read_timeout)
+                    if idx == winner:
+                        break
+            settled = True
+            if kind == "error":
+                breaker.record_failure()
+                raise payload
+            breaker.record_success()
+        except queue.Empty:
+            settled = True
+            breaker.record_failure()
+            raise TimeoutError(f"{provider.name}: stream stalled for {provider.read_timeout}s")
+        finally:
+            if settled:
+                cancel.set()
+            else:
+                self._abandon(provider, cancel, trial)  # the caller stopped reading mid-answer
+
+    def _stream(self, messages, stop=None, run_manager=None, **kwargs):
+        for name, text in self._stream_text(messages):
+            chunk = ChatGenerationChunk(message=AIMessageChunk(content=text, response_metadata={"provider": name}))
+            if run_manager:
+                run_manager.on_llm_new_token(text, chunk=chunk)
+            yield chunk
+
+    def _generate(self, messages, stop=None, run_manager=None, **kwargs):
+        parts, provider = [], None
+        for provider, text in self._stream_text(messages):
+            parts.append(text)
+        message = AIMessage(content="".join(parts), response_metadata={"provider": provider})
+        return ChatResult(generations=[ChatGeneration(message=message)])
+
+
+def create_llm():
+    # LLM_PROVIDERS="gemini,ollama" → ordered failover chain; unset → None (the agent's default Gemini client)
+    names = [n for n in os.getenv("LLM_PROVIDERS", "").split(",") if n.strip()]
+    if not names:
+        return None
+    hedge_after_ms = os.getenv("LLM_HEDGE_AFTER_MS")
+    return ResilientChatModel(
+        providers=[create_provider(name) for name in names],
+        hedge_after_ms=float(hedge_after_ms) if hedge_after_ms else None,
+        failure_threshold=int(os.getenv("LLM_BREAKER_FAILURES", 3)),
+        reset_timeout=float(os.getenv("LLM_BREAKER_RESET", 30))
+    )
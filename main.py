@@ -1,15 +1,141 @@
-from agents.conversational_agent import ConversationalAgent
+from agents.runtime import get_agent
+import os
+import csv
+import json
 import time
+import random
+import argparse
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
 from dotenv import load_dotenv
 
 load_dotenv()
 
+
+# === Batch mode: python main.py --batch questions.jsonl ===
+def read_questions(path):
+    # JSONL ({"question": ..., "id": optional}) or CSV with a "question" column; ids default to the row number
+    with open(path, "r", encoding="utf-8", newline="") as f:
+        rows = csv.DictReader(f) if path.lower().endswith(".csv") else (json.loads(line) for line in f if line.strip())
+        for n, row in enumerate(rows, 1):
+            question = (row.get("question") or "").strip()
+            question_id = row.get("id")
+            if question:
+                # Only a missing id falls back to the row number: 0 is a valid id
+                yield str(n if question_id is None or question_id == "" else question_id), question
+
+
+def load_done(path):
+    # Ids answered by an earlier (possibly interrupted) run; failed ones are tried again
+    done = set()
+    if not os.path.exists(path):
+        return done
+    with open(path, "r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue  # last line cut off by the interruption
+            if "error" not in record:
+                done.add(record["id"])
+    return done
+
+
+def needs_newline(path):
+    # An interrupted run can leave a cut-off last line; new records must start on a line of their own
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return False
+    with open(path, "rb") as f:
+        f.seek(-1, os.SEEK_END)
+        return f.read(1) != b"\n"
+
+
+def answer_one(agent, question_id, inputs, retries, backoff):
+    # Exponential backoff with jitter, so a rate-limited provider isn't hit by every worker at once
+    for attempt in range(1, retries + 2):
+        try:
+            result = agent.answer_prepared(inputs)
+            return {
+                "id": question_id,
+                "question": inputs["question"],
+                "answer": result["answer"],
+                "sources": [doc.metadata.get("source_file") for doc in result["sources"]],
+                "cached": result["cached"],
+                "timings": result["timings"],
+                "tokens": result["tokens"],
+                "attempts": attempt
+            }
+        except Exception as e:
+            error = f"{type(e).__name__}: {e}"
+            if attempt <= retries:
+                time.sleep(backoff * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+    return {"id": question_id, "question": inputs["question"], "error": error, "attempts": retries + 1}
+
+
+def run_batch(agent, args):
+    done = load_done(args.output) if not args.restart else set()
+    todo = [(question_id, question) for question_id, question in read_questions(args.batch) if question_id not in done]
+    print(f"📋 {len(todo)} questions to answer ({len(done)} already in {args.output})")
+
+    partial = not args.restart and needs_newline(args.output)
+    counts = {"answered": 0, "failed": 0}
+    start = time.time()
+    pool = ThreadPoolExecutor(max_workers=args.concurrency, thread_name_prefix="batch-llm")
+    in_flight = set()
+
+    def write_finished(out, limit):
+        # Results are written as they complete, so an interrupted run keeps everything finished so far
+        while len(in_flight) > limit:
+            finished, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in finished:
+                in_flight.discard(future)
+                record = future.result()
+                out.write(json.dumps(record, ensure_ascii=False) + "\n")
+                out.flush()
+                counts["failed" if "error" in record else "answered"] += 1
+
+    try:
+        with open(args.output, "w" if args.restart else "a", encoding="utf-8") as out:
+            if partial:
+                out.write("\n")
+            for offset in range(0, len(todo), args.batch_size):
+                batch = todo[offset:offset + args.batch_size]
+                # Embedding + retrieval for the next batch overlaps with LLM calls still in flight
+                for (question_id, _), inputs in zip(batch, agent.prepare_batch([q for _, q in batch])):
+                    in_flight.add(pool.submit(answer_one, agent, question_id, inputs, args.retries, args.backoff))
+                write_finished(out, args.concurrency)
+                elapsed = time.time() - start
+                print(f"⚙️  {counts['answered']}/{len(todo)} answered | {counts['failed']} failed "
+                      f"| {counts['answered'] / elapsed:.2f} questions/s")
+            write_finished(out, 0)
+    except KeyboardInterrupt:
+        pool.shutdown(wait=False, cancel_futures=True)
+        print(f"\n⏸️ Interrupted: {counts['answered']} answered this run. Rerun the same command to resume.")
+        return
+    pool.shutdown()
+    print(f"✅ {counts['answered']} answered, {counts['failed']} failed in {time.time() - start:.1f}s → {args.output}")
+
+
 def main():
+    parser = argparse.ArgumentParser(description="AskGeorge+ CLI: interactive, or --batch for a file of questions.")
+    parser.add_argument("--batch", help="questions file (.jsonl or .csv with a 'question' column)")
+    parser.add_argument("--output", help="answers JSONL (default: <batch file>.answers.jsonl)")
+    parser.add_argument("--batch-size", type=int, default=32, help="questions embedded and retrieved together")
+    parser.add_argument("--concurrency", type=int, default=8, help="LLM calls in flight")
+    parser.add_argument("--retries", type=int, default=3)
+    parser.add_argument("--backoff", type=float, default=1.0, help="first retry delay in seconds, doubled each time")
+    parser.add_argument("--restart", action="store_true", help="overwrite the output instead of resuming it")
+    args = parser.parse_args()
+
+    if args.batch:
+        args.output = args.output or os.path.splitext(args.batch)[0] + ".answers.jsonl"
+        run_batch(get_agent(), args)
+        return
+
     print("🚀 Launching AskGeorge+ (CLI with memory + Gemini)...")
 
 
     # Initialize the conversational agent with memory + Gemini + LangChain-compatible Chroma
-    agent = ConversationalAgent(persist_path="chroma_index")
+    agent = get_agent()
 
     while True:
         question = input("❓ Enter your question (or type 'exit'): ").strip()
@@ -23,7 +149,7 @@ def main():
         start_time = time.time()
 
         # Run the agent
-        result = agent.run(question)
+        result = agent.run(question, session_id="cli")
         answer = result["answer"]
 
         # Show retrieved document info if needed
@@ -33,7 +159,9 @@ def main():
             print(f"     🧾 Content: {repr(doc)}\n")
 
         print(f"\n✅ Answer:\n{answer}")
-        print(f"\n⏱️ Total time: {round(time.time() - start_time, 2)}s")
+        print(f"\n⏱️ Total time: {round(time.time() - start_time, 2)}s" + (" (⚡ cached)" if result.get("cached") else ""))
+        print("   " + " | ".join(f"{stage} {ms}ms" for stage, ms in result["timings"].items())
+              + (f" | tokens {result['tokens']['in']} in / {result['tokens']['out']} out" if result.get("tokens") else ""))
         print("=" * 80 + "\n")
 
 if __name__ == "__main__":
@@ -1,66 +1,84 @@
 # George Brown College Full Content Scraper
+#
+# Pooled + concurrent: one shared requests.Session, a thread pool of workers, a per-host
+# rate limit, and ETag/Last-Modified conditional GETs so unchanged pages/PDFs are skipped.
+#
+#   python "scripts/1 full_gbc_scraper.py" --workers 8 --rate 4
+#   python "scripts/1 full_gbc_scraper.py" --base-url http://127.0.0.1:8000 --coned-base http://127.0.0.1:8000
 
 import os
 import csv
+import json
+import time
+import argparse
+import threading
+from datetime import datetime
+from urllib.parse import urljoin, urlparse
+from concurrent.futures import ThreadPoolExecutor
+
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 from bs4 import BeautifulSoup
-from datetime import datetime
-from urllib.parse import urljoin
 
 # === SETUP ===
-base_url = "https://www.georgebrown.ca"
-coned_base = "https://coned.georgebrown.ca"
-os.makedirs("logs", exist_ok=True)
-os.makedirs("raw_data", exist_ok=True)
-os.makedirs("raw_programs", exist_ok=True)
-os.makedirs("raw_html", exist_ok=True)
-os.makedirs("raw_coned", exist_ok=True)
-
-# === Load static URLs to crawl ===
-STATIC_URLS = [
+BASE_URL = "https://www.georgebrown.ca"
+CONED_BASE = "https://coned.georgebrown.ca"
+
+# === Static paths to crawl (relative to the base URL) ===
+STATIC_PATHS = [
     # Admissions & International
-    "https://www.georgebrown.ca/admissions",
-    "https://www.georgebrown.ca/admissions/international",
-    "https://www.georgebrown.ca/international-students",
+    "/admissions",
+    "/admissions/international",
+    "/international-students",
 
     # Tuition
-    "https://www.georgebrown.ca/tuition",
-    "https://www.georgebrown.ca/admissions/tuition-fees",
-    "https://www.georgebrown.ca/financial-aid",
+    "/tuition",
+    "/admissions/tuition-fees",
+    "/financial-aid",
 
     # Student Life
-    "https://www.georgebrown.ca/current-students",
-    "https://www.georgebrown.ca/current-students/student-life",
-    "https://www.georgebrown.ca/current-students/student-services",
-    "https://www.georgebrown.ca/current-students/orientation",
+    "/current-students",
+    "/current-students/student-life",
+    "/current-students/student-services",
+    "/current-students/orientation",
 
     # D2L / Brightspace
-    "https://www.georgebrown.ca/d2l",
-    "https://www.georgebrown.ca/current-students/brightspace",
+    "/d2l",
+    "/current-students/brightspace",
 
     # Co-op & Career
-    "https://www.georgebrown.ca/current-students/co-op",
-    "https://www.georgebrown.ca/current-students/field-education",
-    "https://www.georgebrown.ca/careerservices",
+    "/current-students/co-op",
+    "/current-students/field-education",
+    "/careerservices",
 
     # Accessibility
-    "https://www.georgebrown.ca/accessibility-services",
-    "https://www.georgebrown.ca/aoda",
-    "https://www.georgebrown.ca/about/policies",
+    "/accessibility-services",
+    "/aoda",
+    "/about/policies",
 
     # FAQ & About
-    "https://www.georgebrown.ca/ask-george-brown",
-    "https://www.georgebrown.ca/contact",
-    "https://www.georgebrown.ca/about"
+    "/ask-george-brown",
+    "/contact",
+    "/about"
 ]
 
+CONED_EXTRA_PATHS = ["/courses-and-programs", "/registration-information", "/policies", "/student-resources", "/about-us", "/contact-us"]
+
 PDF_LOG = "logs/metadata.csv"
 PROGRAM_LOG = "logs/program_urls.csv"
 HTML_LOG = "logs/static_html.csv"
 CONED_LOG = "logs/coned_html.csv"
+HTTP_CACHE = "logs/http_cache.json"
+
+TIMEOUT = (10, 60)  # connect, read
+USER_AGENT = "AskGeorgeBot/1.0 (+https://askgeorge.onrender.com)"
+
 
 # === Log Headers ===
 def init_logs():
+    for folder in ["logs", "raw_data", "raw_programs", "raw_html", "raw_coned"]:
+        os.makedirs(folder, exist_ok=True)
     for log_file, header in [
         (PDF_LOG, ['filename', 'url', 'category', 'date_downloaded']),
         (PROGRAM_LOG, ['title', 'program_code', 'url', 'status', 'category', 'scraped_at']),
@@ -72,117 +90,258 @@ def init_logs():
                 writer = csv.writer(f)
                 writer.writerow(header)
 
-# === 1. Scrape PDF Links ===
-def download_pdfs_from_page(full_url, category):
-    try:
-        response = requests.get(full_url)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        pdf_links = [a['href'] for a in soup.find_all('a', href=True) if a['href'].endswith('.pdf')]
-
-        for pdf_link in pdf_links:
-            pdf_url = urljoin(base_url, pdf_link)
-            filename = pdf_url.split("/")[-1]
-
-            try:
-                r = requests.get(pdf_url)
-                with open(f"raw_data/{filename}", "wb") as f:
-                    f.write(r.content)
-                with open(PDF_LOG, mode='a', newline='') as f:
-                    csv.writer(f).writerow([filename, pdf_url, category, datetime.now().isoformat()])
-                print(f"✅ PDF saved: {filename}")
-            except Exception as e:
-                print(f"❌ Failed to download {filename}: {e}")
-    except Exception as e:
-        print(f"⚠️ Failed to access {full_url}: {e}")
-
-# === 2. Scrape Structured Program Pages ===
-def scrape_program_pages():
-    availability_url = f"{base_url}/programs/program-availability?year=2025&availability=domestic"
-    try:
-        response = requests.get(availability_url)
-        soup = BeautifulSoup(response.text, 'html.parser')
-        rows = soup.select("table tbody tr")
-
-        for row in rows:
+
+def page_text(soup):
+    return "\n".join(el.get_text(strip=True) for el in soup.select('h1, h2, p, li'))
+
+
+def category_for(url):
+    return url.rstrip("/").split("/")[-1].replace("-", " ").title()
+
+
+# === Per-host rate limiter ===
+class HostRateLimiter:
+    def __init__(self, requests_per_second):
+        self.interval = 1.0 / requests_per_second if requests_per_second > 0 else 0.0
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        host = urlparse(url).netloc
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0.0))
+            self._next_slot[host] = slot + self.interval
+        if slot > now:
+            time.sleep(slot - now)
+
+
+class Crawler:
+    def __init__(self, base_url=BASE_URL, coned_base=CONED_BASE, workers=8, rate=4.0, force=False):
+        self.base_url = base_url.rstrip("/")
+        self.coned_base = coned_base.rstrip("/")
+        self.workers = workers
+        self.force = force
+        self.limiter = HostRateLimiter(rate)
+
+        # One pooled session shared by all workers
+        self.session = requests.Session()
+        adapter = HTTPAdapter(
+            pool_connections=8,
+            pool_maxsize=workers,
+            max_retries=Retry(total=3, backoff_factor=0.5, status_forcelist=[429, 500, 502, 503, 504])
+        )
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers["User-Agent"] = USER_AGENT
+
+        # url → {"etag", "last_modified", ...} from earlier runs
+        self.cache = {}
+        if os.path.exists(HTTP_CACHE) and not force:
+            with open(HTTP_CACHE, "r", encoding="utf-8") as f:
+                self.cache = json.load(f)
+        self._lock = threading.Lock()
+        self.stats = {"fetched": 0, "unchanged": 0, "failed": 0}
+
+    # === HTTP helpers ===
+    def fetch(self, url, conditional=True, stream=False):
+        # Returns None when the server answers 304 Not Modified
+        headers = {}
+        cached = self.cache.get(url, {}) if conditional else {}
+        if cached.get("etag"):
+            headers["If-None-Match"] = cached["etag"]
+        if cached.get("last_modified"):
+            headers["If-Modified-Since"] = cached["last_modified"]
+
+        self.limiter.wait(url)
+        response = self.session.get(url, headers=headers, timeout=TIMEOUT, stream=stream)
+        if response.status_code == 304:
+            response.close()
+            self._count("unchanged")
+            return None
+        response.raise_for_status()
+        self._count("fetched")
+        return response
+
+    def remember(self, url, response, **extra):
+        # Validators are only stored once the output is safely on disk
+        with self._lock:
+            self.cache[url] = {
+                "etag": response.headers.get("ETag"),
+                "last_modified": response.headers.get("Last-Modified"),
+                **extra
+            }
+
+    def _count(self, key):
+        with self._lock:
+            self.stats[key] += 1
+
+    def log(self, log_file, row):
+        with self._lock:
+            with open(log_file, mode='a', newline='') as f:
+                csv.writer(f).writerow(row)
+
+    def save_cache(self):
+        tmp_path = HTTP_CACHE + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.cache, f, indent=1)
+        os.replace(tmp_path, HTTP_CACHE)
+
+    # === 1. Static HTML pages (+ the PDF links they contain) ===
+    def scrape_static_page(self, url):
+        category = category_for(url)
+        filename = category.replace(" ", "_").lower() + ".txt"
+        try:
+            response = self.fetch(url, conditional=os.path.exists(f"raw_html/{filename}"))
+            if response is None:
+                print(f"⏭️ Unchanged: {url}")
+                return [(link, category) for link in self.cache.get(url, {}).get("pdf_links", [])]
+
+            soup = BeautifulSoup(response.text, 'html.parser')
+            with open(f"raw_html/{filename}", "w", encoding="utf-8") as f:
+                f.write(page_text(soup))
+            pdf_links = sorted({
+                urljoin(url, a['href']) for a in soup.find_all('a', href=True) if a['href'].endswith('.pdf')
+            })
+            self.remember(url, response, pdf_links=pdf_links)
+            self.log(HTML_LOG, [url, category, datetime.now().isoformat()])
+            print(f"🌐 Static HTML saved: {url}")
+            return [(link, category) for link in pdf_links]
+        except Exception as e:
+            self._count("failed")
+            print(f"❌ Failed to scrape static URL: {url} | {e}")
+            return []
+
+    # === 2. PDFs (streamed to disk) ===
+    def download_pdf(self, pdf_url, category):
+        filename = pdf_url.split("/")[-1]
+        path = f"raw_data/{filename}"
+        try:
+            response = self.fetch(pdf_url, conditional=os.path.exists(path), stream=True)
+            if response is None:
+                print(f"⏭️ Unchanged PDF: {filename}")
+                return
+            tmp_path = path + ".part"
+            with response, open(tmp_path, "wb") as f:
+                for block in response.iter_content(chunk_size=64 * 1024):
+                    f.write(block)
+            os.replace(tmp_path, path)
+            self.remember(pdf_url, response)
+            self.log(PDF_LOG, [filename, pdf_url, category, datetime.now().isoformat()])
+            print(f"✅ PDF saved: {filename}")
+        except Exception as e:
+            self._count("failed")
+            print(f"❌ Failed to download {filename}: {e}")
+
+    # === 3. Structured program pages ===
+    def program_rows(self):
+        availability_url = f"{self.base_url}/programs/program-availability?year=2025&availability=domestic"
+        try:
+            # The listing itself is always fetched: program pages are discovered from it
+            response = self.fetch(availability_url, conditional=False)
+            soup = BeautifulSoup(response.text, 'html.parser')
+        except Exception as e:
+            print(f"❌ Failed to load program availability: {e}")
+            return []
+
+        programs = []
+        for row in soup.select("table tbody tr"):
             cols = row.find_all('td')
             if len(cols) < 3:
                 continue
             link_tag = cols[0].find('a', href=True)
             if not link_tag:
                 continue
-
-            title = link_tag.get_text(strip=True)
             href = link_tag['href']
-            full_url = urljoin(base_url, href)
-            code = href.split('-')[-1].upper()
-            status = cols[-1].get_text(strip=True)
-
-            try:
-                r = requests.get(full_url)
-                s = BeautifulSoup(r.text, 'html.parser')
-                content = "\n".join(el.get_text(strip=True) for el in s.select('h1, h2, p, li'))
-                with open(f"raw_programs/{code}.txt", "w", encoding="utf-8") as f:
-                    f.write(content)
-                with open(PROGRAM_LOG, mode='a', newline='') as f:
-                    csv.writer(f).writerow([title, code, full_url, status, "Program Page", datetime.now().isoformat()])
-                print(f"📘 Program saved: {title} ({code})")
-            except Exception as e:
-                print(f"❌ Failed to scrape program {code}: {e}")
-    except Exception as e:
-        print(f"❌ Failed to load program availability: {e}")
-
-# === 3. Scrape Static HTML Pages ===
-def scrape_static_html():
-    for url in STATIC_URLS:
-        category = url.split("/")[-1].replace("-", " ").title()
+            programs.append({
+                "title": link_tag.get_text(strip=True),
+                "url": urljoin(self.base_url + "/", href),
+                "code": href.split('-')[-1].upper(),
+                "status": cols[-1].get_text(strip=True)
+            })
+        return programs
+
+    def scrape_program_page(self, program):
+        code, title, full_url = program["code"], program["title"], program["url"]
         try:
-            response = requests.get(url)
+            response = self.fetch(full_url, conditional=os.path.exists(f"raw_programs/{code}.txt"))
+            if response is None:
+                print(f"⏭️ Unchanged program: {title} ({code})")
+                return
+            s = BeautifulSoup(response.text, 'html.parser')
+            with open(f"raw_programs/{code}.txt", "w", encoding="utf-8") as f:
+                f.write(page_text(s))
+            self.remember(full_url, response)
+            self.log(PROGRAM_LOG, [title, code, full_url, program["status"], "Program Page", datetime.now().isoformat()])
+            print(f"📘 Program saved: {title} ({code})")
+        except Exception as e:
+            self._count("failed")
+            print(f"❌ Failed to scrape program {code}: {e}")
+
+    # === 4. ConEd sitemap pages ===
+    def coned_urls(self):
+        sitemap_url = f"{self.coned_base}/about-us/site-map"
+        try:
+            response = self.fetch(sitemap_url, conditional=False)
             soup = BeautifulSoup(response.text, 'html.parser')
-            content = "\n".join(el.get_text(strip=True) for el in soup.select('h1, h2, p, li'))
-            filename = category.replace(" ", "_").lower() + ".txt"
-            with open(f"raw_html/{filename}", "w", encoding="utf-8") as f:
-                f.write(content)
-            with open(HTML_LOG, mode='a', newline='') as f:
-                csv.writer(f).writerow([url, category, datetime.now().isoformat()])
-            print(f"🌐 Static HTML saved: {url}")
         except Exception as e:
-            print(f"❌ Failed to scrape static URL: {url} | {e}")
+            print(f"❌ Failed to load ConEd sitemap: {e}")
+            return []
+        links = [a['href'] for a in soup.select('a[href^="/courses-and-programs/"]')] + CONED_EXTRA_PATHS
+        return sorted(set(urljoin(self.coned_base + "/", href) for href in links))
+
+    def scrape_coned_page(self, url):
+        category = category_for(url)
+        filename = category.replace(" ", "_").lower() + ".txt"
+        try:
+            response = self.fetch(url, conditional=os.path.exists(f"raw_coned/{filename}"))
+            if response is None:
+                print(f"⏭️ Unchanged: {url}")
+                return
+            s = BeautifulSoup(response.text, 'html.parser')
+            with open(f"raw_coned/{filename}", "w", encoding="utf-8") as f:
+                f.write(page_text(s))
+            self.remember(url, response)
+            self.log(CONED_LOG, [url, category, datetime.now().isoformat()])
+            print(f"📘 ConEd saved: {url}")
+        except Exception as e:
+            self._count("failed")
+            print(f"❌ Failed to scrape ConEd URL: {url} | {e}")
+
+    # === Run everything through one worker pool ===
+    def run(self):
+        start = time.time()
+        static_urls = [self.base_url + path for path in STATIC_PATHS]
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            static_jobs = pool.map(self.scrape_static_page, static_urls)
+            program_jobs = [pool.submit(self.scrape_program_page, p) for p in self.program_rows()]
+            coned_jobs = [pool.submit(self.scrape_coned_page, u) for u in self.coned_urls()]
+
+            pdfs = {}
+            for links in static_jobs:
+                for pdf_url, category in links:
+                    pdfs.setdefault(pdf_url, category)
+            pdf_jobs = [pool.submit(self.download_pdf, url, category) for url, category in pdfs.items()]
+
+            for job in program_jobs + coned_jobs + pdf_jobs:
+                job.result()
+
+        self.save_cache()
+        print(f"📊 {self.stats['fetched']} fetched, {self.stats['unchanged']} unchanged, "
+              f"{self.stats['failed']} failed in {time.time() - start:.1f}s")
 
-# === 4. Scrape ConEd Sitemap Pages ===
-def scrape_coned_pages():
-    sitemap_url = f"{coned_base}/about-us/site-map"
-    try:
-        res = requests.get(sitemap_url)
-        soup = BeautifulSoup(res.text, 'html.parser')
-        links = [a['href'] for a in soup.select('a[href^="/courses-and-programs/"]')] + [
-            "/courses-and-programs", "/registration-information", "/policies", "/student-resources", "/about-us", "/contact-us"
-        ]
-        links = set(urljoin(coned_base, href) for href in links)
-
-        for url in links:
-            category = url.split("/")[-1].replace("-", " ").title()
-            try:
-                r = requests.get(url)
-                s = BeautifulSoup(r.text, 'html.parser')
-                content = "\n".join(el.get_text(strip=True) for el in s.select('h1, h2, p, li'))
-                filename = category.replace(" ", "_").lower() + ".txt"
-                with open(f"raw_coned/{filename}", "w", encoding="utf-8") as f:
-                    f.write(content)
-                with open(CONED_LOG, mode='a', newline='') as f:
-                    csv.writer(f).writerow([url, category, datetime.now().isoformat()])
-                print(f"📘 ConEd saved: {url}")
-            except Exception as e:
-                print(f"❌ Failed to scrape ConEd URL: {url} | {e}")
-    except Exception as e:
-        print(f"❌ Failed to load ConEd sitemap: {e}")
 
 # === MAIN ===
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Scrape George Brown College pages and PDFs.")
+    parser.add_argument("--base-url", default=os.getenv("GBC_BASE_URL", BASE_URL))
+    parser.add_argument("--coned-base", default=os.getenv("GBC_CONED_BASE", CONED_BASE))
+    parser.add_argument("--workers", type=int, default=8)
+    parser.add_argument("--rate", type=float, default=4.0, help="max requests per second per host")
+    parser.add_argument("--force", action="store_true", help="ignore ETag/Last-Modified and re-download everything")
+    args = parser.parse_args()
+
     print("📦 Initializing GBC full content scraper...")
     init_logs()
-    scrape_static_html()
-    scrape_program_pages()
-    scrape_coned_pages()
-    for url in STATIC_URLS:
-        download_pdfs_from_page(url, category=url.split("/")[-1].title())
+    Crawler(args.base_url, args.coned_base, workers=args.workers, rate=args.rate, force=args.force).run()
     print("✅ All scraping complete.")
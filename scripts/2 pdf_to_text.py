@@ -1,6 +1,16 @@
 import os
-import pdfplumber
 import csv
+import time
+import shutil
+import signal
+import argparse
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from concurrent.futures.process import BrokenProcessPool
+
+import pdfplumber
+
+from ingest_manifest import Manifest, file_hash
 
 # Paths
 script_dir = os.path.dirname(__file__)              # scripts/
@@ -8,38 +18,240 @@ base_dir = os.path.abspath(os.path.join(script_dir, ".."))  # your root folder
 
 raw_folder = os.path.join(base_dir, "pdfs")         # ../pdfs
 clean_folder = os.path.join(base_dir, "clean_text") # ../clean_text
+quarantine_folder = os.path.join(base_dir, "pdfs_quarantine")
 output_csv = os.path.join(base_dir, "logs", "text_metadata.csv")
+timing_csv = os.path.join(base_dir, "logs", "pdf_timing.csv")
+quarantine_csv = os.path.join(base_dir, "logs", "pdf_quarantine.csv")
+
+
+# === Worker: extract a page range of one PDF (runs in a child process) ===
+def _on_timeout(signum, frame):
+    raise TimeoutError("extraction timed out")
+
+def extract_pages(pdf_path, start, stop, timeout):
+    # SIGALRM stops a runaway pdfplumber parse inside the worker (POSIX only)
+    use_alarm = hasattr(signal, "SIGALRM") and timeout
+    if use_alarm:
+        signal.signal(signal.SIGALRM, _on_timeout)
+        signal.alarm(int(timeout))
+    try:
+        with pdfplumber.open(pdf_path) as pdf:
+            pages = pdf.pages[start:stop]
+            return [page.extract_text() or "" for page in pages]
+    finally:
+        if use_alarm:
+            signal.alarm(0)
+
+def count_pages(pdf_path):
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+# === Scheduler: at most one task per worker, so each deadline counts from when its task started ===
+class TaskRunner:
+    # Where SIGALRM is missing, a task still running timeout + 5s after it got a worker is given up on
+    # (the worker stays taken until it returns). A crashed worker breaks the whole pool: the pool is
+    # recreated and the tasks that were in flight are retried one at a time, so only the one that crashes
+    # it again fails.
+    def __init__(self, workers, timeout):
+        self.workers = workers
+        self.timeout = timeout
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+        self.pending = deque()   # (task_id, fn, args, suspect)
+        self.running = {}        # future → (task_id, fn, args, suspect, started)
+        self.abandoned = set()   # timed-out futures still holding a worker
+        self.restarts = 0
+
+    def submit(self, task_id, fn, *args):
+        self.pending.append((task_id, fn, args, False))
+
+    def _fill(self):
+        while self.pending and len(self.running) + len(self.abandoned) < self.workers:
+            suspect = self.pending[0][3]
+            if any(entry[3] for entry in self.running.values()) or (suspect and self.running):
+                break  # a task retried after a crash runs alone
+            task_id, fn, args, suspect = self.pending.popleft()
+            self.running[self.pool.submit(fn, *args)] = (task_id, fn, args, suspect, time.time())
+
+    def _restart(self):
+        self.pool.shutdown(wait=False, cancel_futures=True)
+        self.pool = ProcessPoolExecutor(max_workers=self.workers)
+        self.abandoned = set()
+        self.restarts += 1
+
+    def results(self):
+        # Yields (task_id, result, error, started) as tasks finish; submit() may be called in between
+        while self.pending or self.running:
+            self._fill()
+            if not self.running:
+                self._restart()  # every worker is stuck on an abandoned task
+                continue
+            deadline = min(entry[4] for entry in self.running.values()) + self.timeout + 5
+            wait(list(self.running) + list(self.abandoned), timeout=max(deadline - time.time(), 0),
+                 return_when=FIRST_COMPLETED)
+            self.abandoned = {future for future in self.abandoned if not future.done()}
+
+            crashed = []
+            for future, entry in list(self.running.items()):
+                task_id, _, _, _, started = entry
+                if not future.done():
+                    if time.time() - started > self.timeout + 5:
+                        del self.running[future]
+                        self.abandoned.add(future)
+                        yield task_id, None, f"timed out after {self.timeout}s", started
+                    continue
+                del self.running[future]
+                try:
+                    result, error = future.result(), None
+                except BrokenProcessPool:
+                    crashed.append(entry)
+                    continue
+                except TimeoutError:
+                    result, error = None, f"timed out after {self.timeout}s"
+                except Exception as e:
+                    result, error = None, str(e)
+                yield task_id, result, error, started
+
+            if crashed:
+                crashed += list(self.running.values())
+                self.running = {}
+                self._restart()
+                for task_id, fn, args, suspect, started in reversed(crashed):
+                    if suspect:
+                        yield task_id, None, "worker process crashed", started
+                    else:
+                        self.pending.appendleft((task_id, fn, args, True))
 
-# Ensure folders exist
-os.makedirs(clean_folder, exist_ok=True)
-os.makedirs(os.path.join(base_dir, "logs"), exist_ok=True)
+    def shutdown(self):
+        self.pool.shutdown(wait=not self.abandoned, cancel_futures=True)
 
-# Write metadata CSV
-with open(output_csv, mode="w", newline="") as f:
-    writer = csv.writer(f)
-    writer.writerow(["filename", "text_file", "word_count", "char_count", "category"])
 
-    for filename in os.listdir(raw_folder):
+def quarantine(filename, reason):
+    os.makedirs(quarantine_folder, exist_ok=True)
+    shutil.move(os.path.join(raw_folder, filename), os.path.join(quarantine_folder, filename))
+    new_file = not os.path.exists(quarantine_csv)
+    with open(quarantine_csv, mode="a", newline="") as f:
+        writer = csv.writer(f)
+        if new_file:
+            writer.writerow(["filename", "reason", "quarantined_at"])
+        writer.writerow([filename, reason, time.strftime("%Y-%m-%dT%H:%M:%S")])
+    print(f"🚧 Quarantined {filename} | {reason}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Extract text from PDFs with a process pool.")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--timeout", type=float, default=120, help="seconds per file (per page range for big PDFs)")
+    parser.add_argument("--pages-per-task", type=int, default=50, help="split PDFs longer than this into page ranges")
+    args = parser.parse_args()
+
+    # Ensure folders exist
+    os.makedirs(clean_folder, exist_ok=True)
+    os.makedirs(os.path.join(base_dir, "logs"), exist_ok=True)
+
+    manifest = Manifest(os.path.join(base_dir, "logs", "manifest.json"))
+    extracted = manifest.section("pdf_to_text")
+
+    # === Plan: skip unchanged PDFs, split big ones into page ranges ===
+    rows, todo = [], {}
+    seen = set()
+    for filename in sorted(os.listdir(raw_folder)):
         if not filename.endswith(".pdf"):
             continue
 
         pdf_path = os.path.join(raw_folder, filename)
-        txt_filename = filename.replace(".pdf", ".txt")
-        txt_path = os.path.join(clean_folder, txt_filename)
+        txt_path = os.path.join(clean_folder, filename.replace(".pdf", ".txt"))
+        seen.add(filename)
+
+        # ♻️ Skip PDFs whose content hash is unchanged since the last run
+        digest = file_hash(pdf_path)
+        entry = extracted.get(filename)
+        if entry and entry["hash"] == digest and os.path.exists(txt_path):
+            rows.append([filename, txt_path, entry["word_count"], entry["char_count"], "Unknown"])
+            print(f"⏭️ Unchanged: {filename}")
+            continue
+        todo[filename] = {"path": pdf_path, "txt_path": txt_path, "hash": digest}
+
+    # === Extract in parallel ===
+    # Page counts decide whether a PDF is split into page-range tasks
+    timings = []
+    start_all = time.time()
+    runner = TaskRunner(args.workers, args.timeout)
+    for filename, info in todo.items():
+        runner.submit((filename, None), count_pages, info["path"])
 
-        try:
-            with pdfplumber.open(pdf_path) as pdf:
-                full_text = "\n".join(page.extract_text() or "" for page in pdf.pages)
+    try:
+        for (filename, start), result, error, started in runner.results():
+            info = todo[filename]
+            info.setdefault("started", started)
+            if "error" in info:
+                continue  # already failed: the other page ranges don't matter
+            if error:
+                info["error"] = error if start is not None else f"unreadable: {error}"
+                continue
 
-            with open(txt_path, "w", encoding="utf-8") as f_txt:
+            if start is None:
+                pages = info["pages"] = result
+                step = args.pages_per_task if pages > args.pages_per_task else max(pages, 1)
+                info["parts"] = {}
+                info["part_count"] = len(range(0, max(pages, 1), step))
+                for part_start in range(0, max(pages, 1), step):
+                    runner.submit((filename, part_start), extract_pages, info["path"], part_start, part_start + step, args.timeout)
+                continue
+
+            info["parts"][start] = result
+            if len(info["parts"]) < info["part_count"]:
+                continue
+            full_text = "\n".join(text for part_start in sorted(info["parts"]) for text in info["parts"][part_start])
+            info["parts"] = None
+            with open(info["txt_path"], "w", encoding="utf-8") as f_txt:
                 f_txt.write(full_text)
 
             word_count = len(full_text.split())
             char_count = len(full_text)
             category = "Unknown"  # or hardcoded if needed
 
-            writer.writerow([filename, txt_path, word_count, char_count, category])
-            print(f"✅ Processed: {filename} → {word_count} words")
+            rows.append([filename, info["txt_path"], word_count, char_count, category])
+            extracted[filename] = {"hash": info["hash"], "word_count": word_count, "char_count": char_count}
+            elapsed = round(time.time() - info["started"], 3)
+            timings.append([filename, info["pages"], elapsed, "ok"])
+            print(f"✅ Processed: {filename} → {word_count} words ({elapsed}s)")
+    finally:
+        runner.shutdown()
+    if runner.restarts:
+        print(f"♻️ Process pool recreated {runner.restarts} times after a worker crashed or hung")
+
+    # Quarantined once nothing is reading them any more
+    for filename, info in todo.items():
+        if "error" in info:
+            quarantine(filename, info["error"])
+            timings.append([filename, info.get("pages") or 0, round(time.time() - info.get("started", start_all), 3), "quarantined"])
+            seen.discard(filename)
+
+    # 🧹 Drop text extracted from PDFs that no longer exist (or were quarantined)
+    for filename in set(extracted) - seen:
+        txt_path = os.path.join(clean_folder, filename.replace(".pdf", ".txt"))
+        if os.path.exists(txt_path):
+            os.remove(txt_path)
+        del extracted[filename]
+        print(f"🗑️ Removed: {filename}")
+
+    # Write metadata CSV
+    with open(output_csv, mode="w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["filename", "text_file", "word_count", "char_count", "category"])
+        writer.writerows(sorted(rows))
+
+    with open(timing_csv, mode="w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["filename", "pages", "seconds", "status"])
+        writer.writerows(timings)
+
+    manifest.save()
+    total = time.time() - start_all
+    print(f"📄 Extracted {len(todo)} PDFs with {args.workers} workers in {total:.1f}s "
+          f"({len(rows)} in metadata, {sum(1 for t in timings if t[3] != 'ok')} quarantined)")
+
 
-        except Exception as e:
-            print(f"❌ Failed to process {filename} | {e}")
+if __name__ == "__main__":
+    main()
@@ -1,21 +1,22 @@
 import os
 import csv
-import pandas as pd
-from pathlib import Path
 import re
+import argparse
 
-clean_folder = "clean_text"
-chunk_folder = "chunks"
-log_file = "logs/all_text_metadata.csv"
-chunk_log_file = "logs/chunk_metadata.csv"
+from transformers import AutoTokenizer
 
-os.makedirs(chunk_folder, exist_ok=True)
+from chunk_store import CHUNK_STORE, ChunkStoreWriter, iter_chunks
+from dedup import BoilerplateLearner, boilerplate_fingerprint, dedup_store, save_duplicates, strip_boilerplate
+from ingest_manifest import Manifest, chunk_key, source_name, text_hash
 
-df = pd.read_csv(log_file)
+log_file = "logs/all_text_metadata.csv"
+boilerplate_report = "logs/boilerplate_lines.tsv"
 
-chunk_size = 512
-overlap = 128
-chunk_id = 0
+# all-MiniLM-L6-v2 truncates at 256 tokens including [CLS]/[SEP]; chunks are cut to fit
+TOKENIZER = "sentence-transformers/all-MiniLM-L6-v2"
+MAX_TOKENS = 256 - 2
+OVERLAP = 48
+MIN_TOKENS = 32
 
 # 🧼 Text cleaning function
 def clean_text(text):
@@ -30,44 +31,147 @@ def clean_text(text):
 
     return text.strip()
 
-# 🔄 Start chunking
-with open(chunk_log_file, mode="w", newline="") as f:
-    writer = csv.writer(f)
-    writer.writerow(["chunk_id", "source_file", "category", "word_count", "chunk_text"])
-
-    for _, row in df.iterrows():
-        file_path = row["text_file"]
-        category = row["category"]
-        filename = row["filename"]
-
-        try:
-            with open(file_path, "r", encoding="utf-8") as f_txt:
-                raw_text = f_txt.read()
-                cleaned_text = clean_text(raw_text)
-                words = cleaned_text.split()
-
-            for i in range(0, len(words), chunk_size - overlap):
-                chunk_words = words[i:i + chunk_size]
-                if len(chunk_words) < 100:
-                    continue
-
-                chunk_text = " ".join(chunk_words)
-                chunk_filename = f"{Path(filename).stem}_chunk_{chunk_id}.txt"
-                chunk_path = os.path.join(chunk_folder, chunk_filename)
-
-                with open(chunk_path, "w", encoding="utf-8") as cf:
-                    cf.write(chunk_text)
-
-                writer.writerow([
-                    chunk_id,
-                    filename,
-                    category,
-                    len(chunk_words),
-                    chunk_text[:100].replace("\n", " ") + "..."  # preview only
-                ])
-
-                print(f"✅ Chunked {filename} → {chunk_filename}")
-                chunk_id += 1
-
-        except Exception as e:
-            print(f"❌ Failed to chunk {filename} | {e}")
+
+# ✂️ Token windows that never split a word, so re-tokenizing a chunk gives the same tokens
+def token_windows(word_ids, max_tokens, overlap):
+    n = len(word_ids)
+    start = 0
+    while start < n:
+        end = min(start + max_tokens, n)
+        while end < n and end > start + 1 and word_ids[end] == word_ids[end - 1]:
+            end -= 1
+        yield start, end
+        if end >= n:
+            break
+        next_start = max(end - overlap, start + 1)
+        while next_start < end and word_ids[next_start] == word_ids[next_start - 1]:
+            next_start += 1
+        start = next_start
+
+
+def chunk_source(tokenizer, text, max_tokens, overlap, min_tokens):
+    encoding = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True, verbose=False)
+    offsets = encoding["offset_mapping"]
+    word_ids = encoding.word_ids()
+    chunks = []
+    for start, end in token_windows(word_ids, max_tokens, overlap):
+        # Short tails (mostly overlap with the previous window) are dropped; a short source is kept
+        if chunks and end - start < min_tokens:
+            continue
+        chunks.append((text[offsets[start][0]:offsets[end - 1][1]], end - start))
+    return chunks
+
+
+def learn_boilerplate(min_docs, min_fraction):
+    # First pass over every source: lines repeated across many sources of a category (nav, footers)
+    learner = BoilerplateLearner(min_docs=min_docs, min_fraction=min_fraction)
+    with open(log_file, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            try:
+                with open(row["text_file"], "r", encoding="utf-8") as f_txt:
+                    learner.add(clean_text(f_txt.read()), row["category"])
+            except OSError:
+                continue
+    boilerplate = learner.learn()
+    learner.report(boilerplate, boilerplate_report)
+    print(f"🧽 Learned {sum(len(lines) for lines in boilerplate.values())} boilerplate lines "
+          f"(listed in {boilerplate_report})")
+    return boilerplate
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Token-aware chunking into a single chunk store.")
+    parser.add_argument("--store", default=CHUNK_STORE, help="output path (.jsonl or .parquet)")
+    parser.add_argument("--max-tokens", type=int, default=MAX_TOKENS)
+    parser.add_argument("--overlap", type=int, default=OVERLAP)
+    parser.add_argument("--min-tokens", type=int, default=MIN_TOKENS)
+    parser.add_argument("--boilerplate-min-docs", type=int, default=5, help="0 keeps every line")
+    parser.add_argument("--boilerplate-min-fraction", type=float, default=0.05,
+                        help="share of a category's sources a line must appear in to count as boilerplate")
+    parser.add_argument("--dedup-threshold", type=float, default=0.8,
+                        help="estimated Jaccard similarity above which a chunk is a near-duplicate (0 disables)")
+    args = parser.parse_args()
+
+    tokenizer = AutoTokenizer.from_pretrained(TOKENIZER)
+    manifest = Manifest()
+    chunked = manifest.section("chunks")  # source_name → {"hash", "chunk_count"}
+    boilerplate = learn_boilerplate(args.boilerplate_min_docs, args.boilerplate_min_fraction) if args.boilerplate_min_docs else {}
+    params = f"{TOKENIZER}:{args.max_tokens}:{args.overlap}:{args.min_tokens}:{boilerplate_fingerprint(boilerplate)}"
+
+    seen, unchanged = set(), set()
+    total_chunks = 0
+    chars_in, chars_out = 0, 0
+
+    # 🔄 Single pass over the sources: changed ones are chunked straight into the new store
+    with ChunkStoreWriter(args.store) as writer:
+        with open(log_file, newline="", encoding="utf-8") as f:
+            for row in csv.DictReader(f):
+                file_path = row["text_file"]
+                category = row["category"]
+                filename = row["filename"]
+                source = source_name(file_path)
+                seen.add(source)
+
+                try:
+                    with open(file_path, "r", encoding="utf-8") as f_txt:
+                        raw_text = f_txt.read()
+
+                    digest = text_hash(f"{params}:{category}:" + raw_text)
+                    entry = chunked.get(source)
+                    if entry and entry["hash"] == digest and os.path.exists(args.store):
+                        unchanged.add(source)
+                        continue
+
+                    text = clean_text(raw_text)
+                    chars_in += len(text)
+                    text = strip_boilerplate(text, boilerplate.get(category, set()))
+                    chars_out += len(text)
+                    chunks = chunk_source(tokenizer, text, args.max_tokens, args.overlap, args.min_tokens)
+                    for chunk_id, (chunk_text, token_count) in enumerate(chunks):
+                        writer.write({
+                            "key": chunk_key(source, chunk_id),
+                            "chunk_id": chunk_id,
+                            "source": source,
+                            "source_file": filename,
+                            "category": category,
+                            "token_count": token_count,
+                            "hash": text_hash(chunk_text),
+                            "text": chunk_text
+                        })
+                    chunked[source] = {"hash": digest, "chunk_count": len(chunks)}
+                    total_chunks += len(chunks)
+                    print(f"✅ Chunked {source} → {len(chunks)} chunks")
+
+                except Exception as e:
+                    chunked.pop(source, None)  # re-chunk next run
+                    print(f"❌ Failed to chunk {source} | {e}")
+
+        # ♻️ Carry over chunks of unchanged sources from the previous store
+        # (stores written before chunk keys included the folder have no "source" and are never carried over)
+        for record in iter_chunks(args.store):
+            if record.get("source") in unchanged:
+                writer.write(record)
+                total_chunks += 1
+
+    # 🧹 Forget sources that no longer exist
+    for source in set(chunked) - seen:
+        del chunked[source]
+        print(f"🗑️ Removed chunks of: {source}")
+
+    manifest.save()
+    print(f"📦 {total_chunks} chunks ({len(unchanged)} sources unchanged) → {args.store}")
+    if chars_in:
+        print(f"🧽 Boilerplate removed {chars_in - chars_out} of {chars_in} characters "
+              f"({(chars_in - chars_out) / chars_in:.1%}) from the re-chunked sources")
+
+    # 🪞 Near-duplicate chunks stay in the store but are listed for 5 embed_for_langchain to skip
+    duplicates, stats = dedup_store(args.store, args.dedup_threshold) if args.dedup_threshold else ({}, None)
+    save_duplicates(args.store, duplicates)
+    if stats and stats["chunks"]:
+        print(f"🪞 {stats['duplicates']} near-duplicate chunks ({stats['duplicates'] / stats['chunks']:.1%}) "
+              f"won't be embedded: index shrinks to {stats['chunks'] - stats['duplicates']} chunks, "
+              f"{stats['tokens'] - stats['duplicate_tokens']} of {stats['tokens']} tokens")
+
+
+if __name__ == "__main__":
+    main()
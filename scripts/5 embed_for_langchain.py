@@ -1,51 +1,127 @@
 import os
-from pathlib import Path
-import pandas as pd
-from langchain_core.documents import Document
-from langchain_community.vectorstores import Chroma
-from langchain_community.embeddings import HuggingFaceEmbeddings
+import sys
+import json
+import time
+import argparse
+from langchain_chroma import Chroma
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from agents.embedding_backend import create_embeddings
+from agents.flat_index import build_flat_index
+from chunk_store import CHUNK_STORE, iter_chunks
+from dedup import load_duplicates
+from ingest_manifest import Manifest
 
 # === Paths ===
-chunk_folder = "chunks"
-chunk_log_file = "logs/chunk_metadata.csv"
 persist_dir = "chroma_index"  # LangChain-compatible output
 
-# === Load metadata ===
-df = pd.read_csv(chunk_log_file)
-
-# === Build LangChain Document objects ===
-documents = []
-for _, row in df.iterrows():
-    chunk_id = str(row["chunk_id"])
-    source_file = row["source_file"]
-    category = row["category"]
-    chunk_filename = f"{Path(source_file).stem}_chunk_{chunk_id}.txt"
-    chunk_path = os.path.join(chunk_folder, chunk_filename)
-
-    if not os.path.exists(chunk_path):
-        continue
-
-    with open(chunk_path, "r", encoding="utf-8") as f:
-        content = f.read()
-
-    documents.append(Document(
-        page_content=content,
-        metadata={
-            "chunk_id": chunk_id,
-            "source_file": source_file,
-            "category": category
-        }
-    ))
-
-print(f"📚 Loaded {len(documents)} documents for embedding.")
-
-# === Embed and build vector store ===
-embedding = HuggingFaceEmbeddings(model_name="all-MiniLM-L6-v2")
-print("⚙️  Building Chroma vector store for LangChain...")
-db = Chroma.from_documents(
-    documents=documents,
-    embedding=embedding,
-    persist_directory=persist_dir
-)
-db.persist()
-print(f"✅ LangChain-compatible Chroma index saved to: {persist_dir}")
+
+def plan(store, embedded):
+    # Stream the chunk store: keep only keys/hashes in memory, not chunk text.
+    # Near-duplicates found by 4 chunk_texts are left out (and removed if they were embedded before).
+    duplicates = load_duplicates(store)
+    current, pending = {}, set()
+    for record in iter_chunks(store, columns=["key", "hash"]):
+        if record["key"] in duplicates:
+            continue
+        current[record["key"]] = record["hash"]
+        if embedded.get(record["key"]) != record["hash"]:
+            pending.add(record["key"])
+    return current, pending, len(duplicates)
+
+
+def batches(store, pending, batch_size):
+    # Second streaming pass: chunk text is only held for the batch being embedded
+    ids, texts, metadatas = [], [], []
+    for record in iter_chunks(store):
+        if record["key"] not in pending:
+            continue
+        ids.append(record["key"])
+        texts.append(record["text"])
+        metadatas.append({
+            "chunk_id": str(record["chunk_id"]),
+            "source_file": record["source_file"],
+            "category": record["category"]
+        })
+        if len(ids) >= batch_size:
+            yield ids, texts, metadatas
+            ids, texts, metadatas = [], [], []
+    if ids:
+        yield ids, texts, metadatas
+
+
+def refresh_derived_indexes(collection):
+    # The agent's BM25 index mirrors the collection; drop it so it is rebuilt on next start
+    bm25_path = os.path.join(persist_dir, "bm25.json")
+    if os.path.exists(bm25_path):
+        os.remove(bm25_path)
+
+    # Keep the memory-mapped flat index (VECTOR_STORE=flat) in step with the collection once it has been built
+    flat_path = os.getenv("FLAT_INDEX_PATH", "flat_index")
+    if os.path.exists(os.path.join(flat_path, "index.json")):
+        with open(os.path.join(flat_path, "index.json"), encoding="utf-8") as f:
+            dtype = json.load(f)["dtype"]
+        count = build_flat_index(collection, flat_path, dtype=dtype)
+        print(f"🗂️ Flat index rebuilt at {flat_path} ({count} chunks, {dtype})")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Embed chunks into the Chroma index in resumable batches.")
+    parser.add_argument("--store", default=CHUNK_STORE, help="chunk store written by 4 chunk_texts")
+    parser.add_argument("--batch-size", type=int, default=256, help="chunks per upsert/checkpoint")
+    parser.add_argument("--encode-batch-size", type=int, default=32, help="embedding model batch size")
+    args = parser.parse_args()
+
+    manifest = Manifest()
+    embedded = manifest.section("embeddings")  # chunk key → chunk hash already in the index (the checkpoint)
+
+    # === Diff chunks against what is already embedded ===
+    current, pending, skipped = plan(args.store, embedded)
+    stale_ids = [key for key in embedded if key not in current]
+    print(f"📚 {len(current)} chunks: {len(pending)} new/changed, {len(stale_ids)} removed, "
+          f"{len(current) - len(pending)} unchanged, {skipped} near-duplicates skipped.")
+
+    if not pending and not stale_ids:
+        print("✅ Index already up to date.")
+        return
+
+    # EMBEDDING_BACKEND=onnx builds the index with the int8 model the agent will query it with
+    embedding = create_embeddings(batch_size=args.encode_batch_size) if pending else None
+    db = Chroma(persist_directory=persist_dir, embedding_function=embedding)
+
+    if not embedded and db._collection.count() > 0:
+        # Index predates the manifest (random vector ids): rebuild it once so ids are stable
+        print("♻️ No manifest for existing index, rebuilding from scratch...")
+        db.reset_collection()
+        stale_ids = []
+
+    if stale_ids:
+        db.delete(ids=stale_ids)
+        for key in stale_ids:
+            del embedded[key]
+        manifest.save()
+
+    # === Embed + upsert batch by batch, checkpointing after each ===
+    done, embed_seconds = 0, 0.0
+    start = time.time()
+    for ids, texts, metadatas in batches(args.store, pending, args.batch_size):
+        t0 = time.time()
+        vectors = embedding.embed_documents(texts)
+        embed_seconds += time.time() - t0
+
+        db._collection.upsert(ids=ids, embeddings=vectors, documents=texts, metadatas=metadatas)
+        for key in ids:
+            embedded[key] = current[key]
+        manifest.save()
+
+        done += len(ids)
+        elapsed = time.time() - start
+        print(f"⚙️  {done}/{len(pending)} chunks | {done / max(embed_seconds, 1e-9):.1f} embeddings/s "
+              f"| {done / elapsed:.1f} chunks/s end-to-end")
+
+    refresh_derived_indexes(db._collection)
+    print(f"✅ LangChain-compatible Chroma index updated at: {persist_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,36 @@
+# Builds the memory-mapped flat vector index (VECTOR_STORE=flat) from the Chroma index
+#
+#   python scripts/build_flat_index.py                  # float32 (fastest)
+#   python scripts/build_flat_index.py --dtype float16  # half the memory, slower queries
+#
+# Vectors are copied, not re-embedded, so both engines serve exactly the same chunks.
+# 5 embed_for_langchain rebuilds it automatically once it exists.
+import os
+import sys
+import time
+import argparse
+
+import chromadb
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from agents.flat_index import build_flat_index, load_flat_index
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the flat vector index from chroma_index.")
+    parser.add_argument("--chroma", default=os.getenv("CHROMA_PATH", "chroma_index"))
+    parser.add_argument("--out", default=os.getenv("FLAT_INDEX_PATH", "flat_index"))
+    parser.add_argument("--dtype", choices=["float32", "float16"], default="float32")
+    args = parser.parse_args()
+
+    start = time.time()
+    collection = chromadb.PersistentClient(path=args.chroma).get_collection("langchain")
+    count = build_flat_index(collection, args.out, dtype=args.dtype)
+    index = load_flat_index(args.out)
+    size_mb = sum(os.path.getsize(os.path.join(args.out, name)) for name in os.listdir(args.out)) / 1e6
+    print(f"✅ Flat index: {count} × {index.vectors.shape[1]} {args.dtype} vectors, {size_mb:.1f} MB on disk "
+          f"at {args.out} ({time.time() - start:.1f}s)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,88 @@
+# Single-file chunk store written by 4 chunk_texts and read directly by 5 embed_for_langchain
+#
+# One record per chunk: key, chunk_id, source (path from the project root), source_file, category, token_count,
+# hash, text.
+# JSONL by default; Parquet when the path ends in .parquet (needs pyarrow).
+
+import os
+import json
+
+CHUNK_STORE = "chunks/chunks.jsonl"
+PARQUET_ROW_GROUP = 1000
+
+
+class ChunkStoreWriter:
+    # Writes to a temp file and swaps it in on close, so readers never see a half-written store
+    def __init__(self, path=CHUNK_STORE):
+        self.path = path
+        self.tmp_path = path + ".tmp"
+        self.count = 0
+        self._parquet = path.endswith(".parquet")
+        self._rows = []
+        self._writer = None
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if not self._parquet:
+            self._file = open(self.tmp_path, "w", encoding="utf-8")
+
+    def write(self, record):
+        self.count += 1
+        if self._parquet:
+            self._rows.append(record)
+            if len(self._rows) >= PARQUET_ROW_GROUP:
+                self._flush_parquet()
+        else:
+            self._file.write(json.dumps(record, ensure_ascii=False) + "\n")
+
+    def _flush_parquet(self):
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if not self._rows:
+            return
+        table = pa.Table.from_pylist(self._rows)
+        if self._writer is None:
+            self._writer = pq.ParquetWriter(self.tmp_path, table.schema)
+        self._writer.write_table(table)
+        self._rows = []
+
+    def close(self):
+        if self._parquet:
+            self._flush_parquet()
+            if self._writer is not None:
+                self._writer.close()
+            elif not os.path.exists(self.tmp_path):
+                open(self.tmp_path, "wb").close()
+        else:
+            self._file.close()
+        os.replace(self.tmp_path, self.path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is None:
+            self.close()
+        else:
+            if not self._parquet:
+                self._file.close()
+            elif self._writer is not None:
+                self._writer.close()
+            if os.path.exists(self.tmp_path):
+                os.remove(self.tmp_path)
+
+
+def iter_chunks(path=CHUNK_STORE, columns=None):
+    # Streams records without loading the whole store
+    if not os.path.exists(path) or os.path.getsize(path) == 0:
+        return
+    if path.endswith(".parquet"):
+        import pyarrow.parquet as pq
+
+        parquet = pq.ParquetFile(path)
+        for batch in parquet.iter_batches(columns=columns):
+            yield from batch.to_pylist()
+    else:
+        with open(path, "r", encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                yield {c: record[c] for c in columns} if columns else record
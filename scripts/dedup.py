@@ -0,0 +1,177 @@
+# Corpus-level cleaning used by 4 chunk_texts and pipeline.py:
+#
+#   BoilerplateLearner   lines that repeat across many sources of a category (site navigation, footers,
+#                        policy blurbs) are learned from the corpus and stripped before chunking
+#   NearDuplicateFilter  MinHash signatures + LSH banding: a chunk whose word shingles overlap an earlier
+#                        chunk's by >= threshold (estimated Jaccard) is marked as a duplicate of it
+#
+# Duplicates stay in the chunk store (so unchanged sources can be carried over) and are listed in a
+# sidecar file next to it; 5 embed_for_langchain skips them.
+
+import os
+import json
+import zlib
+import hashlib
+from collections import Counter, defaultdict
+
+import numpy as np
+
+from chunk_store import iter_chunks
+
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+def normalize_line(line):
+    return " ".join(line.lower().split())
+
+
+def line_hash(line):
+    return hashlib.blake2b(normalize_line(line).encode("utf-8"), digest_size=8).hexdigest()
+
+
+# === Boilerplate lines ===
+class BoilerplateLearner:
+    def __init__(self, min_docs=5, min_fraction=0.05):
+        self.min_docs = min_docs
+        self.min_fraction = min_fraction
+        self._docs = Counter()                 # category → sources seen
+        self._counts = defaultdict(Counter)    # category → line hash → sources containing it
+        self._examples = {}
+
+    def add(self, text, category=""):
+        self._docs[category] += 1
+        lines = {}
+        for line in text.splitlines():
+            if line.strip():
+                lines.setdefault(line_hash(line), line.strip())
+        self._counts[category].update(lines.keys())
+        for digest, line in lines.items():
+            self._examples.setdefault(digest, line)
+
+    def learn(self):
+        # {category: set of line hashes}; a line is boilerplate when enough sources of its category repeat it
+        boilerplate = {}
+        for category, counts in self._counts.items():
+            min_count = max(self.min_docs, self.min_fraction * self._docs[category])
+            boilerplate[category] = {digest for digest, count in counts.items() if count >= min_count}
+        return boilerplate
+
+    def report(self, boilerplate, path):
+        # Most repeated lines first, so a too-aggressive threshold is easy to spot
+        rows = [(self._counts[category][digest], category, self._examples[digest])
+                for category, digests in boilerplate.items() for digest in digests]
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w", encoding="utf-8") as f:
+            for count, category, line in sorted(rows, key=lambda row: -row[0]):
+                f.write(f"{count}\t{category}\t{line}\n")
+
+
+def load_boilerplate(path):
+    # Reads back a report, for the streaming pipeline, which can't learn before it strips
+    boilerplate = defaultdict(set)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            for row in f:
+                _, category, line = row.rstrip("\n").split("\t", 2)
+                boilerplate[category].add(line_hash(line))
+    return dict(boilerplate)
+
+
+def strip_boilerplate(text, boilerplate):
+    return "\n".join(line for line in text.splitlines() if line_hash(line) not in boilerplate)
+
+
+def boilerplate_fingerprint(boilerplate):
+    # Goes into the chunking params: a different learned set re-chunks every source
+    digest = hashlib.sha256()
+    for category in sorted(boilerplate):
+        digest.update(category.encode("utf-8"))
+        digest.update("".join(sorted(boilerplate[category])).encode("utf-8"))
+    return digest.hexdigest()[:16]
+
+
+# === Near-duplicate chunks (MinHash + LSH) ===
+class NearDuplicateFilter:
+    def __init__(self, threshold=0.8, num_perm=128, bands=16, shingle_size=5, seed=1):
+        if num_perm % bands:
+            raise ValueError("num_perm must be a multiple of bands")
+        self.threshold = threshold
+        self.bands = bands
+        self.rows = num_perm // bands
+        self.shingle_size = shingle_size
+        rng = np.random.default_rng(seed)
+        self._a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+        self._buckets = [{} for _ in range(bands)]
+        self._signatures = {}
+
+    def signature(self, text):
+        words = normalize_line(text).split()
+        n = self.shingle_size
+        shingles = {" ".join(words[i:i + n]) for i in range(max(len(words) - n + 1, 1))}
+        hashes = np.fromiter((zlib.crc32(s.encode("utf-8")) for s in shingles), dtype=np.uint64, count=len(shingles))
+        # h(x) = (a·x + b) mod p for every permutation at once; the signature is the min per permutation
+        return ((self._a[:, None] * hashes[None, :] + self._b[:, None]) % MERSENNE_PRIME).min(axis=1).astype(np.uint32)
+
+    def similarity(self, key, signature):
+        # Estimated Jaccard similarity to an indexed chunk (0.0 if it isn't indexed)
+        return float(np.mean(self._signatures[key] == signature)) if key in self._signatures else 0.0
+
+    def add(self, key, text):
+        # Returns the key of the earlier chunk this one duplicates, or None (and indexes it)
+        return self.add_signature(key, self.signature(text))
+
+    def add_signature(self, key, signature):
+        bands = [signature[i * self.rows:(i + 1) * self.rows].tobytes() for i in range(self.bands)]
+        candidates = {other for band, bucket in zip(bands, self._buckets) for other in bucket.get(band, ())}
+        for other in sorted(candidates):
+            if self.similarity(other, signature) >= self.threshold:
+                return other
+        self._signatures[key] = signature
+        for band, bucket in zip(bands, self._buckets):
+            bucket.setdefault(band, []).append(key)
+        return None
+
+
+def dedup_store(store, threshold=0.8):
+    # Signatures are computed streaming, then inserted in (source, chunk_id) order so the copy that
+    # is kept doesn't depend on which sources were carried over. Returns ({duplicate: kept}, stats).
+    dedup = NearDuplicateFilter(threshold=threshold)
+    signatures, order, tokens = {}, [], {}
+    for record in iter_chunks(store, columns=["key", "source", "chunk_id", "token_count", "text"]):
+        signatures[record["key"]] = dedup.signature(record["text"])
+        tokens[record["key"]] = record["token_count"]
+        order.append((record["source"], record["chunk_id"], record["key"]))
+
+    duplicates = {}
+    for _, _, key in sorted(order):
+        kept = dedup.add_signature(key, signatures.pop(key))
+        if kept is not None:
+            duplicates[key] = kept
+    stats = {
+        "chunks": len(order),
+        "duplicates": len(duplicates),
+        "tokens": sum(tokens.values()),
+        "duplicate_tokens": sum(tokens[key] for key in duplicates)
+    }
+    return duplicates, stats
+
+
+# === Sidecar next to the chunk store ===
+def duplicates_path(store):
+    return os.path.splitext(store)[0] + ".duplicates.json"
+
+
+def save_duplicates(store, duplicates):
+    path = duplicates_path(store)
+    with open(path + ".tmp", "w", encoding="utf-8") as f:
+        json.dump(duplicates, f, ensure_ascii=False)
+    os.replace(path + ".tmp", path)
+
+
+def load_duplicates(store):
+    path = duplicates_path(store)
+    if not os.path.exists(path):
+        return {}
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
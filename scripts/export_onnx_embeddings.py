@@ -0,0 +1,25 @@
+# Exports all-MiniLM-L6-v2 to an int8-quantized ONNX model for EMBEDDING_BACKEND=onnx
+#
+#   python scripts/export_onnx_embeddings.py
+#   python benchmarks/embeddings.py            # check it agrees with the PyTorch model before switching
+import os
+import sys
+import argparse
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+from agents.embedding_backend import EMBED_MODEL, export_onnx
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export the embedding model to int8 ONNX.")
+    parser.add_argument("--model", default=EMBED_MODEL)
+    parser.add_argument("--out", default=os.getenv("EMBED_ONNX_PATH", "models/all-MiniLM-L6-v2-onnx-int8"))
+    args = parser.parse_args()
+
+    path = export_onnx(args.model, args.out)
+    fp32_mb = os.path.getsize(os.path.join(args.out, "model.onnx")) / 1e6
+    print(f"✅ Exported {args.model} → {path} ({os.path.getsize(path) / 1e6:.1f} MB int8, {fp32_mb:.1f} MB fp32)")
+
+
+if __name__ == "__main__":
+    main()
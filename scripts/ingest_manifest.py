@@ -0,0 +1,57 @@
+# Content-hash manifest shared by the ingestion scripts (2 → 4 → 5)
+#
+# Each stage keeps its own section, e.g.
+#   "pdf_to_text": {pdf filename: {"hash", "word_count", "char_count"}}
+#   "chunks":      {source path: {"hash", "chunk_count"}}  (the chunks themselves are in chunks/chunks.jsonl)
+#   "embeddings":  {chunk key: chunk hash}
+# so a re-run only redoes work for new or changed inputs and cleans up removed ones.
+
+import os
+import json
+import hashlib
+from pathlib import Path
+
+MANIFEST_PATH = "logs/manifest.json"
+
+
+def file_hash(path):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def text_hash(text):
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def source_name(path):
+    # A source's path relative to the project root the scripts run from (clean_text/foo.txt, pages/foo.txt):
+    # unique, unlike its filename
+    return Path(os.path.relpath(path)).as_posix()
+
+
+def chunk_key(source, chunk_id):
+    # Stable id per chunk, used as the Chroma vector id; `source` is a source_name, so two sources with
+    # the same filename in different folders never share ids
+    return f"{source}_chunk_{chunk_id}"
+
+
+class Manifest:
+    def __init__(self, path=MANIFEST_PATH):
+        self.path = path
+        self.data = {}
+        if os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.data = json.load(f)
+
+    def section(self, name):
+        return self.data.setdefault(name, {})
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        tmp_path = self.path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.data, f, ensure_ascii=False, indent=1)
+        os.replace(tmp_path, self.path)
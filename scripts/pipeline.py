@@ -0,0 +1,485 @@
+# Streaming ingestion: scrape → extract → clean → chunk → embed → upsert in one command
+#
+# Each stage is a pool of worker threads reading from a bounded queue. Documents flow on as soon as
+# they are fetched (no clean_text/, chunks/ or metadata CSVs in between), and a slow stage makes the
+# ones before it wait instead of piling work up. Throughput and backlog per stage are printed as it runs.
+#
+#   python scripts/pipeline.py                                   # crawl the site, update chroma_index/
+#   python scripts/pipeline.py --source local --dry-run          # pdfs/ + pages/, nothing written
+#   python scripts/pipeline.py --workers scrape=8,extract=4,embed=2
+#
+# A dry run leaves the index, the manifest, clean_text/ and the boilerplate report alone. A web dry run
+# still crawls, though: the crawler saves what it downloads to raw_html/, raw_programs/, raw_coned/ and
+# raw_data/ and appends to its logs/*.csv (logs/http_cache.json isn't saved).
+#
+# Incremental like the numbered scripts: unchanged pages get a 304, PDFs with an unchanged hash reuse
+# their extracted text (manifest "pdf_to_text"), chunks already in the manifest's "embeddings" section
+# aren't re-embedded, and chunks that are gone are deleted once every source went through cleanly.
+# Chunk keys come from the source's path (raw_html/policies.txt, raw_coned/policies.txt, a PDF's
+# clean_text/foo.txt), so same-named pages from different parts of the site don't overwrite each other.
+# Boilerplate lines are the ones 4 chunk_texts learned (logs/boilerplate_lines.tsv). Near-duplicates are
+# dropped as they stream past: the first copy to arrive is kept, and that choice is remembered (manifest
+# "duplicates") so the next run, arriving in a different order, doesn't swap copies and re-embed them.
+
+import os
+import sys
+import glob
+import time
+import queue
+import argparse
+import threading
+import importlib.util
+from concurrent.futures import ProcessPoolExecutor
+
+from transformers import AutoTokenizer
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.abspath(os.path.join(script_dir, "..")))
+from agents.embedding_backend import create_embeddings
+from dedup import BoilerplateLearner, NearDuplicateFilter, load_boilerplate, strip_boilerplate
+from ingest_manifest import Manifest, chunk_key, file_hash, source_name, text_hash
+
+STAGES = ("scrape", "extract", "clean", "chunk", "embed", "upsert")
+WORKERS = {"scrape": 8, "extract": os.cpu_count() or 2, "clean": 2, "chunk": 2, "embed": 1, "upsert": 1}
+UNITS = {"scrape": "tasks", "extract": "docs", "clean": "docs", "chunk": "docs", "embed": "chunks", "upsert": "chunks"}
+DONE = object()  # end-of-stream marker, one per worker of the receiving stage
+
+
+def load_script(filename, name):
+    # The numbered scripts have spaces in their names, so they're loaded by path
+    spec = importlib.util.spec_from_file_location(name, os.path.join(script_dir, filename))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module  # so the extraction processes can unpickle its functions
+    spec.loader.exec_module(module)
+    return module
+
+
+def parse_workers(spec):
+    workers = dict(WORKERS)
+    for part in filter(None, (spec or "").split(",")):
+        stage, _, count = part.partition("=")
+        if stage not in workers:
+            raise ValueError(f"Unknown stage '{stage}' (stages: {', '.join(STAGES)})")
+        workers[stage] = max(int(count), 1)
+    workers["upsert"] = 1  # one writer: the manifest checkpoint is saved after each upsert
+    return workers
+
+
+# === One stage: worker threads between two bounded queues ===
+class Stage:
+    def __init__(self, name, fn, workers=1, batch_size=1, queue_size=64):
+        self.name = name
+        self.fn = fn
+        self.workers = workers
+        self.batch_size = batch_size
+        self.inbox = queue.Queue(maxsize=queue_size)
+        self.next = None
+        self.done = 0
+        self.failed = 0
+        self.busy = 0.0
+        self._running = workers
+        self._lock = threading.Lock()
+
+    def start(self):
+        return [threading.Thread(target=self._work, name=f"{self.name}-{i}", daemon=True) for i in range(self.workers)]
+
+    def _take(self):
+        # Blocks for the first item, then tops a batch up with whatever arrives within 50ms
+        item = self.inbox.get()
+        if item is DONE or self.batch_size == 1:
+            return item, item is DONE
+        batch = [item]
+        while len(batch) < self.batch_size:
+            try:
+                item = self.inbox.get(timeout=0.05)
+            except queue.Empty:
+                break
+            if item is DONE:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _work(self):
+        finished = False
+        while not finished:
+            item, finished = self._take()
+            if item is DONE:
+                break
+            size = len(item) if isinstance(item, list) else 1
+            start = time.perf_counter()
+            try:
+                for out in self.fn(item) or ():
+                    if self.next is not None:
+                        self.next.inbox.put(out)
+                ok = True
+            except Exception as e:
+                ok = False
+                print(f"❌ {self.name} failed for {describe(item)} | {e}")
+            with self._lock:
+                self.busy += time.perf_counter() - start
+                if ok:
+                    self.done += size
+                else:
+                    self.failed += size
+
+        with self._lock:
+            self._running -= 1
+            last = self._running == 0
+        if last and self.next is not None:
+            for _ in range(self.next.workers):
+                self.next.inbox.put(DONE)
+
+
+def describe(item):
+    if isinstance(item, list):
+        return f"a batch of {len(item)}"
+    if isinstance(item, dict):
+        return item.get("source") or item.get("key")
+    return str(item)[:80]
+
+
+# === The six stages ===
+class IngestPipeline:
+    def __init__(self, args, workers):
+        self.args = args
+        self.workers = workers
+        self.chunker = load_script("4 chunk_texts.py", "chunk_texts")
+        self.extractor = load_script("2 pdf_to_text.py", "pdf_to_text")
+        self.embedder = load_script("5 embed_for_langchain.py", "embed_for_langchain")
+        self.crawler_module = None
+        self.crawler = None
+
+        self.manifest = Manifest()
+        self.extracted = self.manifest.section("pdf_to_text")  # pdf filename → {"hash", "word_count", "char_count"}
+        self.embedded = self.manifest.section("embeddings")    # chunk key → chunk hash already in the index
+        self.known_duplicates = self.manifest.section("duplicates")  # chunk key → [chunk hash, key of the copy kept]
+        self.duplicates = {}
+        self._sticky = {}  # duplicates skipped because of an earlier run, re-checked once the stream ends
+        self._manifest_lock = threading.Lock()
+
+        self.boilerplate = {} if args.no_boilerplate else load_boilerplate(self.chunker.boilerplate_report)
+        self.learner = BoilerplateLearner()
+        self.dedup = NearDuplicateFilter(threshold=args.dedup_threshold) if args.dedup_threshold else None
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._pdfs = set()
+        self.seen_keys = set()
+        self.counts = {"chars_in": 0, "chars_out": 0, "chunks": 0, "duplicates": 0, "unchanged": 0}
+
+        self.pool = None
+        self.embedding = None
+        self.collection = None
+
+    # === Sources: crawl tasks, or the local folders 2 pdf_to_text and 3 generate_metadata read ===
+    def tasks(self):
+        if self.args.source == "local":
+            for path in sorted(glob.glob(os.path.join(self.extractor.raw_folder, "*.pdf"))):
+                yield "pdf", path
+            for path in sorted(glob.glob("pages/*.txt")):
+                yield "text", path
+            return
+        for path in self.crawler_module.STATIC_PATHS:
+            yield "static", self.crawler.base_url + path
+        for program in self.crawler.program_rows():
+            yield "program", program
+        for url in self.crawler.coned_urls():
+            yield "coned", url
+
+    # "source" (the path, unique) keys the chunks; "filename" is what the agent shows and routes on
+    def text_doc(self, path):
+        if not os.path.exists(path):
+            return []  # the crawler already reported why
+        with open(path, "r", encoding="utf-8") as f:
+            return [{"source": source_name(path), "filename": os.path.basename(path), "category": "All Page",
+                     "pdf": None, "text": f.read()}]
+
+    def pdf_doc(self, path):
+        if not os.path.exists(path):
+            return []
+        # Keyed like 4 chunk_texts keys it: by the extracted text's path in clean_text/
+        filename = os.path.basename(path).replace(".pdf", ".txt")
+        return [{"source": source_name(os.path.join(self.extractor.clean_folder, filename)), "filename": filename,
+                 "category": "PDF", "pdf": path, "text": None}]
+
+    def scrape(self, task):
+        # The crawler writes each page/PDF to its raw_* cache (which is also what a 304 falls back on)
+        kind, target = task
+        if kind == "pdf":
+            return self.pdf_doc(target)
+        if kind == "text":
+            return self.text_doc(target)
+        if kind == "program":
+            self.crawler.scrape_program_page(target)
+            return self.text_doc(f"raw_programs/{target['code']}.txt")
+
+        filename = self.crawler_module.category_for(target).replace(" ", "_").lower() + ".txt"
+        if kind == "coned":
+            self.crawler.scrape_coned_page(target)
+            return self.text_doc(f"raw_coned/{filename}")
+
+        pdf_links = self.crawler.scrape_static_page(target)
+        docs = self.text_doc(f"raw_html/{filename}")
+        for pdf_url, category in pdf_links:
+            with self._lock:
+                if pdf_url in self._pdfs:
+                    continue
+                self._pdfs.add(pdf_url)
+            self.crawler.download_pdf(pdf_url, category)
+            docs += self.pdf_doc(f"raw_data/{pdf_url.split('/')[-1]}")
+        return docs
+
+    def extract(self, doc):
+        if doc["pdf"] is None:
+            return [doc]
+        pdf_name = os.path.basename(doc["pdf"])
+        txt_path = os.path.join(self.extractor.clean_folder, doc["filename"])
+        digest = file_hash(doc["pdf"])
+        entry = self.extracted.get(pdf_name)
+        if entry and entry["hash"] == digest and os.path.exists(txt_path):
+            with open(txt_path, "r", encoding="utf-8") as f:
+                doc["text"] = f.read()
+            return [doc]
+
+        # pdfplumber is CPU-bound: the page text comes from a process pool, the thread just waits on it
+        job = self.pool.submit(self.extractor.extract_pages, doc["pdf"], 0, None, self.args.timeout)
+        doc["text"] = "\n".join(job.result(timeout=self.args.timeout + 5))
+        if not self.args.dry_run:
+            with open(txt_path, "w", encoding="utf-8") as f:
+                f.write(doc["text"])
+            with self._manifest_lock:
+                self.extracted[pdf_name] = {"hash": digest, "word_count": len(doc["text"].split()), "char_count": len(doc["text"])}
+        return [doc]
+
+    def clean(self, doc):
+        text = self.chunker.clean_text(doc["text"])
+        doc["text"] = strip_boilerplate(text, self.boilerplate.get(doc["category"], set()))
+        with self._lock:
+            self.learner.add(text, doc["category"])
+            self.counts["chars_in"] += len(text)
+            self.counts["chars_out"] += len(doc["text"])
+        return [doc]
+
+    def chunk(self, doc):
+        # Fast tokenizers aren't safe to share between threads, so each chunk worker loads its own
+        if not hasattr(self._local, "tokenizer"):
+            self._local.tokenizer = AutoTokenizer.from_pretrained(self.chunker.TOKENIZER)
+        chunks = self.chunker.chunk_source(self._local.tokenizer, doc["text"], self.chunker.MAX_TOKENS,
+                                           self.chunker.OVERLAP, self.chunker.MIN_TOKENS)
+        for chunk_id, (chunk_text, _) in enumerate(chunks):
+            key = chunk_key(doc["source"], chunk_id)
+            digest = text_hash(chunk_text)
+            metadata = {"chunk_id": str(chunk_id), "source_file": doc["filename"], "category": doc["category"]}
+            # The MinHash signature is computed outside the lock; only the LSH lookup is serialized
+            signature = self.dedup.signature(chunk_text) if self.dedup is not None else None
+            with self._lock:
+                self.counts["chunks"] += 1
+                if self.dedup is not None:
+                    known = self.known_duplicates.get(key)
+                    if known and known[0] == digest:
+                        self._sticky[key] = (signature, known[1], chunk_text, metadata)
+                        kept = known[1]
+                    else:
+                        kept = self.dedup.add_signature(key, signature)
+                    if kept is not None:
+                        self.duplicates[key] = [digest, kept]
+                        self.counts["duplicates"] += 1
+                        continue
+                self.seen_keys.add(key)
+                if self.embedded.get(key) == digest:
+                    self.counts["unchanged"] += 1
+                    continue
+            yield {"key": key, "hash": digest, "text": chunk_text, "metadata": metadata}
+
+    def settle_duplicates(self):
+        # A remembered duplicate whose kept copy is gone or has drifted apart is judged again, and
+        # embedded now if it turns out to be the copy to keep
+        drifted = sorted(key for key, (signature, kept, _, _) in self._sticky.items()
+                         if self.dedup.similarity(kept, signature) < self.dedup.threshold)
+        batch = []
+        for key in drifted:
+            signature, _, chunk_text, metadata = self._sticky[key]
+            del self.duplicates[key]
+            self.counts["duplicates"] -= 1
+            kept = self.dedup.add_signature(key, signature)
+            if kept is not None:
+                self.duplicates[key] = [text_hash(chunk_text), kept]
+                self.counts["duplicates"] += 1
+                continue
+            self.seen_keys.add(key)
+            batch.append({"key": key, "hash": text_hash(chunk_text), "text": chunk_text, "metadata": metadata})
+        for start in range(0, len(batch), self.args.batch_size):
+            for embedded_batch in self.embed(batch[start:start + self.args.batch_size]):
+                self.upsert(embedded_batch)
+        return len(batch)
+
+    def embed(self, batch):
+        vectors = self.embedding.embed_documents([chunk["text"] for chunk in batch])
+        for chunk, vector in zip(batch, vectors):
+            chunk["vector"] = vector
+        return [batch]
+
+    def upsert(self, batch):
+        if self.args.dry_run:
+            return
+        self.collection.upsert(
+            ids=[chunk["key"] for chunk in batch],
+            embeddings=[chunk["vector"] for chunk in batch],
+            documents=[chunk["text"] for chunk in batch],
+            metadatas=[chunk["metadata"] for chunk in batch]
+        )
+        with self._manifest_lock:
+            for chunk in batch:
+                self.embedded[chunk["key"]] = chunk["hash"]
+            self.manifest.save()
+
+    # === Run ===
+    def setup(self):
+        if not self.args.dry_run:
+            os.makedirs(self.extractor.clean_folder, exist_ok=True)
+        # The extraction processes are forked before any thread or model exists
+        self.pool = ProcessPoolExecutor(max_workers=self.workers["extract"])
+        self.pool.submit(os.getpid).result()
+
+        if self.args.source == "web":
+            self.crawler_module = load_script("1 full_gbc_scraper.py", "full_gbc_scraper")
+            self.crawler_module.init_logs()
+            base_url = self.args.base_url or os.getenv("GBC_BASE_URL", self.crawler_module.BASE_URL)
+            coned_base = self.args.coned_base or os.getenv("GBC_CONED_BASE", self.crawler_module.CONED_BASE)
+            self.crawler = self.crawler_module.Crawler(base_url, coned_base,
+                                                       workers=self.workers["scrape"], rate=self.args.rate,
+                                                       force=self.args.force)
+
+        self.embedding = create_embeddings(batch_size=self.args.encode_batch_size)
+        if not self.args.dry_run:
+            from langchain_chroma import Chroma
+
+            db = Chroma(persist_directory=self.embedder.persist_dir, embedding_function=self.embedding)
+            self.collection = db._collection
+            if not self.embedded and self.collection.count() > 0:
+                # Index predates the manifest (random vector ids): rebuild it once so ids are stable
+                print("♻️ No manifest for existing index, rebuilding from scratch...")
+                db.reset_collection()
+                self.collection = db._collection
+
+    def run(self):
+        self.setup()
+        fns = {"scrape": self.scrape, "extract": self.extract, "clean": self.clean,
+               "chunk": self.chunk, "embed": self.embed, "upsert": self.upsert}
+        stages = [Stage(name, fns[name], workers=self.workers[name], queue_size=self.args.queue_size,
+                        batch_size=self.args.batch_size if name == "embed" else 1) for name in STAGES]
+        for stage, next_stage in zip(stages, stages[1:]):
+            stage.next = next_stage
+
+        source_errors = []
+
+        def feed():
+            try:
+                for task in self.tasks():
+                    stages[0].inbox.put(task)
+            except Exception as e:
+                source_errors.append(e)
+                print(f"❌ Listing sources failed | {e}")
+            for _ in range(stages[0].workers):
+                stages[0].inbox.put(DONE)
+
+        threads = [threading.Thread(target=feed, name="source", daemon=True)]
+        for stage in stages:
+            threads += stage.start()
+
+        start = time.time()
+        for thread in threads:
+            thread.start()
+        try:
+            # The upsert worker is the last to see the end of the stream
+            while threads[-1].is_alive():
+                threads[-1].join(timeout=self.args.progress)
+                if threads[-1].is_alive():
+                    print_progress(stages, time.time() - start)
+        except KeyboardInterrupt:
+            print("\n⏸️ Interrupted. The manifest is saved after every upsert: rerun the same command to resume.")
+            return
+        finally:
+            self.pool.shutdown(cancel_futures=True)
+
+        self.finish(stages, time.time() - start, failed=bool(source_errors) or any(stage.failed for stage in stages))
+
+    def finish(self, stages, elapsed, failed):
+        print_summary(stages, elapsed)
+        settled = self.settle_duplicates() if self._sticky else 0
+        counts = self.counts
+        if counts["chars_in"]:
+            print(f"🧽 Boilerplate removed {counts['chars_in'] - counts['chars_out']} of {counts['chars_in']} characters "
+                  f"({(counts['chars_in'] - counts['chars_out']) / counts['chars_in']:.1%})")
+        print(f"🪞 {counts['chunks']} chunks: {counts['duplicates']} near-duplicates skipped, "
+              f"{counts['unchanged']} unchanged, {stages[-1].done + settled} new or changed")
+        if self.crawler is not None:
+            stats = self.crawler.stats
+            print(f"🌐 {stats['fetched']} fetched, {stats['unchanged']} unchanged, {stats['failed']} failed")
+            failed = failed or stats["failed"] > 0
+
+        stale_ids = [key for key in self.embedded if key not in self.seen_keys]
+        if self.args.dry_run:
+            print(f"🧪 Dry run: index and manifest untouched ({len(stale_ids)} chunks would be removed from the index)")
+            return
+
+        # Stale chunks are only deleted after a clean run, so a page that failed to download keeps its chunks
+        if stale_ids and failed:
+            print(f"⚠️ Some sources failed: keeping {len(stale_ids)} chunks that weren't seen this run")
+        elif stale_ids:
+            self.collection.delete(ids=stale_ids)
+            for key in stale_ids:
+                del self.embedded[key]
+            print(f"🗑️ Removed {len(stale_ids)} chunks that no longer exist")
+        self.manifest.data["duplicates"] = self.duplicates
+        self.manifest.save()
+        if self.crawler is not None:
+            self.crawler.save_cache()
+        # What was learned this run is what the next run strips
+        self.learner.report(self.learner.learn(), self.chunker.boilerplate_report)
+        self.embedder.refresh_derived_indexes(self.collection)
+        print(f"✅ LangChain-compatible Chroma index updated at: {self.embedder.persist_dir}")
+
+
+def print_progress(stages, elapsed):
+    parts = [f"{stage.name} {stage.done} ({stage.done / elapsed:.1f}/s, backlog {stage.inbox.qsize()})" for stage in stages]
+    print(f"⏱️ {elapsed:.0f}s | " + " | ".join(parts))
+
+
+def print_summary(stages, elapsed):
+    print(f"📊 Finished in {elapsed:.1f}s")
+    for stage in stages:
+        print(f"   {stage.name:<8} {stage.done:>7} {UNITS[stage.name]:<6} | {stage.failed} failed "
+              f"| {stage.done / elapsed:>8.1f}/s | busy {stage.busy:.1f}s over {stage.workers} workers")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Streaming ingestion: scrape → extract → clean → chunk → embed → upsert.")
+    parser.add_argument("--source", choices=["web", "local"], default="web",
+                        help="crawl the site, or read pdfs/ and pages/ already on disk")
+    parser.add_argument("--workers", help="per-stage worker counts, e.g. scrape=8,extract=4,embed=2")
+    parser.add_argument("--queue-size", type=int, default=64, help="items waiting in front of each stage")
+    parser.add_argument("--batch-size", type=int, default=64, help="chunks per embed/upsert batch")
+    parser.add_argument("--encode-batch-size", type=int, default=32, help="embedding model batch size")
+    parser.add_argument("--timeout", type=float, default=120, help="seconds per PDF")
+    parser.add_argument("--dedup-threshold", type=float, default=0.8,
+                        help="estimated Jaccard similarity above which a chunk is a near-duplicate (0 disables)")
+    parser.add_argument("--no-boilerplate", action="store_true", help="don't strip learned boilerplate lines")
+    parser.add_argument("--progress", type=float, default=5.0, help="seconds between progress lines")
+    parser.add_argument("--dry-run", action="store_true",
+                        help="run every stage, embedding included, without writing the index, manifest, clean_text/ "
+                             "or boilerplate report (with --source web the crawler still saves pages and PDFs to "
+                             "raw_html/, raw_programs/, raw_coned/, raw_data/ and appends to logs/*.csv)")
+    parser.add_argument("--base-url", help="default: GBC_BASE_URL or the live site")
+    parser.add_argument("--coned-base", help="default: GBC_CONED_BASE or the live site")
+    parser.add_argument("--rate", type=float, default=4.0, help="max requests per second per host")
+    parser.add_argument("--force", action="store_true", help="ignore ETag/Last-Modified and re-download everything")
+    args = parser.parse_args()
+
+    workers = parse_workers(args.workers)
+    print("🚚 Ingestion pipeline: " + " → ".join(f"{name}×{workers[name]}" for name in STAGES)
+          + (" (dry run)" if args.dry_run else ""))
+    IngestPipeline(args, workers).run()
+
+
+if __name__ == "__main__":
+    main()
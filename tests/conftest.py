@@ -0,0 +1,20 @@
+import os
+import sys
+import importlib.util
+
+base_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+sys.path.insert(0, base_dir)
+sys.path.insert(0, os.path.join(base_dir, "benchmarks"))  # stub LLM + stub LLM server
+scripts_dir = os.path.join(base_dir, "scripts")
+sys.path.insert(0, scripts_dir)  # ingestion helpers (chunk_store, dedup, ingest_manifest)
+
+# app.py opens its transcript store on import: keep the tests out of chat_logs/
+os.environ["HISTORY_BACKEND"] = "memory"
+
+
+def load_script(filename, name):
+    # The numbered scripts have spaces in their names, so they're loaded by path
+    spec = importlib.util.spec_from_file_location(name, os.path.join(scripts_dir, filename))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
@@ -0,0 +1,78 @@
+import time
+
+import pytest
+
+from agents.answer_cache import SemanticAnswerCache, create_answer_cache
+from agents.flat_index import build_flat_index
+from test_flat_index import make_collection
+
+
+def test_near_duplicate_question_hits():
+    cache = SemanticAnswerCache(threshold=0.95)
+    cache.store("How much is tuition?", [1.0, 0.0, 0.0], "About 5,000 per semester.", ["tuition.txt"])
+
+    hit = cache.lookup([0.99, 0.05, 0.0])
+    assert hit["answer"] == "About 5,000 per semester." and hit["sources"] == ["tuition.txt"]
+    assert hit["score"] >= 0.95
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+    assert cache.stats() == {"size": 1, "hits": 1, "misses": 1, "hit_rate": 0.5, "invalidations": 0}
+
+
+def test_closest_entry_wins():
+    cache = SemanticAnswerCache(threshold=0.5)
+    cache.store("a", [1.0, 0.0], "answer a", [])
+    cache.store("b", [0.8, 0.6], "answer b", [])
+    assert cache.lookup([0.7, 0.7])["answer"] == "answer b"
+
+
+def test_entries_expire():
+    cache = SemanticAnswerCache(ttl=0.05)
+    cache.store("q", [1.0, 0.0], "a", [])
+    time.sleep(0.06)
+    assert cache.lookup([1.0, 0.0]) is None
+    assert cache.stats()["size"] == 0
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = SemanticAnswerCache(max_entries=2)
+    cache.store("a", [1.0, 0.0, 0.0], "a", [])
+    cache.store("b", [0.0, 1.0, 0.0], "b", [])
+    assert cache.lookup([1.0, 0.0, 0.0])  # a is now more recent than b
+    cache.store("c", [0.0, 0.0, 1.0], "c", [])
+    assert cache.lookup([0.0, 1.0, 0.0]) is None
+    assert cache.lookup([1.0, 0.0, 0.0])["answer"] == "a"
+
+
+def test_rebuilt_flat_index_invalidates_the_cache(tmp_path):
+    flat_path = str(tmp_path / "flat_index")
+    build_flat_index(make_collection(), flat_path)
+    cache = SemanticAnswerCache(flat_index_path=flat_path)
+    cache.store("q", [1.0, 0.0], "a", [])
+    assert cache.lookup([1.0, 0.0])
+
+    build_flat_index(make_collection(seed=1), flat_path)
+    assert cache.lookup([1.0, 0.0]) is None
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_changed_chroma_file_invalidates_the_cache(tmp_path):
+    sqlite_path = tmp_path / "chroma.sqlite3"
+    sqlite_path.write_bytes(b"v1")
+    cache = SemanticAnswerCache(index_path=str(tmp_path))
+    cache.store("q", [1.0, 0.0], "a", [])
+    sqlite_path.write_bytes(b"v2 with more rows")
+    assert cache.lookup([1.0, 0.0]) is None
+
+
+@pytest.mark.parametrize("value", ["off", "0", "False", "no"])
+def test_cache_can_be_turned_off(monkeypatch, value):
+    monkeypatch.setenv("ANSWER_CACHE", value)
+    assert create_answer_cache() is None
+
+
+def test_cache_settings_come_from_the_environment(monkeypatch):
+    monkeypatch.setenv("ANSWER_CACHE", "on")
+    monkeypatch.setenv("ANSWER_CACHE_THRESHOLD", "0.9")
+    monkeypatch.setenv("ANSWER_CACHE_SIZE", "10")
+    cache = create_answer_cache("chroma_index")
+    assert (cache.threshold, cache.max_entries, cache.index_path) == (0.9, 10, "chroma_index")
@@ -0,0 +1,114 @@
+import json
+import argparse
+
+from langchain_core.documents import Document
+
+import main
+
+
+def write_lines(path, lines):
+    path.write_text("".join(line + "\n" for line in lines), encoding="utf-8")
+
+
+def read_records(path):
+    return [json.loads(line) for line in path.read_text(encoding="utf-8").splitlines() if line.strip()]
+
+
+class FakeAgent:
+    # prepare_batch / answer_prepared as used by run_batch; questions in `failing` raise `failures` times
+    def __init__(self, failing=(), failures=1):
+        self.failing = {question: failures for question in failing}
+        self.prepared = []
+
+    def prepare_batch(self, questions):
+        self.prepared.append(list(questions))
+        return [{"question": question} for question in questions]
+
+    def answer_prepared(self, inputs):
+        question = inputs["question"]
+        if self.failing.get(question, 0) > 0:
+            self.failing[question] -= 1
+            raise RuntimeError("429 Too Many Requests")
+        return {"answer": f"answer to {question}", "cached": False, "timings": {"total": 1.0},
+                "tokens": {"in": 10, "out": 5}, "sources": [Document(page_content="...", metadata={"source_file": "tuition.txt"})]}
+
+
+def batch_args(tmp_path, questions, **overrides):
+    args = {"batch": str(questions), "output": str(tmp_path / "answers.jsonl"), "batch_size": 2, "concurrency": 2,
+            "retries": 2, "backoff": 0.0, "restart": False}
+    args.update(overrides)
+    return argparse.Namespace(**args)
+
+
+# === Reading questions ===
+def test_jsonl_ids_default_to_the_row_number(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    write_lines(path, [json.dumps({"question": "Tuition?"}), json.dumps({"id": "x7", "question": "Fees?"}), "",
+                       json.dumps({"question": "  "})])
+    assert list(main.read_questions(str(path))) == [("1", "Tuition?"), ("x7", "Fees?")]
+
+
+def test_id_zero_is_kept(tmp_path):
+    path = tmp_path / "questions.jsonl"
+    write_lines(path, [json.dumps({"id": 0, "question": "Tuition?"}), json.dumps({"id": "", "question": "Fees?"}),
+                       json.dumps({"id": None, "question": "Dates?"})])
+    assert list(main.read_questions(str(path))) == [("0", "Tuition?"), ("2", "Fees?"), ("3", "Dates?")]
+
+
+def test_csv_questions(tmp_path):
+    path = tmp_path / "questions.csv"
+    write_lines(path, ["id,question", "0,Tuition?", ",Fees?"])
+    assert list(main.read_questions(str(path))) == [("0", "Tuition?"), ("2", "Fees?")]
+
+
+# === Running a batch ===
+def test_batch_answers_every_question(tmp_path):
+    questions = tmp_path / "questions.jsonl"
+    write_lines(questions, [json.dumps({"question": f"q{i}"}) for i in range(5)])
+    agent = FakeAgent()
+    main.run_batch(agent, batch_args(tmp_path, questions))
+
+    records = read_records(tmp_path / "answers.jsonl")
+    assert sorted(r["id"] for r in records) == ["1", "2", "3", "4", "5"]
+    assert all(r["answer"] == f"answer to {r['question']}" and r["sources"] == ["tuition.txt"] for r in records)
+    assert [len(batch) for batch in agent.prepared] == [2, 2, 1]
+
+
+def test_failed_calls_are_retried_then_recorded(tmp_path):
+    questions = tmp_path / "questions.jsonl"
+    write_lines(questions, [json.dumps({"question": "flaky"}), json.dumps({"question": "down"})])
+    agent = FakeAgent(failing=["flaky"], failures=1)
+    agent.failing["down"] = 10
+    main.run_batch(agent, batch_args(tmp_path, questions))
+
+    records = {r["question"]: r for r in read_records(tmp_path / "answers.jsonl")}
+    assert records["flaky"]["attempts"] == 2 and "answer" in records["flaky"]
+    assert records["down"]["attempts"] == 3
+    assert records["down"]["error"] == "RuntimeError: 429 Too Many Requests"
+
+
+def test_rerun_resumes_after_answered_questions(tmp_path):
+    questions = tmp_path / "questions.jsonl"
+    write_lines(questions, [json.dumps({"id": i, "question": f"q{i}"}) for i in range(4)])
+    output = tmp_path / "answers.jsonl"
+    # An earlier run answered 0, failed on 1 and was cut off while writing 2
+    output.write_text(json.dumps({"id": "0", "answer": "a"}) + "\n" + json.dumps({"id": "1", "error": "x"}) + "\n"
+                      + '{"id": "2", "ans', encoding="utf-8")
+    agent = FakeAgent()
+    main.run_batch(agent, batch_args(tmp_path, questions))
+
+    assert [q for batch in agent.prepared for q in batch] == ["q1", "q2", "q3"]
+    # The cut-off line is left alone and new records start on a line of their own
+    lines = output.read_text(encoding="utf-8").splitlines()
+    assert lines[2] == '{"id": "2", "ans'
+    assert sorted(json.loads(line)["id"] for line in lines[3:]) == ["1", "2", "3"]
+    assert main.load_done(str(output)) == {"0", "1", "2", "3"}
+
+
+def test_restart_overwrites_the_output(tmp_path):
+    questions = tmp_path / "questions.jsonl"
+    write_lines(questions, [json.dumps({"question": "q"})])
+    output = tmp_path / "answers.jsonl"
+    output.write_text(json.dumps({"id": "1", "answer": "old"}) + "\n", encoding="utf-8")
+    main.run_batch(FakeAgent(), batch_args(tmp_path, questions, restart=True))
+    assert [r["answer"] for r in read_records(output)] == ["answer to q"]
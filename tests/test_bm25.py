@@ -0,0 +1,98 @@
+import chromadb
+import pytest
+from langchain_core.documents import Document
+
+from agents.bm25 import BM25Index, load_or_build_bm25, reciprocal_rank_fusion, tokenize
+from agents.flat_index import build_flat_index, load_flat_index
+
+TEXTS = [
+    "Tuition for program T127 is 5,000 per semester.",
+    "International students apply through the admissions portal.",
+    "D2L Brightspace hosts your online course materials.",
+    "Tuition refunds are processed within 30 days.",
+]
+METADATAS = [
+    {"source_file": "tuition.txt", "chunk_id": 0},
+    {"source_file": "admissions.txt", "chunk_id": 0},
+    {"source_file": "d2l.txt", "chunk_id": 0},
+    {"source_file": "tuition.txt", "chunk_id": 1},
+]
+
+
+@pytest.fixture
+def bm25():
+    return BM25Index(TEXTS, METADATAS)
+
+
+def test_tokenize_keeps_codes_and_figures():
+    assert tokenize("What is the fee for T127? About 5,000 or 1.5k") == ["fee", "t127", "about", "5,000", "1.5", "k"]
+
+
+def test_exact_terms_rank_first(bm25):
+    docs = bm25.search("t127 tuition", k=2)
+    assert docs[0].page_content == TEXTS[0]
+    assert [d.page_content for d in bm25.search("brightspace")] == [TEXTS[2]]
+    assert bm25.search("nothing matches here") == []
+
+
+def test_mask_restricts_to_source_files(bm25):
+    docs = bm25.search("tuition", k=4, mask=bm25.mask_for(["tuition.txt"]))
+    assert {d.metadata["source_file"] for d in docs} == {"tuition.txt"}
+    assert bm25.search("admissions", mask=bm25.mask_for(["tuition.txt"])) == []
+
+
+def test_save_and_load_round_trip(bm25, tmp_path):
+    bm25.fingerprint = [4, 10]
+    path = str(tmp_path / "bm25.json")
+    bm25.save(path)
+    loaded = BM25Index.load(path)
+    assert loaded.fingerprint == [4, 10]
+    assert loaded.search("refunds") == bm25.search("refunds")
+
+
+def test_reciprocal_rank_fusion_rewards_agreement():
+    a, b, c = (Document(page_content=t, metadata=m) for t, m in zip(TEXTS[:3], METADATAS[:3]))
+    fused = reciprocal_rank_fusion([[a, b, c], [c, b]], k=3)
+    # a only tops one list; b and c are found by both
+    assert [d.page_content for d in fused] == [c.page_content, b.page_content, a.page_content]
+    # The same chunk from both retrievers is returned once
+    assert len(reciprocal_rank_fusion([[a], [Document(page_content=a.page_content, metadata=a.metadata)]])) == 1
+
+
+# === Persisted copy vs a changed index ===
+@pytest.fixture
+def chroma(tmp_path):
+    path = str(tmp_path / "chroma_index")
+    collection = chromadb.PersistentClient(path=path).get_or_create_collection("langchain")
+    collection.add(ids=[str(i) for i in range(len(TEXTS))], documents=TEXTS, metadatas=METADATAS,
+                   embeddings=[[float(i == j) for j in range(4)] for i in range(len(TEXTS))])
+    return collection, path
+
+
+def test_saved_bm25_is_reused_while_the_index_is_unchanged(chroma):
+    collection, path = chroma
+    first = load_or_build_bm25(collection, path)
+    assert load_or_build_bm25(collection, path).fingerprint == first.fingerprint
+
+
+def test_saved_bm25_is_rebuilt_after_an_in_place_update(chroma):
+    # Same number of chunks, different content: the count alone wouldn't notice
+    collection, path = chroma
+    load_or_build_bm25(collection, path)
+    collection.upsert(ids=["2"], documents=["Co-op placements start in the third semester."], embeddings=[[0, 0, 1, 0]])
+    assert collection.count() == len(TEXTS)
+    bm25 = load_or_build_bm25(collection, path)
+    assert [d.page_content for d in bm25.search("co-op placements")] == ["Co-op placements start in the third semester."]
+
+
+def test_flat_index_fingerprint_follows_content(chroma, tmp_path):
+    collection, _ = chroma
+    flat_path = str(tmp_path / "flat_index")
+    build_flat_index(collection, flat_path)
+    before = load_flat_index(flat_path).fingerprint
+    collection.upsert(ids=["2"], documents=["Co-op placements start in the third semester."], embeddings=[[0, 0, 1, 0]])
+    build_flat_index(collection, flat_path)
+    index = load_flat_index(flat_path)
+    assert index.fingerprint != before
+    bm25 = load_or_build_bm25(index, flat_path)
+    assert bm25.fingerprint == index.fingerprint
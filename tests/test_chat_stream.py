@@ -0,0 +1,126 @@
+import json
+
+import pytest
+from langchain_core.documents import Document
+from starlette.testclient import TestClient
+
+import app as flask_app
+import asgi
+from stub_llm import StubChatModel
+
+REPLY = "Tuition depends on your program."
+
+
+class FakeAgent:
+    # Same event contract as ConversationalAgent.stream/astream (tokens, then one "done" with the result),
+    # driven by the stub LLM and without retrieval
+    def __init__(self, fail_after=None):
+        self.llm = StubChatModel(reply=REPLY, latency=0.0)
+        self.fail_after = fail_after
+        self.answer_cache = None
+
+    def _result(self, parts):
+        return {
+            "type": "done",
+            "answer": "".join(parts),
+            "sources": [Document(page_content="Tuition...", metadata={"source_file": "tuition.txt"})],
+            "chat_history": [],
+            "timings": {"llm_ttft": 1.0, "total": 2.0}
+        }
+
+    def _check(self, parts):
+        if self.fail_after is not None and len(parts) == self.fail_after:
+            raise RuntimeError("LLM went away")
+
+    def stream(self, question, session_id="default"):
+        parts = []
+        for chunk in self.llm.stream(question):
+            self._check(parts)
+            parts.append(chunk.content)
+            yield {"type": "token", "content": chunk.content}
+        yield self._result(parts)
+
+    async def astream(self, question, session_id="default"):
+        parts = []
+        async for chunk in self.llm.astream(question):
+            self._check(parts)
+            parts.append(chunk.content)
+            yield {"type": "token", "content": chunk.content}
+        yield self._result(parts)
+
+
+def parse_sse(body):
+    events = []
+    for block in body.strip().split("\n\n"):
+        fields = dict(line.split(": ", 1) for line in block.splitlines())
+        events.append((fields["event"], json.loads(fields["data"])))
+    return events
+
+
+@pytest.fixture
+def flask_client(monkeypatch):
+    agent = FakeAgent()
+    monkeypatch.setattr(flask_app, "get_agent", lambda: agent)
+    return flask_app.app.test_client(), agent
+
+
+@pytest.fixture
+def asgi_client(monkeypatch):
+    agent = FakeAgent()
+    monkeypatch.setattr(asgi, "get_agent", lambda: agent)
+    return TestClient(asgi.app), agent  # no lifespan: warm_up() would build the real agent
+
+
+def check_events(events):
+    names = [name for name, _ in events]
+    assert names == ["token"] * (len(events) - 1) + ["done"]
+    tokens = "".join(data["content"] for name, data in events if name == "token")
+    done = events[-1][1]
+    assert tokens == done["answer"] == REPLY
+    assert done["sources"] == ["tuition.txt"]
+    assert done["timing"]["stages_ms"] == {"llm_ttft": 1.0, "total": 2.0}
+
+
+def test_flask_stream_sends_tokens_then_done(flask_client):
+    client, _ = flask_client
+    response = client.post("/chat/stream", data={"question": "How much is tuition?"})
+    assert response.status_code == 200
+    assert response.mimetype == "text/event-stream"
+    assert response.headers["Cache-Control"] == "no-cache"
+    check_events(parse_sse(response.get_data(as_text=True)))
+
+    # The finished answer is saved to the transcript
+    entries = client.get("/chat/history").get_json()["entries"]
+    assert [(e["question"], e["answer"]) for e in entries] == [("How much is tuition?", REPLY)]
+
+
+def test_flask_stream_error_event(flask_client):
+    client, agent = flask_client
+    agent.fail_after = 2
+    events = parse_sse(client.post("/chat/stream", data={"question": "How much is tuition?"}).get_data(as_text=True))
+    assert [name for name, _ in events] == ["token", "token", "error"]
+    # The client gets a generic message, never the exception text
+    assert events[-1][1]["answer"] == flask_app.STREAM_ERROR
+    assert "LLM went away" not in events[-1][1]["answer"]
+    assert client.get("/chat/history").get_json()["entries"] == []
+
+
+def test_flask_stream_rejects_empty_question(flask_client):
+    client, _ = flask_client
+    assert client.post("/chat/stream", data={"question": "  "}).status_code == 400
+
+
+def test_asgi_stream_sends_tokens_then_done(asgi_client):
+    client, _ = asgi_client
+    response = client.post("/chat/stream", data={"question": "How much is tuition?"})
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    check_events(parse_sse(response.text))
+
+
+def test_asgi_stream_error_event(asgi_client):
+    client, agent = asgi_client
+    agent.fail_after = 1
+    events = parse_sse(client.post("/chat/stream", data={"question": "How much is tuition?"}).text)
+    assert [name for name, _ in events] == ["token", "error"]
+    assert events[-1][1]["answer"] == flask_app.STREAM_ERROR
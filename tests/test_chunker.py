@@ -0,0 +1,113 @@
+import re
+
+import pytest
+
+from chunk_store import ChunkStoreWriter, iter_chunks
+from conftest import load_script
+
+chunk_texts = load_script("4 chunk_texts.py", "chunk_texts")
+
+
+class FakeTokenizer:
+    # Word-piece-like: each word is split into pieces of at most 3 characters, with offsets and word ids
+    # in the shape a fast Hugging Face tokenizer returns them
+    class Encoding(dict):
+        def __init__(self, offsets, word_ids):
+            super().__init__(offset_mapping=offsets)
+            self._word_ids = word_ids
+
+        def word_ids(self):
+            return self._word_ids
+
+    def __call__(self, text, add_special_tokens=False, return_offsets_mapping=True, verbose=False):
+        offsets, word_ids = [], []
+        for word, match in enumerate(re.finditer(r"\S+", text)):
+            for start in range(match.start(), match.end(), 3):
+                offsets.append((start, min(start + 3, match.end())))
+                word_ids.append(word)
+        return self.Encoding(offsets, word_ids)
+
+
+# === Token windows ===
+@pytest.mark.parametrize("max_tokens,overlap", [(8, 2), (5, 0), (20, 7)])
+def test_windows_cover_everything_without_splitting_words(max_tokens, overlap):
+    word_ids = [w for w, pieces in enumerate([1, 3, 2, 1, 4, 2, 1, 1, 3, 2, 2, 1, 3]) for _ in range(pieces)]
+    windows = list(chunk_texts.token_windows(word_ids, max_tokens, overlap))
+
+    assert windows[0][0] == 0 and windows[-1][1] == len(word_ids)
+    for (start, end), (next_start, _) in zip(windows, windows[1:]):
+        assert next_start <= end and next_start > start  # contiguous or overlapping, always moving forward
+    for start, end in windows:
+        assert end - start <= max_tokens
+        assert start == 0 or word_ids[start] != word_ids[start - 1]
+        assert end == len(word_ids) or word_ids[end] != word_ids[end - 1]
+
+
+def test_word_longer_than_a_window_still_progresses():
+    word_ids = [0] * 10 + [1]
+    windows = list(chunk_texts.token_windows(word_ids, 4, 1))
+    assert windows[-1][1] == len(word_ids)
+    assert all(end > start for start, end in windows)
+
+
+# === Chunking a source ===
+def test_chunks_are_exact_slices_of_the_text():
+    text = " ".join(f"word{i}" for i in range(60))
+    chunks = chunk_texts.chunk_source(FakeTokenizer(), text, max_tokens=20, overlap=4, min_tokens=3)
+
+    assert len(chunks) > 1
+    for chunk, token_count in chunks:
+        assert chunk in text
+        assert token_count <= 20
+        # Re-tokenizing a chunk gives the same number of tokens
+        assert len(FakeTokenizer()(chunk)["offset_mapping"]) == token_count
+    assert chunks[0][0].startswith("word0 ") and chunks[-1][0].endswith("word59")
+
+
+def test_short_source_is_kept_and_short_tail_dropped():
+    assert chunk_texts.chunk_source(FakeTokenizer(), "Fees", 20, 4, min_tokens=10) == [("Fees", 2)]
+    text = " ".join(["abc"] * 21)
+    chunks = chunk_texts.chunk_source(FakeTokenizer(), text, max_tokens=20, overlap=0, min_tokens=5)
+    assert [count for _, count in chunks] == [20]
+
+
+def test_clean_text_drops_page_numbers_and_blank_lines():
+    assert chunk_texts.clean_text("Tuition\x0cPage 3 of 15\n\n  \nFees") == "Tuition \nFees"
+
+
+# === Chunk store ===
+RECORDS = [
+    {"key": "raw_html/tuition.txt_chunk_0", "chunk_id": 0, "source": "raw_html/tuition.txt",
+     "source_file": "tuition.txt", "category": "Tuition", "token_count": 12, "hash": "h0", "text": "Fees…"},
+    {"key": "raw_html/tuition.txt_chunk_1", "chunk_id": 1, "source": "raw_html/tuition.txt",
+     "source_file": "tuition.txt", "category": "Tuition", "token_count": 9, "hash": "h1", "text": "Refunds"},
+]
+
+
+@pytest.mark.parametrize("suffix", [".jsonl", ".parquet"])
+def test_store_round_trip(tmp_path, suffix):
+    if suffix == ".parquet":
+        pytest.importorskip("pyarrow")
+    path = str(tmp_path / f"chunks{suffix}")
+    with ChunkStoreWriter(path) as writer:
+        for record in RECORDS:
+            writer.write(record)
+    assert writer.count == 2
+    assert list(iter_chunks(path)) == RECORDS
+    assert list(iter_chunks(path, columns=["key", "hash"])) == [{"key": r["key"], "hash": r["hash"]} for r in RECORDS]
+
+
+def test_failed_write_keeps_the_previous_store(tmp_path):
+    path = str(tmp_path / "chunks.jsonl")
+    with ChunkStoreWriter(path) as writer:
+        writer.write(RECORDS[0])
+    with pytest.raises(RuntimeError):
+        with ChunkStoreWriter(path) as writer:
+            writer.write(RECORDS[1])
+            raise RuntimeError("interrupted")
+    assert list(iter_chunks(path)) == RECORDS[:1]
+    assert not (tmp_path / "chunks.jsonl.tmp").exists()
+
+
+def test_missing_store_reads_as_empty(tmp_path):
+    assert list(iter_chunks(str(tmp_path / "none.jsonl"))) == []
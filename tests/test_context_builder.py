@@ -0,0 +1,67 @@
+from langchain_core.documents import Document
+from langchain_core.prompts import PromptTemplate
+
+from agents.context_builder import ContextBuilder, estimate_tokens
+
+DOC_PROMPT = PromptTemplate.from_template("📜 {source_file} (Chunk {chunk_id})\n{page_content}")
+TEXT = ("Tuition for domestic students is about 5,000 per semester. International students pay more, "
+        "depending on the program. Fees are due before the first day of classes. Refunds are processed "
+        "within thirty days of a withdrawal request.")
+
+
+def doc(text, source_file="tuition.txt", chunk_id=0):
+    return Document(page_content=text, metadata={"source_file": source_file, "chunk_id": chunk_id})
+
+
+def builder(**kwargs):
+    return ContextBuilder(DOC_PROMPT, **kwargs)
+
+
+def test_adjacent_chunks_are_stitched_over_their_overlap():
+    # Two chunks cut from one text, overlapping by a sentence
+    first, second = TEXT[:120], TEXT[85:]
+    context, stats = builder().build([doc(second, chunk_id=4), doc(first, chunk_id=3)])
+    assert context == f"📜 tuition.txt (Chunk 3-4)\n{TEXT}"
+    assert stats["merged"] == 1
+    assert stats["tokens_saved"] > 0
+
+
+def test_non_adjacent_chunks_stay_apart_in_rank_order():
+    docs = [doc("Refunds take thirty days.", chunk_id=9), doc("Fees are due in August.", chunk_id=2),
+            doc("Apply through the portal.", source_file="admissions.txt", chunk_id=3)]
+    context, stats = builder().build(docs)
+    assert context.split("\n\n") == [
+        "📜 tuition.txt (Chunk 9)\nRefunds take thirty days.",
+        "📜 tuition.txt (Chunk 2)\nFees are due in August.",
+        "📜 admissions.txt (Chunk 3)\nApply through the portal.",
+    ]
+    assert stats["merged"] == 0
+
+
+def test_near_duplicates_are_dropped():
+    copy = doc(TEXT + " Contact the office.", source_file="fees_copy.txt", chunk_id=0)
+    context, stats = builder().build([doc(TEXT), copy])
+    assert stats["duplicates"] == 1
+    assert "fees_copy.txt" not in context
+
+
+def test_context_is_packed_to_the_token_budget():
+    docs = [doc(f"Chunk {i}: " + "tuition fees " * 40, source_file=f"f{i}.txt") for i in range(5)]
+    context, stats = builder(token_budget=300, dedup_threshold=1.01).build(docs)
+    assert stats["tokens_out"] <= 300
+    assert stats["over_budget"] > 0
+    assert context.startswith("📜 f0.txt")
+
+
+def test_best_chunk_alone_over_budget_is_truncated_not_dropped():
+    context, stats = builder(token_budget=20).build([doc(TEXT * 3)])
+    assert context.startswith("📜 tuition.txt (Chunk 0)")
+    assert len(context) == 20 * 4
+    assert stats["tokens_out"] == estimate_tokens(context)
+
+
+def test_missing_chunk_ids_are_kept_as_they_are():
+    docs = [doc("Fees.", chunk_id=None), doc("Refunds.", chunk_id="n/a")]
+    context, stats = builder().build(docs)
+    assert context.count("📜 tuition.txt") == 2
+    assert stats["merged"] == 0
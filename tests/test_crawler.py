@@ -0,0 +1,132 @@
+import os
+import hashlib
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+from conftest import load_script
+
+scraper = load_script("1 full_gbc_scraper.py", "full_gbc_scraper")
+
+PAGE = "<h1>Tuition</h1><p>Fees depend on your program.</p><a href='/docs/fees.pdf'>Fees</a>"
+PDF = b"%PDF-1.4 fee schedule"
+
+
+class FixtureSite:
+    # Local stand-in for the college site: serves `pages` with an ETag and answers a matching
+    # If-None-Match with 304. Every request is recorded as (path, status).
+    def __init__(self):
+        self.pages = {"/tuition": (PAGE.encode(), "text/html"), "/docs/fees.pdf": (PDF, "application/pdf")}
+        self.requests = []
+        site = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def do_GET(self):
+                if self.path not in site.pages:
+                    site.requests.append((self.path, 404))
+                    self.send_error(404)
+                    return
+                body, content_type = site.pages[self.path]
+                etag = '"' + hashlib.sha1(body).hexdigest()[:16] + '"'
+                if self.headers.get("If-None-Match") == etag:
+                    site.requests.append((self.path, 304))
+                    self.send_response(304)
+                    self.send_header("ETag", etag)
+                    self.end_headers()
+                    return
+                site.requests.append((self.path, 200))
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.send_header("ETag", etag)
+                self.end_headers()
+                self.wfile.write(body)
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def statuses(self, path):
+        return [status for requested, status in self.requests if requested == path]
+
+
+@pytest.fixture
+def site(tmp_path, monkeypatch):
+    # The crawler writes raw_*/ and logs/ relative to the working directory
+    monkeypatch.chdir(tmp_path)
+    scraper.init_logs()
+    site = FixtureSite()
+    yield site
+    site.server.shutdown()
+
+
+def crawl(site, **kwargs):
+    crawler = scraper.Crawler(site.url, site.url, workers=2, rate=0, **kwargs)
+    pdf_links = crawler.scrape_static_page(site.url + "/tuition")
+    for pdf_url, category in pdf_links:
+        crawler.download_pdf(pdf_url, category)
+    crawler.save_cache()
+    return crawler, pdf_links
+
+
+def test_first_crawl_downloads_everything(site):
+    crawler, pdf_links = crawl(site)
+    assert pdf_links == [(site.url + "/docs/fees.pdf", "Tuition")]
+    assert crawler.stats == {"fetched": 2, "unchanged": 0, "failed": 0}
+    with open("raw_html/tuition.txt", encoding="utf-8") as f:
+        assert "Fees depend on your program." in f.read()
+    with open("raw_data/fees.pdf", "rb") as f:
+        assert f.read() == PDF
+
+
+def test_unchanged_page_and_pdf_get_304_and_are_skipped(site):
+    crawl(site)
+    html_mtime = os.stat("raw_html/tuition.txt").st_mtime_ns
+    pdf_mtime = os.stat("raw_data/fees.pdf").st_mtime_ns
+
+    crawler, pdf_links = crawl(site)
+    assert crawler.stats == {"fetched": 0, "unchanged": 2, "failed": 0}
+    assert site.statuses("/tuition") == [200, 304]
+    assert site.statuses("/docs/fees.pdf") == [200, 304]
+    # PDF links of an unchanged page come from the cache, and nothing is rewritten
+    assert pdf_links == [(site.url + "/docs/fees.pdf", "Tuition")]
+    assert os.stat("raw_html/tuition.txt").st_mtime_ns == html_mtime
+    assert os.stat("raw_data/fees.pdf").st_mtime_ns == pdf_mtime
+
+
+def test_changed_page_is_downloaded_again(site):
+    crawl(site)
+    site.pages["/tuition"] = (PAGE.replace("Fees depend", "Fees now depend").encode(), "text/html")
+
+    crawler, _ = crawl(site)
+    assert site.statuses("/tuition") == [200, 200]
+    assert crawler.stats == {"fetched": 1, "unchanged": 1, "failed": 0}
+    with open("raw_html/tuition.txt", encoding="utf-8") as f:
+        assert "Fees now depend" in f.read()
+
+
+def test_missing_output_is_fetched_unconditionally(site):
+    crawl(site)
+    os.remove("raw_html/tuition.txt")
+
+    crawl(site)
+    assert site.statuses("/tuition") == [200, 200]
+    assert os.path.exists("raw_html/tuition.txt")
+
+
+def test_force_ignores_validators(site):
+    crawl(site)
+    crawler, _ = crawl(site, force=True)
+    assert crawler.stats == {"fetched": 2, "unchanged": 0, "failed": 0}
+    assert site.statuses("/tuition") == [200, 200]
+
+
+def test_failed_page_is_counted(site):
+    crawler = scraper.Crawler(site.url, site.url, workers=2, rate=0)
+    assert crawler.scrape_static_page(site.url + "/missing") == []
+    assert crawler.stats["failed"] == 1
@@ -0,0 +1,88 @@
+import pytest
+
+from chunk_store import ChunkStoreWriter
+from dedup import (BoilerplateLearner, NearDuplicateFilter, boilerplate_fingerprint, dedup_store, load_boilerplate,
+                   load_duplicates, save_duplicates, strip_boilerplate)
+
+NAV = "Home | Programs | Admissions | Contact"
+FOOTER = "© George Brown College. All rights reserved."
+FEES = ("Tuition for domestic students in the two year business diploma is about five thousand dollars "
+        "per semester, and international students pay a higher rate that depends on the program.")
+
+
+def page(body):
+    return f"{NAV}\n{body}\n{FOOTER}"
+
+
+# === Boilerplate lines ===
+@pytest.fixture
+def learner():
+    learner = BoilerplateLearner(min_docs=3, min_fraction=0.5)
+    for i in range(4):
+        learner.add(page(f"Body of page {i}."), category="Tuition")
+    learner.add(f"{NAV}\nA D2L page.", category="D2L")
+    return learner
+
+
+def test_lines_repeated_across_a_category_are_learned(learner):
+    boilerplate = learner.learn()
+    text = page("Fees are due in August.")
+    assert strip_boilerplate(text, boilerplate["Tuition"]) == "Fees are due in August."
+    # One D2L page isn't enough to call anything boilerplate there
+    assert boilerplate["D2L"] == set()
+
+
+def test_matching_ignores_case_and_spacing(learner):
+    boilerplate = learner.learn()["Tuition"]
+    assert strip_boilerplate("home |  programs | ADMISSIONS | contact\nKept.", boilerplate) == "Kept."
+
+
+def test_report_round_trips_for_the_pipeline(learner, tmp_path):
+    boilerplate = learner.learn()
+    path = str(tmp_path / "boilerplate_lines.tsv")
+    learner.report(boilerplate, path)
+    assert load_boilerplate(path) == {category: lines for category, lines in boilerplate.items() if lines}
+    assert open(path, encoding="utf-8").readline().startswith("4\tTuition\t")
+
+
+def test_fingerprint_follows_the_learned_set(learner):
+    boilerplate = learner.learn()
+    assert boilerplate_fingerprint(boilerplate) == boilerplate_fingerprint(learner.learn())
+    assert boilerplate_fingerprint(boilerplate) != boilerplate_fingerprint({"Tuition": set()})
+
+
+# === Near-duplicate chunks ===
+def test_near_duplicate_is_matched_to_the_first_copy():
+    dedup = NearDuplicateFilter(threshold=0.8)
+    assert dedup.add("a", FEES) is None
+    assert dedup.add("b", FEES.replace("about", "roughly") + " ") == "a"
+    assert dedup.add("c", "Refunds are processed within thirty days of a withdrawal request at the registrar.") is None
+
+
+def test_similarity_estimates_jaccard():
+    dedup = NearDuplicateFilter()
+    dedup.add("a", FEES)
+    assert dedup.similarity("a", dedup.signature(FEES)) == 1.0
+    assert dedup.similarity("a", dedup.signature("Completely different text about D2L login steps.")) < 0.2
+    assert dedup.similarity("missing", dedup.signature(FEES)) == 0.0
+
+
+def test_dedup_store_keeps_the_first_copy_in_source_order(tmp_path):
+    store = str(tmp_path / "chunks.jsonl")
+    records = [
+        ("raw_pdf/z_copy.txt", 0, FEES), ("raw_html/tuition.txt", 0, FEES),
+        ("raw_html/tuition.txt", 1, "Refunds are processed within thirty days of a withdrawal request."),
+    ]
+    with ChunkStoreWriter(store) as writer:
+        for source, chunk_id, text in records:
+            writer.write({"key": f"{source}_chunk_{chunk_id}", "source": source, "chunk_id": chunk_id,
+                          "token_count": len(text.split()), "text": text})
+
+    duplicates, stats = dedup_store(store)
+    assert duplicates == {"raw_pdf/z_copy.txt_chunk_0": "raw_html/tuition.txt_chunk_0"}
+    assert stats["chunks"] == 3 and stats["duplicates"] == 1
+    assert stats["duplicate_tokens"] == len(FEES.split())
+
+    save_duplicates(store, duplicates)
+    assert load_duplicates(store) == duplicates
+    assert load_duplicates(str(tmp_path / "other.jsonl")) == {}
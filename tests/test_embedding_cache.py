@@ -0,0 +1,87 @@
+import threading
+
+import pytest
+
+from agents.embedding_cache import CachedEmbeddings, MicroBatchEmbedder, create_query_embeddings
+
+
+class CountingEmbeddings:
+    # Deterministic vectors; records every embed_documents call
+    def __init__(self):
+        self.calls = []
+        self.lock = threading.Lock()
+
+    def embed_documents(self, texts):
+        with self.lock:
+            self.calls.append(list(texts))
+        if any(text == "boom" for text in texts):
+            raise RuntimeError("model crashed")
+        return [[float(len(text)), float(sum(map(ord, text)) % 97)] for text in texts]
+
+    def embed_query(self, text):
+        return self.embed_documents([text])[0]
+
+
+# === LRU cache ===
+def test_repeated_query_is_served_from_the_cache():
+    base = CountingEmbeddings()
+    cache = CachedEmbeddings(base)
+    first = cache.embed_query("How much is tuition?")
+    # Case and whitespace don't change the key
+    assert cache.embed_query("  how much IS   tuition? ") == first
+    assert len(base.calls) == 1
+    assert cache.stats() == {"size": 1, "hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_cache_is_bounded():
+    cache = CachedEmbeddings(CountingEmbeddings(), max_size=2)
+    for text in ["a", "b", "a", "c"]:
+        cache.embed_query(text)
+    assert list(cache._cache) == ["a", "c"]
+
+
+def test_callers_cannot_modify_cached_vectors():
+    cache = CachedEmbeddings(CountingEmbeddings())
+    cache.embed_query("tuition").append(99.0)
+    assert len(cache.embed_query("tuition")) == 2
+
+
+# === Micro-batching ===
+def test_concurrent_queries_share_one_batch():
+    base = CountingEmbeddings()
+    embedder = MicroBatchEmbedder(base, max_batch_size=8, max_wait_ms=200)
+    results = {}
+
+    def ask(text):
+        results[text] = embedder.embed_query(text)
+
+    # All seven arrive well inside the 200 ms window; the repeated question is encoded once
+    threads = [threading.Thread(target=ask, args=(f"question {i}",)) for i in range(6)]
+    threads.append(threading.Thread(target=ask, args=("question 0",)))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(5)
+
+    assert len(base.calls) == 1
+    assert sorted(base.calls[0]) == [f"question {i}" for i in range(6)]
+    assert embedder.items == 7
+    assert results == {f"question {i}": base.embed_query(f"question {i}") for i in range(6)}
+
+
+def test_batch_error_reaches_every_caller():
+    embedder = MicroBatchEmbedder(CountingEmbeddings(), max_wait_ms=1)
+    with pytest.raises(RuntimeError, match="model crashed"):
+        embedder.embed_query("boom")
+    # The worker survives and keeps serving
+    assert embedder.embed_query("fine") == [4.0, float(sum(map(ord, "fine")) % 97)]
+
+
+def test_create_query_embeddings_layers(monkeypatch):
+    base = CountingEmbeddings()
+    embeddings = create_query_embeddings(base)
+    assert isinstance(embeddings, CachedEmbeddings) and isinstance(embeddings.base, MicroBatchEmbedder)
+
+    monkeypatch.setenv("EMBED_BATCHING", "off")
+    monkeypatch.setenv("EMBED_CACHE_SIZE", "0")
+    assert create_query_embeddings(base) is base
@@ -0,0 +1,136 @@
+import numpy as np
+import pytest
+
+from agents.conversational_agent import ConversationalAgent
+from agents.flat_index import build_flat_index, load_flat_index
+from stub_llm import StubChatModel
+
+DIM = 8
+
+
+class FakeCollection:
+    # The slice of a Chroma collection build_flat_index and the BM25 builder read
+    def __init__(self, texts, metadatas, embeddings):
+        self.texts = texts
+        self.metadatas = metadatas
+        self.embeddings = embeddings
+
+    def count(self):
+        return len(self.texts)
+
+    def get(self, include=None, limit=None, offset=0, **kwargs):
+        end = len(self.texts) if limit is None else offset + limit
+        return {
+            "ids": [str(i) for i in range(offset, min(end, len(self.texts)))],
+            "documents": self.texts[offset:end],
+            "metadatas": self.metadatas[offset:end],
+            "embeddings": self.embeddings[offset:end]
+        }
+
+
+def make_collection(n=50, seed=0, word="tuition"):
+    rng = np.random.default_rng(seed)
+    sources = ["tuition.txt", "admissions.txt", "d2l.txt"]
+    texts = [f"{word} chunk {i}" for i in range(n)]
+    metadatas = [{"source_file": sources[i % 3], "chunk_id": i, "category": "fees"} for i in range(n)]
+    return FakeCollection(texts, metadatas, rng.normal(size=(n, DIM)).astype(np.float32))
+
+
+def brute_force(collection, query, k, rows=None):
+    vectors = collection.embeddings / np.linalg.norm(collection.embeddings, axis=1, keepdims=True)
+    rows = np.arange(len(vectors)) if rows is None else np.asarray(rows)
+    scores = vectors[rows] @ (query / np.linalg.norm(query))
+    return list(rows[np.argsort(-scores)[:k]])
+
+
+@pytest.fixture
+def collection():
+    return make_collection()
+
+
+@pytest.fixture
+def index(collection, tmp_path):
+    path = str(tmp_path / "flat_index")
+    build_flat_index(collection, path, page_size=16)
+    return load_flat_index(path)
+
+
+def test_texts_and_metadata_round_trip(collection, index):
+    assert len(index) == collection.count()
+    assert index.text(7) == "tuition chunk 7"
+    assert index.metadata(7) == {"source_file": "admissions.txt", "chunk_id": 7, "category": "fees"}
+    assert index.get(limit=2, offset=3)["documents"] == ["tuition chunk 3", "tuition chunk 4"]
+
+
+def test_search_is_exact(collection, index):
+    query = np.random.default_rng(1).normal(size=DIM)
+    ids, scores = index.search_ids(query, k=5)
+    assert list(ids) == brute_force(collection, query, 5)
+    assert list(scores) == sorted(scores, reverse=True)
+
+
+def test_filter_matches_masked_brute_force(collection, index):
+    query = np.random.default_rng(2).normal(size=DIM)
+    docs = index.similarity_search_by_vector(query, k=4, filter={"source_file": {"$in": ["d2l.txt"]}})
+    rows = [i for i, m in enumerate(collection.metadatas) if m["source_file"] == "d2l.txt"]
+    assert [d.metadata["chunk_id"] for d in docs] == brute_force(collection, query, 4, rows)
+    assert index.mask_where({"source_file": "unknown.txt"}).sum() == 0
+
+
+def test_batch_search_matches_single_queries(index):
+    queries = np.random.default_rng(3).normal(size=(4, DIM))
+    mask = index.mask_for(["tuition.txt"])
+    batch = index.search_batch(queries, k=3, mask=mask)
+    assert batch == [index.search(q, k=3, mask=mask) for q in queries]
+
+
+def test_float16_gives_the_same_top_results(collection, tmp_path):
+    path = str(tmp_path / "flat16")
+    build_flat_index(collection, path, dtype="float16")
+    index = load_flat_index(path)
+    assert index.vectors.dtype == np.float16
+    query = np.random.default_rng(4).normal(size=DIM)
+    assert list(index.search_ids(query, k=3)[0]) == brute_force(collection, query, 3)
+
+
+def test_rebuild_makes_a_loaded_index_stale(collection, index):
+    assert not index.is_stale()
+    build_flat_index(make_collection(n=30, seed=5), index.path)
+    assert index.is_stale()
+    # The old arrays stay readable until the index is dropped
+    assert index.text(40) == "tuition chunk 40"
+    assert len(load_flat_index(index.path)) == 30
+
+
+def test_missing_index_raises(tmp_path):
+    with pytest.raises(FileNotFoundError, match="build_flat_index"):
+        load_flat_index(str(tmp_path / "nowhere"))
+
+
+# === A running agent picks up a rebuilt index ===
+class FakeEmbeddings:
+    def embed_query(self, text):
+        return [1.0] * DIM
+
+    def embed_documents(self, texts):
+        return [self.embed_query(text) for text in texts]
+
+
+def test_agent_reloads_rebuilt_index_and_bm25(index, monkeypatch):
+    from agents.bm25 import load_or_build_bm25
+
+    monkeypatch.setenv("ANSWER_CACHE", "off")
+    monkeypatch.setenv("QUERY_ROUTING", "off")
+    monkeypatch.setenv("FLAT_INDEX_RELOAD_INTERVAL", "0.01")
+    shared = {"embeddings": FakeEmbeddings(), "reranker": None, "flat_index": index,
+              "bm25": load_or_build_bm25(index, index.path)}
+    agent = ConversationalAgent(persist_path=index.path, llm=StubChatModel(latency=0.0), shared=shared)
+    query = np.ones(DIM)
+    assert all(d.page_content.startswith("tuition") for d in agent._retrieve_docs("tuition", query))
+
+    build_flat_index(make_collection(n=30, seed=6, word="admissions"), index.path)
+    agent._flat_checked -= 1  # as if the reload interval had passed
+    docs = agent._retrieve_docs("admissions", query)
+    assert docs and all(d.page_content.startswith("admissions") for d in docs)
+    assert agent.vectorstore is not index and len(agent.vectorstore) == 30
+    assert agent.bm25.texts[0] == "admissions chunk 0"
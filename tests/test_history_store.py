@@ -0,0 +1,80 @@
+import pytest
+
+import app as flask_app
+from agents.history_store import InMemoryHistoryStore, SQLiteHistoryStore, create_history_store
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(max_entries=500):
+        if request.param == "sqlite":
+            return SQLiteHistoryStore(db_path=str(tmp_path / "history.sqlite3"), max_entries=max_entries)
+        return InMemoryHistoryStore(max_entries=max_entries)
+    return make
+
+
+def entry(i):
+    return {"question": f"q{i}", "answer": f"a{i}", "sources": ["tuition.txt"], "timing": {"total": 1.0}}
+
+
+def questions(entries):
+    return [e["question"] for e in entries]
+
+
+def test_pages_walk_back_from_the_newest(make_store):
+    store = make_store()
+    for i in range(5):
+        store.append("s", entry(i))
+
+    page, before = store.page("s", limit=2)
+    assert questions(page) == ["q3", "q4"]
+    page, before = store.page("s", before=before, limit=2)
+    assert questions(page) == ["q1", "q2"]
+    page, before = store.page("s", before=before, limit=2)
+    assert questions(page) == ["q0"] and before is None
+    assert page[0]["sources"] == ["tuition.txt"] and page[0]["timing"] == {"total": 1.0}
+
+
+def test_sessions_are_kept_apart_and_cleared(make_store):
+    store = make_store()
+    store.append("alice", entry(0))
+    store.append("bob", entry(1))
+    store.clear("alice")
+    assert store.page("alice") == ([], None)
+    assert questions(store.page("bob")[0]) == ["q1"]
+
+
+def test_transcript_is_capped(make_store):
+    store = make_store(max_entries=3)
+    ids = [store.append("s", entry(i)) for i in range(5)]
+    assert ids == sorted(ids)
+    assert questions(store.page("s")[0]) == ["q2", "q3", "q4"]
+
+
+def test_sqlite_transcript_is_shared_between_stores(tmp_path):
+    path = str(tmp_path / "history.sqlite3")
+    SQLiteHistoryStore(db_path=path).append("s", entry(0))
+    assert questions(SQLiteHistoryStore(db_path=path).page("s")[0]) == ["q0"]
+
+
+def test_unknown_backend_is_rejected():
+    with pytest.raises(ValueError, match="Unknown history backend"):
+        create_history_store("redis")
+
+
+def test_cookie_carries_only_the_session_id(monkeypatch):
+    store = InMemoryHistoryStore()
+    monkeypatch.setattr(flask_app, "history_store", store)
+    client = flask_app.app.test_client()
+    client.get("/chat")
+    with client.session_transaction() as session:
+        sid = session["sid"]
+        assert set(session) == {"sid"}
+
+    for i in range(30):
+        store.append(sid, entry(i))
+    response = client.get("/chat/history", query_string={"limit": 10})
+    data = response.get_json()
+    assert questions(data["entries"]) == [f"q{i}" for i in range(20, 30)]
+    data = client.get("/chat/history", query_string={"limit": 10, "before": data["next_before"]}).get_json()
+    assert questions(data["entries"]) == [f"q{i}" for i in range(10, 20)]
@@ -0,0 +1,161 @@
+import threading
+
+import pytest
+from langchain_core.messages import AIMessage, HumanMessage, SystemMessage
+
+from agents.memory_store import InMemorySessionStore, SQLiteSessionStore, SummarizingMemory
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(max_messages=50):
+        if request.param == "sqlite":
+            return SQLiteSessionStore(db_path=str(tmp_path / "memory.sqlite3"), max_messages=max_messages)
+        return InMemorySessionStore(max_messages=max_messages)
+    return make
+
+
+def contents(messages):
+    return [m.content for m in messages]
+
+
+def add_turns(memory, session_id, start, end):
+    for i in range(start, end):
+        memory.add_turn(session_id, f"q{i}", f"a{i}")
+
+
+# === Session stores ===
+def test_sessions_are_kept_apart(make_store):
+    store = make_store()
+    store.add_turn("alice", "q1", "a1")
+    store.add_turn("bob", "q2", "a2")
+    assert contents(store.get_messages("alice")) == ["q1", "a1"]
+    assert isinstance(store.get_messages("alice")[0], HumanMessage)
+    assert isinstance(store.get_messages("alice")[1], AIMessage)
+    assert store.get_messages("nobody") == []
+
+
+def test_messages_are_capped_and_limited(make_store):
+    store = make_store(max_messages=4)
+    add_turns(store, "s", 0, 5)
+    assert contents(store.get_messages("s")) == ["q3", "a3", "q4", "a4"]
+    assert contents(store.get_messages("s", limit=2)) == ["q4", "a4"]
+
+
+def test_clear_drops_messages_and_summary(make_store):
+    store = make_store()
+    store.add_turn("s", "q", "a")
+    store.set_summary("s", "earlier talk")
+    store.clear("s")
+    assert store.get_messages("s") == []
+    assert store.get_summary("s") == ""
+
+
+def test_least_recently_used_session_is_evicted():
+    store = InMemorySessionStore(max_sessions=2)
+    store.add_turn("a", "q", "a")
+    store.add_turn("b", "q", "a")
+    store.get_messages("a")  # a is now more recent than b
+    store.add_turn("c", "q", "a")
+    assert len(store) == 2
+    assert store.get_messages("b") == []
+    assert contents(store.get_messages("a")) == ["q", "a"]
+
+
+def test_sqlite_history_is_shared_between_stores(tmp_path):
+    # Two workers opening the same file see one conversation
+    path = str(tmp_path / "memory.sqlite3")
+    SQLiteSessionStore(db_path=path).add_turn("s", "q", "a")
+    other = SQLiteSessionStore(db_path=path)
+    assert contents(other.get_messages("s")) == ["q", "a"]
+
+
+def test_concurrent_turns_are_all_kept(make_store):
+    store = make_store(max_messages=1000)
+    threads = [threading.Thread(target=add_turns, args=(store, f"s{t}", 0, 20)) for t in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    for t in range(4):
+        assert len(store.get_messages(f"s{t}")) == 40
+
+
+# === Rolling summary ===
+class FakeLLM:
+    # Records what it was asked to summarize; `gate` holds the call until the test releases it
+    def __init__(self, gate=None):
+        self.gate = gate
+        self.calls = []
+        self.called = threading.Event()
+
+    def invoke(self, messages):
+        self.calls.append(messages[-1].content)
+        self.called.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        return AIMessage(content=f"summary {len(self.calls)}")
+
+
+def wait_for_summaries(memory):
+    # The summary executor has one thread, so an empty task queued behind it finishes last
+    memory._executor.submit(lambda: None).result(5)
+
+
+def test_older_turns_are_summarized_and_dropped(make_store):
+    llm = FakeLLM()
+    memory = SummarizingMemory(make_store(), llm, window_tokens=1000, window_messages=2)
+    add_turns(memory.store, "s", 0, 2)
+    memory.add_turn("s", "q2", "a2")
+    wait_for_summaries(memory)
+
+    assert "Student: q0" in llm.calls[0] and "AskGeorge: a1" in llm.calls[0]
+    assert contents(memory.store.get_messages("s")) == ["q2", "a2"]
+    history = memory.get_messages("s")
+    assert isinstance(history[0], SystemMessage) and "summary" in history[0].content
+    assert contents(history[1:]) == ["q2", "a2"]
+
+
+def test_window_is_bounded_by_tokens_and_starts_on_a_question(make_store):
+    memory = SummarizingMemory(make_store(), FakeLLM(), window_tokens=6, window_messages=10)
+    memory.store.add_turn("s", "short question", "x " * 40)
+    memory.store.add_turn("s", "q", "a")
+    # The long answer doesn't fit, and a window never opens on an answer
+    assert contents(memory.get_messages("s")) == ["q", "a"]
+
+
+def test_long_message_is_clipped():
+    memory = SummarizingMemory(InMemorySessionStore(), FakeLLM(), max_message_tokens=5, window_tokens=1000)
+    memory.store.add_turn("s", "q", "y" * 100)
+    assert memory.get_messages("s")[-1].content == "y" * 20 + " …"
+
+
+def test_turns_trimmed_during_the_summary_call_are_kept(make_store):
+    gate = threading.Event()
+    llm = FakeLLM(gate)
+    memory = SummarizingMemory(make_store(max_messages=6), llm, window_tokens=1000, window_messages=2)
+    add_turns(memory.store, "s", 0, 2)
+    memory.add_turn("s", "q2", "a2")  # the summary of q0..a1 starts and waits on the gate
+    assert llm.called.wait(5)
+
+    # While the LLM is busy, two more turns push q0..a1 out of the capped store
+    add_turns(memory, "s", 3, 5)
+    gate.set()
+    wait_for_summaries(memory)
+
+    # Only the summarized messages may go: q2..a4 were never summarized and must all still be there
+    assert contents(memory.store.get_messages("s")) == ["q2", "a2", "q3", "a3", "q4", "a4"]
+    assert memory.store.get_summary("s") == "summary 1"
+
+
+def test_failed_summary_keeps_the_messages(make_store, caplog):
+    class BrokenLLM:
+        def invoke(self, messages):
+            raise RuntimeError("quota exceeded")
+
+    memory = SummarizingMemory(make_store(), BrokenLLM(), window_tokens=1000, window_messages=2)
+    add_turns(memory, "s", 0, 3)
+    wait_for_summaries(memory)
+
+    assert len(memory.store.get_messages("s")) == 6
+    assert "Memory summary failed for session s" in caplog.text
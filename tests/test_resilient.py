@@ -0,0 +1,257 @@
+import time
+import threading
+
+import pytest
+import requests
+from langchain_core.messages import HumanMessage
+
+from llm.providers import GeminiProvider, OllamaProvider
+from llm.resilient import CircuitBreaker, ResilientChatModel
+from stub_llm_server import REPLY, start_stub_server
+
+MESSAGES = [HumanMessage(content="How much is tuition?")]
+
+
+class FakeProvider:
+    # In-process stand-in for an HTTP provider: waits `latency` before the first token (returning early
+    # when cancelled), then raises `error` or streams `reply` word by word
+    def __init__(self, name, latency=0.0, reply=None, error=None, timeout=2.0, read_timeout=2.0):
+        self.name = name
+        self.latency = latency
+        self.reply = reply or f"answer from {name}"
+        self.error = error
+        self.timeout = timeout
+        self.read_timeout = read_timeout
+        self.calls = 0
+        self.cancelled = threading.Event()
+
+    def stream(self, messages, cancel=None):
+        self.calls += 1
+        deadline = time.monotonic() + self.latency
+        while time.monotonic() < deadline:
+            if cancel is not None and cancel.is_set():
+                self.cancelled.set()
+                return
+            time.sleep(0.005)
+        if self.error is not None:
+            raise self.error
+        for i, word in enumerate(self.reply.split(" ")):
+            yield word if i == 0 else " " + word
+
+
+def make_llm(*providers, **kwargs):
+    return ResilientChatModel(providers=list(providers), **kwargs)
+
+
+def half_open(llm, name):
+    # As if the breaker opened reset_timeout seconds ago
+    breaker = llm._breakers[name]
+    breaker.failures = breaker.failure_threshold
+    breaker.opened_at = time.monotonic() - breaker.reset_timeout
+    assert breaker.state == "half-open"
+    return breaker
+
+
+# === Circuit breaker ===
+def test_breaker_opens_after_threshold_and_allows_one_trial():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    assert breaker.allow() is True
+    breaker.record_failure()
+    assert breaker.state == "closed"
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.allow() is False
+
+    time.sleep(0.06)
+    assert breaker.state == "half-open"
+    assert breaker.allow() == "trial"
+    assert breaker.allow() is False  # only one trial at a time
+
+    breaker.release_trial()
+    assert breaker.allow() == "trial"
+    breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_failed_trial_opens_the_breaker_again():
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    breaker.record_failure()
+    time.sleep(0.06)
+    assert breaker.allow() == "trial"
+    breaker.record_failure()
+    assert breaker.state == "open"
+
+
+# === Failover ===
+def test_first_provider_answers():
+    primary, backup = FakeProvider("primary"), FakeProvider("backup")
+    response = make_llm(primary, backup).invoke(MESSAGES)
+    assert response.content == "answer from primary"
+    assert response.response_metadata["provider"] == "primary"
+    assert backup.calls == 0
+
+
+def test_fails_over_when_provider_errors():
+    primary = FakeProvider("primary", error=RuntimeError("503 Service Unavailable"))
+    backup = FakeProvider("backup")
+    llm = make_llm(primary, backup)
+
+    assert llm.invoke(MESSAGES).content == "answer from backup"
+    stats = llm.stats()
+    assert stats["failovers"] == 1
+    assert stats["wins"] == {"primary": 0, "backup": 1}
+    assert llm._breakers["primary"].failures == 1
+
+
+def test_fails_over_when_first_token_is_late():
+    primary = FakeProvider("primary", latency=2.0, timeout=0.1)
+    backup = FakeProvider("backup")
+    llm = make_llm(primary, backup)
+
+    assert llm.invoke(MESSAGES).content == "answer from backup"
+    assert primary.cancelled.wait(1.0)
+    assert llm._breakers["primary"].failures == 1
+
+
+def test_open_breaker_skips_provider():
+    primary = FakeProvider("primary", error=RuntimeError("down"))
+    backup = FakeProvider("backup")
+    llm = make_llm(primary, backup, failure_threshold=2, reset_timeout=60)
+
+    for _ in range(3):
+        assert llm.invoke(MESSAGES).content == "answer from backup"
+    assert primary.calls == 2
+    assert llm.stats()["breakers"] == {"primary": "open", "backup": "closed"}
+
+
+def test_all_breakers_open_raises():
+    primary = FakeProvider("primary", error=RuntimeError("down"))
+    llm = make_llm(primary, failure_threshold=1, reset_timeout=60)
+    with pytest.raises(RuntimeError, match="down"):
+        llm.invoke(MESSAGES)
+    with pytest.raises(RuntimeError, match="circuit open"):
+        llm.invoke(MESSAGES)
+
+
+def test_half_open_trial_success_closes_breaker():
+    primary, backup = FakeProvider("primary"), FakeProvider("backup")
+    llm = make_llm(primary, backup)
+    half_open(llm, "primary")
+
+    assert llm.invoke(MESSAGES).content == "answer from primary"
+    assert llm.stats()["breakers"]["primary"] == "closed"
+
+
+# === Hedging ===
+def test_hedge_starts_backup_when_primary_is_slow():
+    primary = FakeProvider("primary", latency=2.0, timeout=5.0)
+    backup = FakeProvider("backup")
+    llm = make_llm(primary, backup, hedge_after_ms=50)
+
+    start = time.monotonic()
+    assert llm.invoke(MESSAGES).content == "answer from backup"
+    assert time.monotonic() - start < 1.0
+    assert primary.cancelled.wait(1.0)
+    stats = llm.stats()
+    assert stats["hedges"] == 1
+    # Losing a hedge race isn't a failure
+    assert stats["breakers"] == {"primary": "closed", "backup": "closed"}
+    assert llm._breakers["primary"].failures == 0
+
+
+def test_no_hedge_when_primary_is_fast():
+    primary, backup = FakeProvider("primary"), FakeProvider("backup")
+    llm = make_llm(primary, backup, hedge_after_ms=500)
+    assert llm.invoke(MESSAGES).content == "answer from primary"
+    assert llm.stats()["hedges"] == 0
+    assert backup.calls == 0
+
+
+# === Half-open trials are never leaked ===
+def test_trial_not_taken_by_backup_that_never_starts():
+    primary, backup = FakeProvider("primary"), FakeProvider("backup")
+    llm = make_llm(primary, backup)
+    half_open(llm, "backup")
+
+    assert llm.invoke(MESSAGES).content == "answer from primary"
+    assert backup.calls == 0
+
+    # The backup can still take its trial once it is needed
+    primary.error = RuntimeError("down")
+    assert llm.invoke(MESSAGES).content == "answer from backup"
+    assert llm.stats()["breakers"]["backup"] == "closed"
+
+
+def test_trial_released_when_hedge_loses():
+    primary = FakeProvider("primary", latency=0.3, timeout=5.0)
+    backup = FakeProvider("backup", latency=2.0, timeout=5.0)
+    llm = make_llm(primary, backup, hedge_after_ms=20)
+    breaker = half_open(llm, "backup")
+
+    assert llm.invoke(MESSAGES).content == "answer from primary"
+    assert backup.calls == 1
+    assert backup.cancelled.wait(1.0)
+    assert breaker.allow() == "trial"
+
+
+def test_trial_released_when_caller_stops_reading():
+    primary = FakeProvider("primary", reply="a long answer that is never read to the end")
+    llm = make_llm(primary)
+    breaker = half_open(llm, "primary")
+
+    stream = llm.stream(MESSAGES)
+    next(stream)
+    stream.close()
+    assert breaker.allow() == "trial"
+
+
+# === Real HTTP against the stub server ===
+def stub_provider(name, timeout=5.0, **config):
+    server, _ = start_stub_server(**config)
+    provider = OllamaProvider(model="stub", base_url=f"http://127.0.0.1:{server.server_address[1]}", timeout=timeout)
+    provider.name = name  # breakers are keyed by name
+    return server, provider
+
+
+def test_hedge_against_stub_servers():
+    slow_server, slow = stub_provider("slow", latency=3.0)
+    fast_server, fast = stub_provider("fast", latency=0.05)
+    llm = make_llm(slow, fast, hedge_after_ms=100)
+    try:
+        start = time.monotonic()
+        response = llm.invoke(MESSAGES)
+        assert response.content == REPLY
+        assert response.response_metadata["provider"] == "fast"
+        assert time.monotonic() - start < 1.5
+        assert llm.stats()["hedges"] == 1
+    finally:
+        slow_server.shutdown()
+        fast_server.shutdown()
+
+
+def test_failover_from_failing_stub_server():
+    down_server, down = stub_provider("down", error_rate=1.0)
+    up_server, up = stub_provider("up", latency=0.0)
+    llm = make_llm(down, up)
+    try:
+        response = llm.invoke(MESSAGES)
+        assert response.content == REPLY
+        assert response.response_metadata["provider"] == "up"
+        assert llm._breakers["down"].failures == 1
+    finally:
+        down_server.shutdown()
+        up_server.shutdown()
+
+
+def test_gemini_key_stays_out_of_url_and_errors():
+    server, _ = start_stub_server(error_rate=1.0)
+    base_url = f"http://127.0.0.1:{server.server_address[1]}"
+    provider = GeminiProvider(model="stub", base_url=base_url, api_key="secret-key", timeout=5.0)
+    try:
+        with pytest.raises(requests.HTTPError) as raised:
+            list(provider.stream(MESSAGES))
+        assert "secret-key" not in str(raised.value)
+        assert "secret-key" not in raised.value.request.url
+        assert raised.value.request.headers["x-goog-api-key"] == "secret-key"
+    finally:
+        server.shutdown()